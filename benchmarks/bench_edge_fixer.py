@@ -0,0 +1,65 @@
+# EDGE FIXER BENCHMARK
+# Solves staircase shaped n-gon caps (every edge is aligned and most of them do not fit the pixel grid exactly)
+# with a growing number of vertices and prints how long solve_face takes for each one.
+# Run it from the repository root with:
+#   blender --background --factory-startup --python benchmarks/bench_edge_fixer.py
+import os
+import sys
+import time
+
+import bmesh
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pixer_src.pixeluvsolver import solve_face  # noqa: E402
+from pixer_src.xface import XFace  # noqa: E402
+
+PIXELS_PER_3D_UNIT = 10
+TEXTURE_SIZE = 4096
+VERTEX_COUNTS = [16, 64, 256, 1024, 2048, 4096]
+REPETITIONS = 3
+
+# Step sizes in pixels, on purpose not all of them are whole pixels so the edge fixer has work to do
+STEP_SIZES = [1.0, 1.4, 2.0, 2.6, 3.0]
+
+
+def _create_staircase_cap(bm, vertex_count: int):
+    steps = max(1, (vertex_count - 2) // 2)
+    pixel = 1.0 / PIXELS_PER_3D_UNIT
+    coordinates = [(0.0, 0.0)]
+    x = 0.0
+    y = 0.0
+    for i in range(steps):
+        x += STEP_SIZES[i % len(STEP_SIZES)] * pixel
+        coordinates.append((x, y))
+        y += STEP_SIZES[(i + 2) % len(STEP_SIZES)] * pixel
+        coordinates.append((x, y))
+    coordinates.append((0.0, y))
+    verts = [bm.verts.new((co[0], co[1], 0.0)) for co in coordinates]
+    face = bm.faces.new(verts)
+    face.normal_update()
+    return face
+
+
+def run():
+    print("=== EDGE FIXER BENCHMARK ===")
+    for vertex_count in VERTEX_COUNTS:
+        timings = []
+        aligned = True
+        for _ in range(REPETITIONS):
+            bm = bmesh.new()
+            XFace.init(bm.loops.layers.uv.verify())
+            XFace.ALL_XFACES = {}
+            xface = XFace(_create_staircase_cap(bm, vertex_count))
+            start = time.perf_counter()
+            solve_face(xface, PIXELS_PER_3D_UNIT, 1.0 / TEXTURE_SIZE)
+            timings.append(time.perf_counter() - start)
+            aligned = aligned and xface.is_3d_and_uv_aligned()
+            bm.free()
+        print(str(vertex_count) + " vertices: best " + str(round(min(timings), 4)) + " seconds, aligned with UVs: "
+              + str(aligned))
+    print("=== EDGE FIXER BENCHMARK ===")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,577 @@
+# PREDICATES FUZZER
+# Runs the overlap predicates of facestitcher and geometryutils, the overlap kernel that the stitcher uses and the
+# frozen copies in predicates_reference.py on the same random and adversarial lattice polygons (shared edges,
+# touching vertices, colinear edges, nested and repeated faces, points just inside or outside the tolerance),
+# prints every case where their answers differ and how many calls per second each version does.
+# Island outlines are checked on islands of faces that do not overlap, against the exact area of overlap of the
+# candidate with each face, as they also find a candidate that covers several faces without going inside any of them.
+# Last, it times stitch attempts against islands of growing size and prints from which size the kernel pays off.
+# It does not need Blender, a small stand-in is used for mathutils.Vector when mathutils is not available.
+# Run it from the repository root with:
+#   python benchmarks/fuzz_predicates.py [--cases 2000] [--seed 0] [--time 0.5] [--predicate segments_intersect]
+# Inside Blender it can be run with:
+#   blender --background --factory-startup --python benchmarks/fuzz_predicates.py -- --cases 2000
+import argparse
+import importlib
+import math
+from fractions import Fraction
+import os
+import random
+import sys
+import time
+import types
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+import predicates_reference as reference  # noqa: E402
+
+# Small deltas around the tolerance of _almost_equal (10^-6), below it points are the same, above they are not
+INSIDE_TOLERANCE = 10 ** -7
+OUTSIDE_TOLERANCE = 10 ** -5
+MAX_MISMATCHES_SHOWN = 5
+# Faces in each island the overlap kernel is tested against
+ISLAND_SIZE = 32
+# Most cells in the islands the outline is tested against, each cell is a square or two triangles
+OUTLINE_ISLAND_CELLS = 40
+# Island sizes the per face loop and the kernel are timed on, and faces added to them while timing
+CROSSOVER_SIZES = [16, 32, 64, 128, 256, 512, 1024, 2048]
+CROSSOVER_GROWTH = 20
+
+
+class StandInVector:
+    __slots__ = ["x", "y"]
+
+    def __init__(self, values):
+        self.x = float(values[0])
+        self.y = float(values[1])
+
+    def __getitem__(self, index):
+        return (self.x, self.y)[index]
+
+    def __len__(self):
+        return 2
+
+    def __iter__(self):
+        return iter((self.x, self.y))
+
+    def __add__(self, other):
+        return StandInVector((self.x + other.x, self.y + other.y))
+
+    def __sub__(self, other):
+        return StandInVector((self.x - other.x, self.y - other.y))
+
+    def __mul__(self, value):
+        return StandInVector((self.x * value, self.y * value))
+
+    def __neg__(self):
+        return StandInVector((-self.x, -self.y))
+
+    def __eq__(self, other):
+        return self.x == other.x and self.y == other.y
+
+    def __hash__(self):
+        return hash((self.x, self.y))
+
+    def __repr__(self):
+        return "Vector((" + repr(self.x) + ", " + repr(self.y) + "))"
+
+    @property
+    def length(self):
+        return math.hypot(self.x, self.y)
+
+    def normalized(self):
+        length = self.length
+        return StandInVector((self.x / length, self.y / length)) if length else self.copy()
+
+    def copy(self):
+        return StandInVector((self.x, self.y))
+
+    def freeze(self):
+        return self
+
+
+# Loads the facestitcher and geometryutils modules of the addon. Outside Blender, mathutils and bmesh are replaced
+# by stand-ins and the package is loaded without its __init__, which needs bpy
+def _load_candidates():
+    try:
+        import mathutils
+        vector = mathutils.Vector
+    except ImportError:
+        mathutils = types.ModuleType("mathutils")
+        mathutils.Vector = StandInVector
+        mathutils.Matrix = type("Matrix", (), {})
+        sys.modules["mathutils"] = mathutils
+        bmesh = types.ModuleType("bmesh")
+        bmesh.types = types.ModuleType("bmesh.types")
+        for name in ["BMesh", "BMFace", "BMEdge", "BMVert", "BMLoop", "BMLayerItem"]:
+            setattr(bmesh.types, name, type(name, (), {}))
+        sys.modules["bmesh"] = bmesh
+        sys.modules["bmesh.types"] = bmesh.types
+        package = types.ModuleType("pixer_src")
+        package.__path__ = [os.path.join(ROOT_DIR, "pixer_src")]
+        sys.modules["pixer_src"] = package
+        vector = StandInVector
+    facestitcher = importlib.import_module("pixer_src.facestitcher")
+    geometryutils = importlib.import_module("pixer_src.geometryutils")
+    overlapkernel = importlib.import_module("pixer_src.overlapkernel")
+    islandoutline = importlib.import_module("pixer_src.islandoutline")
+    importlib.import_module("pixer_src.logger").active_log_level = None
+    return facestitcher, geometryutils, overlapkernel, islandoutline, vector
+
+
+# Only what _faces_overlap_in_uv reads from an XFace
+class PointsFace:
+    def __init__(self, points):
+        self.points = points
+        self.bounds = reference._get_bounds(points)
+
+    def get_all_uvs(self):
+        return [point.copy() for point in self.points]
+
+    def get_uv_bounds(self):
+        return self.bounds
+
+
+##############
+# GENERATORS #
+##############
+def _random_polygon(rng: random.Random, size: int):
+    kind = rng.choice(["rectangle", "triangle", "l_shape", "convex", "staircase"])
+    x, y = rng.randint(-size, size), rng.randint(-size, size)
+    w, h = rng.randint(1, size), rng.randint(1, size)
+    if kind == "rectangle":
+        points = [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+    elif kind == "triangle":
+        points = [(x, y), (x + w, y), (x + rng.randint(0, w), y + h)]
+    elif kind == "l_shape":
+        t = rng.randint(1, max(1, min(w, h)))
+        points = [(x, y), (x + w, y), (x + w, y + t), (x + t, y + t), (x + t, y + h), (x, y + h)]
+    elif kind == "convex":
+        points = [(x, y), (x + w, y + rng.randint(-1, 1)), (x + w + rng.randint(0, 2), y + h),
+                  (x + rng.randint(-2, 0), y + h + rng.randint(0, 2))]
+    else:
+        points = [(x, y)]
+        steps = rng.randint(1, 4)
+        for _ in range(steps):
+            points.append((points[-1][0] + rng.randint(1, 3), points[-1][1]))
+            points.append((points[-1][0], points[-1][1] + rng.randint(1, 3)))
+        points.append((x, points[-1][1]))
+    if rng.random() < 0.5:
+        points.reverse()
+    start = rng.randrange(len(points))
+    return points[start:] + points[:start]
+
+
+def _is_counterclockwise(points) -> bool:
+    return sum(points[i][0] * points[(i + 1) % len(points)][1] - points[(i + 1) % len(points)][0] * points[i][1]
+               for i in range(len(points))) > 0
+
+
+# Quad built outwards from the segment pq of the polygon, so it shares that segment with it
+def _extrude(points, p, q, depth: int):
+    dx, dy = q[0] - p[0], q[1] - p[1]
+    length = math.gcd(abs(dx), abs(dy)) or 1
+    nx, ny = dy // length * depth, -dx // length * depth
+    if not _is_counterclockwise(points):
+        nx, ny = -nx, -ny
+    return [q, p, (p[0] + nx, p[1] + ny), (q[0] + nx, q[1] + ny)]
+
+
+def _translate(points, dx: float, dy: float):
+    return [(point[0] + dx, point[1] + dy) for point in points]
+
+
+def _generate_pair(rng: random.Random, size: int):
+    a = _random_polygon(rng, size)
+    kind = rng.choice(["random", "shared_edge", "touching_vertex", "colinear_edge", "nested", "same_face",
+                       "near_miss", "tolerance"])
+    i = rng.randrange(len(a))
+    p, q = a[i], a[(i + 1) % len(a)]
+    if kind == "random":
+        b = _random_polygon(rng, size)
+    elif kind == "shared_edge":
+        b = _extrude(a, p, q, rng.randint(1, 3) * rng.choice([1, -1]))
+    elif kind == "touching_vertex":
+        b = _random_polygon(rng, size)
+        corner = rng.choice(b)
+        b = _translate(b, p[0] - corner[0], p[1] - corner[1])
+    elif kind == "colinear_edge":
+        dx, dy = q[0] - p[0], q[1] - p[1]
+        steps = math.gcd(abs(dx), abs(dy)) or 1
+        shift = rng.randint(-steps - 1, steps + 1)
+        step_x, step_y = dx // steps * shift, dy // steps * shift
+        b = _extrude(a, (p[0] + step_x, p[1] + step_y), (q[0] + step_x, q[1] + step_y), rng.randint(1, 2))
+    elif kind == "nested":
+        left, bot = min(point[0] for point in a), min(point[1] for point in a)
+        right, top = max(point[0] for point in a), max(point[1] for point in a)
+        inner_left, inner_bot = rng.randint(left, right), rng.randint(bot, top)
+        b = [(inner_left, inner_bot), (rng.randint(inner_left, right), inner_bot),
+             (rng.randint(inner_left, right), rng.randint(inner_bot, top)), (inner_left, rng.randint(inner_bot, top))]
+        if rng.random() < 0.5:
+            a, b = b, a
+    elif kind == "same_face":
+        b = list(a)
+        b = b[1:] + b[:1]
+        if rng.random() < 0.5:
+            b.reverse()
+    elif kind == "near_miss":
+        b = _translate(a, rng.choice([-1, 0, 1]) * (max(x for x, _ in a) - min(x for x, _ in a) or 1),
+                       rng.choice([-1, 0, 1]) * (max(y for _, y in a) - min(y for _, y in a) or 1))
+    else:
+        b = _extrude(a, p, q, rng.randint(1, 2))
+        delta = rng.choice([INSIDE_TOLERANCE, OUTSIDE_TOLERANCE]) * rng.choice([1, -1])
+        b = [(x + delta * rng.randint(-1, 1), y + delta * rng.randint(-1, 1)) for x, y in b]
+    return kind, a, b
+
+
+# Island of lattice faces that do not overlap, grown cell by cell so it can have any shape and holes
+def _random_island(rng: random.Random):
+    cell = rng.randint(1, 2)
+    cells = {(0, 0)}
+    for _ in range(rng.randint(1, OUTLINE_ISLAND_CELLS)):
+        x, y = rng.choice(sorted(cells))
+        dx, dy = rng.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
+        cells.add((x + dx, y + dy))
+    faces = []
+    for x, y in sorted(cells):
+        corners = [(x * cell, y * cell), ((x + 1) * cell, y * cell), ((x + 1) * cell, (y + 1) * cell),
+                   (x * cell, (y + 1) * cell)]
+        split = rng.randrange(3)
+        if split == 0:
+            cell_faces = [corners]
+        else:
+            corners = corners[split - 1:] + corners[:split - 1]
+            cell_faces = [corners[:3], corners[2:] + corners[:1]]
+        for face in cell_faces:
+            faces.append(face[::-1] if rng.random() < 0.5 else face)
+    return faces
+
+
+# Outlines are only meant for simple polygons, like solved faces, with no edges crossing or folding over each other
+def _is_simple(points) -> bool:
+    if len(set(points)) != len(points):
+        return False
+    for i in range(len(points)):
+        p, q, r = points[i - 1], points[i], points[(i + 1) % len(points)]
+        cross = (q[0] - p[0]) * (r[1] - q[1]) - (q[1] - p[1]) * (r[0] - q[0])
+        dot = (q[0] - p[0]) * (r[0] - q[0]) + (q[1] - p[1]) * (r[1] - q[1])
+        if cross == 0 and dot < 0:
+            return False
+    edges = [[StandInVector(points[i]), StandInVector(points[(i + 1) % len(points)])] for i in range(len(points))]
+    for i in range(len(edges)):
+        for j in range(i + 2, len(edges) - (1 if i == 0 else 0)):
+            if reference.segments_intersect(*(edges[i] + edges[j])):
+                return False
+    return True
+
+
+def _generate_outline_case(rng: random.Random, size: int):
+    faces = _random_island(rng)
+    kind = rng.choice(["random", "island_face", "cover", "next_to_edge", "around"])
+    face = rng.choice(faces)
+    if kind == "random":
+        candidate = _random_polygon(rng, size)
+    elif kind == "island_face":
+        candidate = _translate(face, rng.randint(-1, 1), rng.randint(-1, 1)) if rng.random() < 0.5 else list(face)
+    elif kind == "cover":
+        # Rectangles on the cell grid, that cover whole faces without any of their points inside a face
+        xs = sorted({point[0] for face_points in faces for point in face_points})
+        ys = sorted({point[1] for face_points in faces for point in face_points})
+        left, right = sorted(rng.sample(xs, 2)) if len(xs) > 1 else (xs[0], xs[0] + 1)
+        bot, top = sorted(rng.sample(ys, 2)) if len(ys) > 1 else (ys[0], ys[0] + 1)
+        candidate = [(left, bot), (right, bot), (right, top), (left, top)]
+    elif kind == "next_to_edge":
+        i = rng.randrange(len(face))
+        candidate = _extrude(face, face[i], face[(i + 1) % len(face)], rng.randint(1, 2))
+    else:
+        corner = rng.choice(face)
+        candidate = _translate(_random_polygon(rng, 2), corner[0] + rng.randint(-2, 2), corner[1] + rng.randint(-2, 2))
+    if not _is_simple(candidate):
+        return _generate_outline_case(rng, size)
+    return kind, candidate, faces
+
+
+def _generate_cases(vector, overlapkernel, islandoutline, cases: int, seed: int, size: int):
+    rng = random.Random(seed)
+    generated = {"segments_intersect": [], "_get_winding_number": [], "_any_point_inside": [],
+                 "_any_edges_intersect": [], "_faces_overlap_in_uv": [], "overlap_kernel": [],
+                 "overlap_kernel_island": [], "island_outline": []}
+    island = []
+    for _ in range(cases):
+        kind, a, b = _generate_pair(rng, size)
+        points_a = [vector(point) for point in a]
+        points_b = [vector(point) for point in b]
+        for _ in range(4):
+            i = rng.randrange(len(points_a))
+            j = rng.randrange(len(points_b))
+            segment_a = (points_a[i], points_a[(i + 1) % len(points_a)])
+            segment_b = (points_b[j], points_b[(j + 1) % len(points_b)])
+            generated["segments_intersect"].append((kind, segment_a + segment_b))
+        midpoints = [(points_b[j] + points_b[(j + 1) % len(points_b)]) * 0.5 for j in range(len(points_b))]
+        for point in points_b + midpoints + [vector((rng.uniform(-size, 2 * size), rng.uniform(-size, 2 * size)))]:
+            generated["_get_winding_number"].append((kind, (point, points_a)))
+        generated["_any_point_inside"].append((kind, (points_a, points_b)))
+        generated["_any_point_inside"].append((kind, (points_b, points_a)))
+        generated["_any_edges_intersect"].append((kind, (points_a, points_b)))
+        generated["_faces_overlap_in_uv"].append((kind, (points_a, reference._get_bounds(points_a),
+                                                         PointsFace(points_b))))
+        generated["overlap_kernel"].append((kind, (points_a, [PointsFace(points_b)], _pack(overlapkernel,
+                                                                                           [points_b]))))
+
+        # Islands are made of the B faces of consecutive pairs, tested against the A face of the last pair
+        island.append(points_b)
+        if len(island) == ISLAND_SIZE:
+            generated["overlap_kernel_island"].append(
+                ("island", (points_a, [PointsFace(points) for points in island], _pack(overlapkernel, island))))
+            island = []
+
+        kind, candidate, faces = _generate_outline_case(rng, size)
+        outline = islandoutline.IslandOutline()
+        for points in faces:
+            outline.add(points)
+        generated["island_outline"].append((kind, (candidate, faces, outline)))
+    return generated
+
+
+def _pack(overlapkernel, polygons):
+    packed = overlapkernel.PackedPolygons()
+    for points in polygons:
+        packed.add([(point.x, point.y) for point in points])
+    return packed
+
+
+####################
+# INTENDED CHANGES #
+####################
+# Answers that are meant to differ from the frozen reference. Each one is the reference with only that change made,
+# so everything else is still checked against the original behavior, and the fuzzer prints how many cases change
+
+# The reference compared the edges of A with themselves, so _any_edges_intersect was always false. Since the overlap
+# kernel, edges of A and B that cross at a single point that is not an end of any of them count
+EDGES_CROSS_CHANGE = "edges of both faces that strictly cross are an overlap since the overlap kernel"
+
+
+def _segments_cross(p1, q1, p2, q2) -> bool:
+    areas = [(float(q.x - p.x) * (r.y - p.y)) - (float(r.x - p.x) * (q.y - p.y))
+             for p, q, r in [(p1, q1, p2), (p1, q1, q2), (p2, q2, p1), (p2, q2, q1)]]
+    if any(reference._almost_equal(area, 0.0) for area in areas):
+        return False
+    return reference.sign(areas[0]) != reference.sign(areas[1]) and reference.sign(areas[2]) != reference.sign(areas[3])
+
+
+def _intended_any_edges_intersect(points_a, points_b) -> bool:
+    if reference._any_edges_intersect(points_a, points_b):
+        return True
+    if reference._bounds_are_apart(reference._get_bounds(points_a), reference._get_bounds(points_b)):
+        return False
+    return any(_segments_cross(points_a[i], points_a[(i + 1) % len(points_a)],
+                               points_b[j], points_b[(j + 1) % len(points_b)])
+               for i in range(len(points_a)) for j in range(len(points_b)))
+
+
+def _intended_faces_overlap_in_uv(simulated_points, simulated_bounds, xface) -> bool:
+    if reference._faces_overlap_in_uv(simulated_points, simulated_bounds, xface):
+        return True
+    return not reference._bounds_are_apart(simulated_bounds, xface.get_uv_bounds()) \
+        and _intended_any_edges_intersect(simulated_points, xface.get_all_uvs())
+
+
+def _intended_island_overlaps(points, faces, _) -> bool:
+    bounds = reference._get_bounds(points)
+    return any(_intended_faces_overlap_in_uv(points, bounds, face) for face in faces)
+
+
+def _reference_island_overlaps(points, faces, _) -> bool:
+    bounds = reference._get_bounds(points)
+    return any(reference._faces_overlap_in_uv(points, bounds, face) for face in faces)
+
+
+# Predicate name: (frozen reference, reference with the change, why it changed)
+INTENDED_CHANGES = {
+    "_any_edges_intersect": (reference._any_edges_intersect, _intended_any_edges_intersect, EDGES_CROSS_CHANGE),
+    "_faces_overlap_in_uv": (reference._faces_overlap_in_uv, _intended_faces_overlap_in_uv, EDGES_CROSS_CHANGE),
+    "overlap_kernel": (_reference_island_overlaps, _intended_island_overlaps, EDGES_CROSS_CHANGE),
+    "overlap_kernel_island": (_reference_island_overlaps, _intended_island_overlaps, EDGES_CROSS_CHANGE),
+}
+
+
+##########
+# CHECKS #
+##########
+def _compare(name: str, reference_function, candidate_function, cases) -> int:
+    mismatches = 0
+    by_kind = {}
+    for kind, arguments in cases:
+        expected = reference_function(*arguments)
+        result = candidate_function(*arguments)
+        if expected != result:
+            mismatches += 1
+            by_kind[kind] = by_kind.get(kind, 0) + 1
+            if mismatches <= MAX_MISMATCHES_SHOWN:
+                print("  MISMATCH " + name + " (" + kind + "): reference " + str(expected) + ", candidate "
+                      + str(result) + " for " + str(arguments))
+    if mismatches:
+        print("  " + name + ": " + str(mismatches) + " of " + str(len(cases)) + " cases differ " + str(by_kind))
+    return mismatches
+
+
+def _calls_per_second(function, cases, min_time: float) -> float:
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        for _, arguments in cases:
+            function(*arguments)
+        calls += len(cases)
+        elapsed = time.perf_counter() - start
+    return calls / elapsed
+
+
+# Exact area of the part of the polygon inside a convex face, clipping it with each edge of the face
+def _clipped_area(points, convex_face) -> Fraction:
+    if not _is_counterclockwise(convex_face):
+        convex_face = convex_face[::-1]
+    clipped = [(Fraction(x), Fraction(y)) for x, y in points]
+    for i in range(len(convex_face)):
+        (ax, ay), (bx, by) = convex_face[i], convex_face[(i + 1) % len(convex_face)]
+        sides = [(bx - ax) * (y - ay) - (by - ay) * (x - ax) for x, y in clipped]
+        result = []
+        for j in range(len(clipped)):
+            k = (j + 1) % len(clipped)
+            if sides[j] >= 0:
+                result.append(clipped[j])
+            if (sides[j] > 0 > sides[k]) or (sides[j] < 0 < sides[k]):
+                t = sides[j] / (sides[j] - sides[k])
+                result.append((clipped[j][0] + t * (clipped[k][0] - clipped[j][0]),
+                               clipped[j][1] + t * (clipped[k][1] - clipped[j][1])))
+        clipped = result
+        if not clipped:
+            return Fraction(0)
+    return abs(sum(clipped[i][0] * clipped[(i + 1) % len(clipped)][1]
+                   - clipped[(i + 1) % len(clipped)][0] * clipped[i][1] for i in range(len(clipped)))) / 2
+
+
+def _exact_island_overlaps(candidate, faces, _):
+    return any(_clipped_area(candidate, face) > 0 for face in faces)
+
+
+# Island of unit squares filled row by row, as close to a square as it gets, with a candidate square stitched to the
+# right of the last face, so it touches the island without overlapping it
+def _grid_island(face_count: int):
+    width = max(1, int(math.ceil(math.sqrt(face_count))))
+    faces = [[(x, y), (x + 1, y), (x + 1, y + 1), (x, y + 1)]
+             for x, y in ((i % width, i // width) for i in range(face_count))]
+    x, y = faces[-1][1]
+    return faces, [(x, y), (x + 1, y), (x + 1, y + 1), (x, y + 1)]
+
+
+# Best time of running the attempts on a new island from setup, the setup itself is not timed
+def _best_attempt_seconds(setup, attempts, min_time: float) -> float:
+    best = None
+    total = 0.0
+    while total < min_time or best is None:
+        state = setup()
+        start = time.perf_counter()
+        attempts(state)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        total += elapsed
+    return best
+
+
+# Time of one stitch attempt against islands of each size with the per face loop and the overlap kernel. Like when
+# stitching, the island grows by one face before each attempt, so the cost of keeping the arrays of the kernel up to
+# date is counted too. Prints the smallest size from which the kernel is faster than the loop, which is what
+# KERNEL_MIN_FACES in facestitcher is set from
+def _print_crossovers(facestitcher, overlapkernel, vector, min_time: float):
+    print("Microseconds per stitch attempt by island size (loop, kernel):")
+    kernel_crossover = None
+    for face_count in CROSSOVER_SIZES:
+        faces, candidate = _grid_island(face_count + CROSSOVER_GROWTH)
+        points = [vector(point) for point in candidate]
+        bounds = reference._get_bounds(points)
+        point_faces = [PointsFace([vector(point) for point in face]) for face in faces]
+
+        def loop_attempts(_):
+            for i in range(face_count, len(faces)):
+                any(facestitcher._faces_overlap_in_uv(points, bounds, face) for face in point_faces[:i + 1])
+
+        def kernel_setup():
+            packed = _pack(overlapkernel, [face.points for face in point_faces[:face_count]])
+            overlapkernel.any_polygon_overlaps(candidate, packed)
+            return packed
+
+        def kernel_attempts(packed):
+            for i in range(face_count, len(faces)):
+                packed.add(faces[i])
+                overlapkernel.any_polygon_overlaps(candidate, packed)
+
+        loop_time = _best_attempt_seconds(lambda: None, loop_attempts, min_time) / CROSSOVER_GROWTH * 10 ** 6
+        kernel_time = _best_attempt_seconds(kernel_setup, kernel_attempts, min_time) / CROSSOVER_GROWTH * 10 ** 6
+        if kernel_crossover is None and kernel_time < loop_time:
+            kernel_crossover = face_count
+        print("  " + str(face_count) + " faces: " + str(round(loop_time, 1)) + ", " + str(round(kernel_time, 1)))
+    print("Kernel faster than the loop from " + str(kernel_crossover) + " faces, facestitcher uses "
+          + str(facestitcher.KERNEL_MIN_FACES))
+
+
+def run(arguments):
+    facestitcher, geometryutils, overlapkernel, islandoutline, vector = _load_candidates()
+
+    def kernel_island_overlaps(points, _, packed):
+        return overlapkernel.any_polygon_overlaps([(point.x, point.y) for point in points], packed)
+
+    def outline_overlaps(candidate, _, outline):
+        return outline.overlaps(candidate)
+
+    predicates = {
+        "segments_intersect": (reference.segments_intersect, geometryutils.segments_intersect),
+        "_get_winding_number": (reference._get_winding_number, geometryutils.get_winding_number),
+        "_any_point_inside": (reference._any_point_inside, facestitcher._any_point_inside),
+        "_any_edges_intersect": (_intended_any_edges_intersect, facestitcher._any_edges_intersect),
+        "_faces_overlap_in_uv": (_intended_faces_overlap_in_uv, facestitcher._faces_overlap_in_uv),
+        "overlap_kernel": (_intended_island_overlaps, kernel_island_overlaps),
+        "overlap_kernel_island": (_intended_island_overlaps, kernel_island_overlaps),
+        "island_outline": (_exact_island_overlaps, outline_overlaps),
+    }
+    if arguments.predicate:
+        predicates = {arguments.predicate: predicates[arguments.predicate]}
+    cases = _generate_cases(vector, overlapkernel, islandoutline, arguments.cases, arguments.seed, arguments.size)
+
+    print("=== PREDICATES FUZZER ===")
+    print("Vector: " + vector.__module__ + "." + vector.__name__ + ", seed: " + str(arguments.seed))
+    total_mismatches = 0
+    for name, (reference_function, candidate_function) in predicates.items():
+        if not cases[name]:
+            print(name + ": no cases, use more --cases")
+            continue
+        if name in INTENDED_CHANGES:
+            frozen_function, changed_function, reason = INTENDED_CHANGES[name]
+            changed = sum(1 for _, case_arguments in cases[name]
+                          if frozen_function(*case_arguments) != changed_function(*case_arguments))
+            print(name + ": " + str(changed) + " cases differ from the frozen reference on purpose, " + reason)
+        mismatches = _compare(name, reference_function, candidate_function, cases[name])
+        total_mismatches += mismatches
+        reference_speed = _calls_per_second(reference_function, cases[name], arguments.time)
+        candidate_speed = _calls_per_second(candidate_function, cases[name], arguments.time)
+        print(name + ": " + str(len(cases[name])) + " cases, " + ("OK" if not mismatches else "DIFFERENT")
+              + ", reference " + str(int(reference_speed)) + " calls/s, candidate " + str(int(candidate_speed))
+              + " calls/s (x" + str(round(candidate_speed / reference_speed, 2)) + ")")
+    if not arguments.predicate:
+        _print_crossovers(facestitcher, overlapkernel, vector, arguments.time)
+    print("=== PREDICATES FUZZER ===")
+    return total_mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the overlap predicates against their reference copies")
+    parser.add_argument("--cases", type=int, default=2000, help="Number of polygon pairs to generate")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random generator")
+    parser.add_argument("--size", type=int, default=8, help="Size of the lattice the polygons are generated on")
+    parser.add_argument("--time", type=float, default=0.5, help="Minimum seconds to time each predicate")
+    parser.add_argument("--predicate", default=None, help="Only check this predicate")
+    script_arguments = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    sys.exit(1 if run(parser.parse_args(script_arguments)) else 0)
@@ -0,0 +1,172 @@
+# PREDICATES REFERENCE
+# Frozen copy of the overlap predicates of facestitcher and geometryutils, kept exactly as they behave now so faster
+# versions can be checked against them with fuzz_predicates.py. Do not optimize these. If a change to the
+# predicates is meant to change their answers, update this copy in the same commit and say why
+from typing import Tuple
+
+
+def _almost_equal(a: float, b: float, difference: float = 10 ** -6) -> bool:
+    return abs(a - b) < difference
+
+
+def _almost_equal_vectors(vector_a, vector_b) -> bool:
+    return _almost_equal(vector_a.x, vector_b.x) and _almost_equal(vector_a.y, vector_b.y)
+
+
+def sign(number: float):
+    if number == 0:
+        return 0
+    else:
+        return int(number/abs(number))
+
+
+def segments_intersect(p1, q1, p2, q2):
+    o1 = _orientation(p1, q1, p2)
+    o2 = _orientation(p1, q1, q2)
+    o3 = _orientation(p2, q2, p1)
+    o4 = _orientation(p2, q2, q1)
+    if not _almost_equal(o1, o2) and not _almost_equal(o3, o4):
+        return True
+    if _almost_equal(o1, 0.0) and _on_segment(p1, p2, q1):
+        return True
+    if _almost_equal(o2, 0.0) and _on_segment(p1, q2, q1):
+        return True
+    if _almost_equal(o3, 0.0) and _on_segment(p2, p1, q2):
+        return True
+    if _almost_equal(o4, 0.0) and _on_segment(p2, q1, q2):
+        return True
+    return False
+
+
+def _on_segment(p, q, r):
+    if (q.x < max(p.x, r.x) or _almost_equal(q.x, max(p.x, r.x))) and \
+            (q.x > min(p.x, r.x) or _almost_equal(q.x, min(p.x, r.x))) and \
+            (q.y < max(p.y, r.y) or _almost_equal(q.y, max(p.y, r.y))) and \
+            (q.y > min(p.y, r.y) or _almost_equal(q.y, min(p.y, r.y))):
+        return True
+    return False
+
+
+def _orientation(p, q, r):
+    return sign((float(q.y - p.y) * (r.x - q.x)) - (float(q.x - p.x) * (r.y - q.y)))
+
+
+def _faces_overlap_in_uv(simulated_points, simulated_bounds: Tuple[float, float, float, float], xface) -> bool:
+    if _bounds_are_apart(simulated_bounds, xface.get_uv_bounds()):
+        return False
+    xface_uvs = xface.get_all_uvs()
+    return _are_the_same_points(simulated_points, xface_uvs) \
+        or _any_edges_intersect(simulated_points, xface_uvs) \
+        or _any_point_inside(simulated_points, xface_uvs) \
+        or _any_point_inside(xface_uvs, simulated_points)
+
+
+def _get_bounds(points) -> Tuple[float, float, float, float]:
+    return (min(point.x for point in points), min(point.y for point in points),
+            max(point.x for point in points), max(point.y for point in points))
+
+
+def _bounds_are_apart(bounds_a, bounds_b):
+    return (bounds_a[0] > bounds_b[2] and not _almost_equal(bounds_a[0], bounds_b[2])) \
+        or (bounds_b[0] > bounds_a[2] and not _almost_equal(bounds_b[0], bounds_a[2])) \
+        or (bounds_a[1] > bounds_b[3] and not _almost_equal(bounds_a[1], bounds_b[3])) \
+        or (bounds_b[1] > bounds_a[3] and not _almost_equal(bounds_b[1], bounds_a[3]))
+
+
+def _are_the_same_points(points_a, points_b) -> bool:
+    if len(points_a) != len(points_b):
+        return False
+    for point_a in points_a:
+        any_match = any(_almost_equal_vectors(point_a, point_b) for point_b in points_b)
+        if not any_match:
+            return False
+    return True
+
+
+def _any_edges_intersect(points_a, points_b) -> bool:
+    if _get_leftmost_point_in(points_a).x > _get_rightmost_point_in(points_b).x:
+        return False
+    if _get_leftmost_point_in(points_b).x > _get_rightmost_point_in(points_a).x:
+        return False
+    if _get_botmost_point_in(points_a).y > _get_topmost_point_in(points_b).y:
+        return False
+    if _get_botmost_point_in(points_b).y > _get_topmost_point_in(points_a).y:
+        return False
+
+    for i in range(len(points_a)):
+        curr_point_a = points_a[i]
+        next_point_a = points_a[(i + 1) % (len(points_a))]
+        for j in range(len(points_b)):
+            curr_point_b = points_a[i]
+            next_point_b = points_a[(i + 1) % (len(points_a))]
+            if not _is_the_same_segment(curr_point_a, next_point_a, curr_point_b, next_point_b) and \
+                    segments_intersect(curr_point_a, next_point_a, curr_point_b, next_point_b):
+                return True
+    return False
+
+
+def _is_the_same_segment(p1, q1, p2, q2):
+    return (_almost_equal_vectors(p1, p2) and _almost_equal_vectors(q1, q2)) or \
+           (_almost_equal_vectors(p1, q2) and _almost_equal_vectors(p2, q1))
+
+
+def _get_rightmost_point_in(points):
+    point = points[0]
+    for i in range(len(points)):
+        if points[i].x > point.x or _almost_equal(points[i].x, point.x):
+            point = points[i]
+    return point
+
+
+def _get_leftmost_point_in(points):
+    point = points[0]
+    for i in range(len(points)):
+        if points[i].x < point.x or _almost_equal(points[i].x, point.x):
+            point = points[i]
+    return point
+
+
+def _get_topmost_point_in(points):
+    point = points[0]
+    for i in range(len(points)):
+        if points[i].y > point.y or _almost_equal(points[i].y, point.y):
+            point = points[i]
+    return point
+
+
+def _get_botmost_point_in(points):
+    point = points[0]
+    for i in range(len(points)):
+        if points[i].y < point.y or _almost_equal(points[i].y, point.y):
+            point = points[i]
+    return point
+
+
+def _any_point_inside(points_a, points_b) -> bool:
+    for point_a in points_a:
+        if not any(_almost_equal_vectors(point_a, point_b) for point_b in points_b) \
+                and _get_winding_number(point_a, points_b):
+            return True
+    return False
+
+
+def _get_winding_number(point, points):
+    winding_number = 0
+    for i in range(len(points)):
+        curr_point = points[i]
+        next_point = points[(i + 1) % len(points)]
+        if curr_point.y < point.y or _almost_equal(curr_point.y, point.y):
+            if next_point.y > point.y and not _almost_equal(next_point.y, point.y):
+                is_left = _is_at_left(curr_point, next_point, point)
+                if not _almost_equal(is_left, 0.0) and is_left > 0:
+                    winding_number += 1
+        else:
+            if next_point.y < point.y or _almost_equal(next_point.y, point.y):
+                is_left = _is_at_left(curr_point, next_point, point)
+                if not _almost_equal(is_left, 0.0) and is_left < 0:
+                    winding_number -= 1
+    return winding_number
+
+
+def _is_at_left(p0, p1, p2):
+    return ((p1.x - p0.x) * (p2.y - p0.y)) - ((p2.x - p0.x) * (p1.y - p0.y))
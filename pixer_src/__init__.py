@@ -12,7 +12,13 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import bpy
+import importlib
+from .pixerbackgroundoperator import PixerBackgroundOperator
 from .pixeroperator import PixerOperator
+from .pixerrepackoperator import PixerRepackOperator
+from .pixerverifyoperator import PixerVerifyOperator
+from .stats import get_last_stats
+from .workerpool import start_workers, stop_workers
 
 bl_info = {
     "name": "Pixer",
@@ -25,6 +31,52 @@ bl_info = {
 }
 
 
+# Seconds after the addon is registered at which the solver is loaded and the workers started, if they are kept warm
+WARM_UP_DELAY = 1.0
+
+
+# Registering the addon only loads the panel and the operators, the solver is loaded when it is first used. The
+# scripting API is still there as pixer_src.pixelize and pixer_src.PixerSession
+def __getattr__(name):
+    if name in ("pixelize", "PixerSession"):
+        return getattr(importlib.import_module(".api", __name__), name)
+    raise AttributeError("module " + __name__ + " has no attribute " + name)
+
+
+def update_workers(preferences, context):
+    if preferences.warm_workers:
+        warm_up()
+    else:
+        stop_workers()
+
+
+def warm_up():
+    preferences = bpy.context.preferences.addons[__name__].preferences
+    if preferences.warm_workers:
+        importlib.import_module(".api", __name__)
+        start_workers(preferences.worker_count)
+    return None
+
+
+class PixerPreferences(bpy.types.AddonPreferences):
+    bl_idname = __name__
+
+    warm_workers: bpy.props.BoolProperty(name="Keep solver warm",
+                                         description="Check this to load the solver and start background workers "
+                                                     "right after Blender starts, so the first pixelize does not wait "
+                                                     "for them. Workers use memory while they wait",
+                                         default=False, update=update_workers)
+    worker_count: bpy.props.IntProperty(name="Workers",
+                                        description="How many background pixelizations can start right away",
+                                        default=1, min=1, max=8, update=update_workers)
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(self, "warm_workers")
+        if self.warm_workers:
+            layout.prop(self, "worker_count")
+
+
 class PixerProperties(bpy.types.PropertyGroup):
     pixels_in_3D_unit: bpy.props.IntProperty(name="Pixels/unit",
                                              description="How many squares are inside a 3D unit (you can use "
@@ -32,10 +84,81 @@ class PixerProperties(bpy.types.PropertyGroup):
                                              default=10, min=1)
     texture_size: bpy.props.IntProperty(name="Texture Size", description="Size of texture. Assumes it is squared",
                                         default=32, min=1)
+    auto_texture_size: bpy.props.BoolProperty(name="Auto size",
+                                              description="Check this if you want pixer to use the smallest texture "
+                                                          "size in which the UVs fit",
+                                              default=False)
+    auto_texture_size_step: bpy.props.IntProperty(name="Size step",
+                                                  description="Auto size only tries multiples of this. Use 0 to "
+                                                              "try only powers of two",
+                                                  default=0, min=0, max=16384)
+    extra_texture_sizes: bpy.props.StringProperty(name="Extra sizes",
+                                                  description="Comma separated texture sizes (like 64,128) to also "
+                                                              "write UVs for. Each size gets its own UV layer",
+                                                  default="")
+    tile_mode: bpy.props.EnumProperty(name="Overflow",
+                                      description="What to do when the UVs do not fit in one texture",
+                                      items=[("UDIM", "UDIM tiles", "Keep packing on the next UDIM tiles"),
+                                             ("PAGES", "Atlas pages", "Keep packing on new atlas pages. The "
+                                                                      "material index of each face is set to the "
+                                                                      "page it is on")],
+                                      default="UDIM")
+    packing: bpy.props.EnumProperty(name="Packing",
+                                    description="How islands are placed on the texture",
+                                    items=[("COLUMNS", "Columns", "Place islands by their bounding box, in columns. "
+                                                                  "Fast, but leaves gaps around islands that are "
+                                                                  "not rectangles"),
+                                           ("SHAPES", "Island shapes", "Place islands by their real shape, rotating "
+                                                                       "them if they fit better. Slower, but fills "
+                                                                       "the texture much more")],
+                                    default="COLUMNS")
+    symmetry_mode: bpy.props.EnumProperty(name="Symmetry",
+                                          description="Solve only one half of models that are symmetric across X",
+                                          items=[("NONE", "None", "Solve every face"),
+                                                 ("SHARE", "Share texels", "Mirrored faces use the same texels as "
+                                                                           "the faces they mirror"),
+                                                 ("MIRROR", "Mirrored copy", "Mirrored faces get their own flipped "
+                                                                             "copy of the island")],
+                                          default="NONE")
+    instance_mode: bpy.props.EnumProperty(name="Repeated parts",
+                                          description="Solve only once the parts of the model that are repeated",
+                                          items=[("NONE", "None", "Solve every part"),
+                                                 ("COPY", "Copy island", "Repeated parts get their own copy of the "
+                                                                         "island"),
+                                                 ("SHARE", "Share texels", "Repeated parts use the same texels")],
+                                          default="NONE")
+    instance_rotation: bpy.props.BoolProperty(name="Match rotated parts",
+                                              description="Check this if parts rotated 90 degrees around Z should "
+                                                          "count as repeated too",
+                                              default=False)
+    streaming: bpy.props.BoolProperty(name="Low memory",
+                                      description="Check this for very big models. Pixer solves one connected part "
+                                                  "at a time and frees it before going on with the next one",
+                                      default=False)
     selection_only: bpy.props.BoolProperty(name="Selection only",
                                            description="Check this if you want to apply the texturizer only to "
                                                        "selected faces",
                                            default=False)
+    stitch_time_limit: bpy.props.FloatProperty(name="Stitch time limit",
+                                               description="Seconds to spend stitching faces. Faces solved after "
+                                                           "that are left as separate islands. Use 0 for no limit",
+                                               default=0.0, min=0.0)
+    merge_islands: bpy.props.BoolProperty(name="Merge islands",
+                                          description="Check this to join islands that share an edge once all the "
+                                                      "faces are solved, when they fit together without overlapping",
+                                          default=True)
+    keep_correct_uvs: bpy.props.BoolProperty(name="Keep correct UVs",
+                                             description="Check this to leave the islands that are pixel perfect "
+                                                         "already where they are and only pixelize the rest",
+                                             default=False)
+    verify_overlaps: bpy.props.BoolProperty(name="Verify overlaps",
+                                            description="Check this if you want to check that no faces overlap in "
+                                                        "UV after packing them",
+                                            default=False)
+    profile: bpy.props.BoolProperty(name="Profile",
+                                    description="Check this to save where the time and the memory go on each stage "
+                                                "next to the .blend file, useful to attach to bug reports",
+                                    default=False)
 
 
 class PixerMainPanel(bpy.types.Panel):
@@ -51,16 +174,69 @@ class PixerMainPanel(bpy.types.Panel):
         pixer = scene.pixer
 
         layout.prop(pixer, "pixels_in_3D_unit")
-        layout.prop(pixer, "texture_size")
+        layout.prop(pixer, "auto_texture_size")
+        if pixer.auto_texture_size:
+            layout.prop(pixer, "auto_texture_size_step")
+        else:
+            layout.prop(pixer, "texture_size")
+        layout.prop(pixer, "extra_texture_sizes")
+        layout.prop(pixer, "tile_mode")
+        layout.prop(pixer, "packing")
+        layout.prop(pixer, "symmetry_mode")
+        layout.prop(pixer, "instance_mode")
+        if pixer.instance_mode != "NONE":
+            layout.prop(pixer, "instance_rotation")
         layout.prop(pixer, "selection_only")
+        layout.prop(pixer, "streaming")
+        layout.prop(pixer, "stitch_time_limit")
+        layout.prop(pixer, "merge_islands")
+        layout.prop(pixer, "keep_correct_uvs")
+        layout.prop(pixer, "verify_overlaps")
+        layout.prop(pixer, "profile")
 
         row = layout.row()
         row.label(icon='WORLD_DATA')
         row.operator(text="Pixelize!", operator="rabid.pixer")
         row.label(icon='WORLD_DATA')
 
+        layout.operator(text="Pixelize in background", operator="rabid.pixer_background")
+        layout.operator(text="Repack UVs", operator="rabid.pixer_repack")
+        layout.operator(text="Check UV overlaps", operator="rabid.pixer_verify")
+
+        stats = get_last_stats()
+        if stats is not None:
+            box = layout.box()
+            box.label(text="Last run")
+            box.label(text="Texture size: " + str(stats.texture_size))
+            for plane, count in stats.faces_by_plane.items():
+                box.label(text=plane.capitalize() + " faces: " + str(count))
+            if stats.mirrored_faces:
+                box.label(text="Mirrored faces: " + str(stats.mirrored_faces))
+            if stats.instanced_faces:
+                box.label(text="Repeated faces: " + str(stats.instanced_faces))
+            box.label(text="Islands: " + str(stats.get_island_count()))
+            if stats.merged_islands:
+                box.label(text="Merged islands: " + str(stats.merged_islands))
+            if stats.merge_cut_short:
+                box.label(text="Merging stopped (out of time)")
+            if stats.kept_faces:
+                box.label(text="Kept faces: " + str(stats.kept_faces))
+            for bucket, count in stats.get_island_histogram().items():
+                box.label(text=" - " + bucket + " faces: " + str(count))
+            for outcome, count in stats.stitch_attempts.items():
+                box.label(text=outcome + ": " + str(count))
+            box.label(text="Overlap tests: " + str(stats.overlap_tests))
+            if stats.degraded_faces:
+                box.label(text="Not stitched (out of time): " + str(stats.degraded_faces))
+            for size, tiles in stats.tiles_used.items():
+                box.label(text="Tiles used for " + str(size) + ": " + str(tiles))
+            if stats.peak_memory:
+                box.label(text="Peak memory: " + str(round(stats.peak_memory / (1024.0 * 1024.0), 2)) + " MB")
+            box.label(text="Texel fill: " + str(round(stats.texel_fill_ratio * 100.0, 1)) + "%")
+
 
-classes = [PixerProperties, PixerMainPanel, PixerOperator]
+classes = [PixerPreferences, PixerProperties, PixerMainPanel, PixerOperator, PixerBackgroundOperator,
+           PixerRepackOperator, PixerVerifyOperator]
 
 
 def register():
@@ -68,9 +244,14 @@ def register():
         bpy.utils.register_class(cls)
 
     bpy.types.Scene.pixer = bpy.props.PointerProperty(type=PixerProperties)
+    # Warming up right away would make Blender start slower, so it waits until Blender is done starting
+    bpy.app.timers.register(warm_up, first_interval=WARM_UP_DELAY)
 
 
 def unregister():
+    if bpy.app.timers.is_registered(warm_up):
+        bpy.app.timers.unregister(warm_up)
+    stop_workers()
     for cls in classes:
         bpy.utils.unregister_class(cls)
     del bpy.types.Scene.pixer
@@ -0,0 +1,674 @@
+# PIXER API
+# Scripting entry point of pixer. Runs the whole pixelization on a mesh or a bmesh without going through the scene
+# properties or bpy.ops, and returns the stats of the run.
+# A session keeps what does not depend on the texture settings between calls on the same mesh: the validation, the
+# parsed faces and the solved islands, which are in pixel units. Sweeps over texture sizes, packing or tile modes
+# on the same mesh only pack and write UVs again.
+#
+#   from pixer_src.api import pixelize, PixerSession
+#   stats = pixelize(obj.data, 10, 64)
+#   with PixerSession(obj.data) as session:
+#       for size in [32, 64, 128]:
+#           print(session.pixelize(10, size, packing="SHAPES").as_dict())
+#       session.repack(256)
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+import bmesh
+import numpy as np
+from bmesh.types import BMesh, BMFace
+
+from .benchmarker import bench_start, bench_end
+from .facederiver import derive_faces
+from .faceparser import parse_faces, parse_region, get_faces_with_one_ring, get_connected_components, \
+    get_selected_faces, get_mesh_checksum
+from .facestitcher import stitch, StitchingError, stitch_by_vertex, reset_island_polygons
+from .geometryutils import polygon_area
+from .instancer import find_instanced_faces, SHARE_ISLAND
+from .islandmerger import merge_neighbor_islands
+from .pixeluvsolver import *
+from .stats import PixerStats, start_stats, end_stats, get_stats
+from .symmetry import find_mirrored_faces, NONE, SHARE, MIRROR
+from .uvauditor import audit_faces
+from .uvpacker import pack_islands, write_packed_uvs, get_uv_islands, get_tiles_used, UDIM, PAGES, COLUMNS, \
+    find_minimum_texture_size, summarize_islands, get_packed_uvs, IslandSummary, read_uv_islands, read_pixel_uvs, \
+    group_uv_islands, pack_islands_around
+from .uvverifier import find_uv_overlaps
+from .validator import validate
+
+# Faces are solved and stitched in pixel units, UVs are only scaled to a texture size when they are written
+SOLVE_PIXEL_SIZE = 1.0
+# Custom property of the mesh with the texture size its UVs were last written for
+TEXTURE_SIZE_PROPERTY = "pixer_texture_size"
+
+
+def pixelize(mesh, pixels_per_unit: int, texture_size: int, **options) -> PixerStats:
+    """Pixelizes the UVs of a mesh and returns the stats of the run.
+
+    'mesh' can be a bpy.types.Mesh, in edit mode or not, or a bmesh. Options are the same as the ones of
+    PixerSession.pixelize. Raises an Exception if the mesh cannot be pixelized, like when it has duplicated vertices.
+    """
+    session = PixerSession(mesh)
+    try:
+        return session.pixelize(pixels_per_unit, texture_size, **options)
+    finally:
+        session.free()
+
+
+class PixerSession:
+    """Pixelizes the same mesh many times, reusing the work that does not depend on the texture settings.
+
+    'mesh' can be a bpy.types.Mesh, in edit mode or not, or a bmesh. If 'obj' is given, the faces of a mesh in
+    edit mode are read in bulk from it. A mesh that is not in edit mode is checked for changes to its vertices, faces,
+    selection, active UVs and material indices before every call, and only the UVs and material indices pixer
+    writes are written back to it. For a mesh in edit mode or a bmesh only changes to the number of vertices, edges
+    or faces are detected, so call invalidate() after moving vertices or changing the selection there. Call free()
+    (or use a with block) when done.
+    """
+    separate_by_plane = True
+
+    def __init__(self, mesh, obj=None):
+        self.mesh = None if isinstance(mesh, BMesh) else mesh
+        self.obj = obj
+        self.bm = mesh if isinstance(mesh, BMesh) else None
+        self.owns_bm = False
+        self.pixels_per_3d_unit = 10
+        self.only_selection = False
+        self.bench_faces = True
+        self.stitch_deadline = None
+        self.topology = None
+        self.mesh_checksum = None
+        self.texture_size = 0
+        self._forget()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.free()
+
+    def invalidate(self):
+        """Forgets everything cached from previous calls, including the bmesh made for a mesh that is not in edit
+        mode, which is made again from the mesh on the next call."""
+        if self.owns_bm:
+            if self.bm.is_valid:
+                self.bm.free()
+            self.bm = None
+            self.owns_bm = False
+        self._forget()
+
+    def free(self):
+        """Frees the bmesh created for a mesh that is not in edit mode. The session can still be used after this."""
+        self.invalidate()
+
+    def _forget(self):
+        self.validated_faces = set()
+        self.validated_all = False
+        self.records = {}
+        self.mirrored_faces = {}
+        self.solutions = {}
+        self.selection = None
+
+    def pixelize(self, pixels_per_unit: int, texture_size: int, selection_only: bool = False,
+                 verify_overlaps: bool = False, extra_texture_sizes: List[int] = None, tile_mode: str = UDIM,
+                 auto_texture_size: bool = False, auto_texture_size_step: int = 0, symmetry_mode: str = NONE,
+                 instance_mode: str = NONE, instance_rotation: bool = False, streaming: bool = False,
+                 packing: str = COLUMNS, stitch_time_limit: float = 0.0, merge_islands: bool = True,
+                 keep_correct_uvs: bool = False, report_memory: bool = False) -> PixerStats:
+        """Pixelizes the UVs of the mesh and returns the stats of the run.
+
+        pixels_per_unit: pixels of the texture for each 3D unit
+        texture_size: side of the texture in pixels. With auto_texture_size it is found and this is ignored
+        selection_only: only pixelize the selected faces
+        verify_overlaps: check the final UVs for overlapping faces, found pairs are in stats.overlaps
+        extra_texture_sizes: also write the UVs for these sizes, each one on a UV layer called Pixer_<size>
+        tile_mode: uvpacker.UDIM or uvpacker.PAGES, what to do when the UVs do not fit in one texture
+        auto_texture_size: use the smallest size in which the UVs fit, a power of two or a multiple of
+            auto_texture_size_step if it is not 0
+        symmetry_mode: symmetry.NONE, symmetry.SHARE or symmetry.MIRROR
+        instance_mode: symmetry.NONE, instancer.COPY_ISLAND or instancer.SHARE_ISLAND, with instance_rotation to
+            also match parts rotated 90 degrees around Z
+        streaming: solve one connected part at a time to keep memory low
+        packing: uvpacker.COLUMNS or uvpacker.SHAPES
+        stitch_time_limit: seconds to spend stitching faces, 0 for no limit
+        merge_islands: once solved, join islands that share an edge in 3D when they fit together without overlapping
+        keep_correct_uvs: leave the islands whose faces already have pixel perfect UVs for texture_size where they
+            are, and only solve the other islands, packed by shape around them. It cannot be used together with
+            extra_texture_sizes or auto_texture_size
+        report_memory: trace the Python allocations of the run and put their peak in stats.peak_memory. Tracing
+            makes every allocation slower and does not see the memory of the bmesh itself
+        """
+        log(INFO, "Starting texture pixelation!")
+        stats = start_stats()
+        self.pixels_per_3d_unit = pixels_per_unit
+        self.only_selection = selection_only
+        # Per face benchmarks keep a key for every face, which is too much when trying to save memory
+        self.bench_faces = not streaming
+        if streaming and (symmetry_mode != NONE or instance_mode != NONE):
+            raise Exception("Low memory mode cannot be used together with symmetry or repeated parts")
+        if keep_correct_uvs and (extra_texture_sizes or auto_texture_size):
+            raise Exception("Keeping correct UVs cannot be used together with extra sizes or auto size")
+        tracing_memory = report_memory and not tracemalloc.is_tracing()
+        if tracing_memory:
+            tracemalloc.start()
+
+        log(INFO, "Loading model data...")
+        bench_start("Load model")
+        bm = self._get_bmesh()
+        uv_layer = bm.loops.layers.uv.verify()
+        extra_uv_layers = {}
+        for extra_texture_size in extra_texture_sizes or []:
+            layer_name = "Pixer_" + str(extra_texture_size)
+            extra_uv_layers[extra_texture_size] = bm.loops.layers.uv.get(layer_name) \
+                or bm.loops.layers.uv.new(layer_name)
+        bench_end("Load model")
+
+        # When working only on the selection, every stage works only on the selected faces and the faces around them
+        region = None
+        region_key = None
+        if self.only_selection:
+            region = self._get_selection(bm)
+            region_key = frozenset(face.index for face in region)
+
+        log(INFO, "Validating model...")
+        self._validate(bm, region)
+
+        # Only the islands with faces that are not pixel perfect are solved, as if they were the selection
+        fixed_islands = []
+        fixed_shared_faces = set()
+        if keep_correct_uvs:
+            log(INFO, "Auditing current UVs...")
+            bench_start("Audit UVs")
+            region, fixed_islands, fixed_shared_faces = self._audit(bm, uv_layer, region, region_key, texture_size,
+                                                                    tile_mode == PAGES)
+            region_key = frozenset(face.index for face in region)
+            bench_end("Audit UVs")
+
+        solve_key = (region_key, pixels_per_unit, symmetry_mode, instance_mode, instance_rotation, merge_islands)
+        if keep_correct_uvs and not region:
+            islands, shared_faces = [], set()
+        elif solve_key in self.solutions:
+            log(INFO, "Reusing the faces solved on a previous run")
+            islands, shared_faces, solve_stats = self.solutions[solve_key]
+            stats.copy_solve_counts(solve_stats)
+            stats.solve_reused = True
+        else:
+            islands, shared_faces = self._solve_islands(bm, uv_layer, region, region_key, symmetry_mode,
+                                                        instance_mode, instance_rotation, streaming,
+                                                        stitch_time_limit, merge_islands)
+            # A solve cut by the time limit depends on how fast it ran, so it is not worth keeping
+            if not stats.degraded_faces and not stats.merge_cut_short:
+                self.solutions[solve_key] = (islands, shared_faces, stats)
+
+        if keep_correct_uvs:
+            offsets = self._pack_around(islands, fixed_islands, shared_faces | fixed_shared_faces, uv_layer,
+                                        texture_size, tile_mode)
+            islands = fixed_islands + islands
+            shared_faces = shared_faces | fixed_shared_faces
+        else:
+            texture_size, offsets = self._pack(islands, shared_faces, uv_layer, extra_uv_layers, texture_size,
+                                               tile_mode, packing, auto_texture_size, auto_texture_size_step)
+
+        if verify_overlaps:
+            log(INFO, "Verifying packed UVs...")
+            bench_start("Verify overlaps")
+            # Atlas pages share the same UV space, so only faces on the same page can overlap
+            faces_by_page = {}
+            for island, offset in zip(islands, offsets):
+                for face, face_uvs in zip(island.faces, get_packed_uvs(island, offset, texture_size, tile_mode)):
+                    if face not in shared_faces:
+                        page = offset[2] if tile_mode == PAGES else 0
+                        faces_by_page.setdefault(page, []).append((face.index, face_uvs))
+            for page_faces in faces_by_page.values():
+                stats.overlaps += find_uv_overlaps(page_faces, 1.0 / float(texture_size))
+            bench_end("Verify overlaps")
+        self._update_mesh(bm, [uv_layer] + list(extra_uv_layers.values()), tile_mode == PAGES)
+        self._remember_texture_size(texture_size)
+
+        if report_memory:
+            stats.peak_memory = tracemalloc.get_traced_memory()[1]
+            if tracing_memory:
+                tracemalloc.stop()
+            log(INFO, "Peak memory: " + str(round(stats.peak_memory / (1024.0 * 1024.0), 2)) + " MB")
+        return end_stats()
+
+    def repack(self, texture_size: int, tile_mode: str = UDIM, packing: str = COLUMNS,
+               auto_texture_size: bool = False, auto_texture_size_step: int = 0,
+               source_texture_size: int = None) -> PixerStats:
+        """Packs the current UVs again without solving the faces and returns the stats of the run.
+
+        The islands are read back from the active UV layer, so any size, tile mode or packing can be used without
+        going through the whole pixelization again. Options are the same as the ones of pixelize.
+        source_texture_size: texture size the current UVs were pixelized for. By default it is the one of the last
+            pixelize or repack of this mesh
+        """
+        log(INFO, "Starting UV repacking!")
+        stats = start_stats()
+        bench_start("Load model")
+        bm = self._get_bmesh()
+        uv_layer = bm.loops.layers.uv.active
+        if uv_layer is None:
+            raise Exception("The model has no UVs to repack!")
+        bench_end("Load model")
+        source_texture_size = source_texture_size or self._get_last_texture_size()
+        if not source_texture_size:
+            raise Exception("Cannot tell the texture size of the current UVs, pixelize the model first")
+
+        log(INFO, "Reading UV islands...")
+        bench_start("Read UVs")
+        islands, shared_faces = read_uv_islands(list(bm.faces), uv_layer, source_texture_size, tile_mode == PAGES)
+        bench_end("Read UVs")
+        log(INFO, "Found " + str(len(islands)) + " islands")
+
+        texture_size, _ = self._pack(islands, shared_faces, uv_layer, {}, texture_size, tile_mode, packing,
+                                     auto_texture_size, auto_texture_size_step)
+        self._update_mesh(bm, [uv_layer], tile_mode == PAGES)
+        self._remember_texture_size(texture_size)
+        return end_stats()
+
+    # Packs the islands and writes them on the UV layers, extra layers with their own size. Returns the texture size
+    # used and the offsets of the islands on it
+    def _pack(self, islands: List[IslandSummary], shared_faces: set, uv_layer, extra_uv_layers: dict,
+              texture_size: int, tile_mode: str, packing: str, auto_texture_size: bool,
+              auto_texture_size_step: int) -> Tuple[int, List[Tuple[int, int, int, bool]]]:
+        stats = get_stats()
+        log(INFO, "Packing and snapping UVs...")
+        bench_start("UV Packing")
+        if auto_texture_size:
+            texture_size = find_minimum_texture_size(islands, auto_texture_size_step, packing)
+            log(INFO, "Using texture size " + str(texture_size))
+        stats.texture_size = texture_size
+        extra_offsets = {}
+        for extra_texture_size in extra_uv_layers:
+            extra_offsets[extra_texture_size] = pack_islands(islands, extra_texture_size, packing)
+            stats.tiles_used[extra_texture_size] = get_tiles_used(extra_offsets[extra_texture_size])
+        offsets = pack_islands(islands, texture_size, packing)
+        stats.tiles_used[texture_size] = get_tiles_used(offsets)
+        bench_end("UV Packing")
+
+        bench_start("Snap UVs")
+        for extra_texture_size, extra_uv_layer in extra_uv_layers.items():
+            log(INFO, "Writing UVs for texture size " + str(extra_texture_size) + "...")
+            write_packed_uvs(islands, extra_offsets[extra_texture_size], extra_uv_layer, extra_texture_size, tile_mode,
+                             False)
+        write_packed_uvs(islands, offsets, uv_layer, texture_size, tile_mode)
+        bench_end("Snap UVs")
+        self._count_islands(islands, shared_faces, texture_size)
+        return texture_size, offsets
+
+    # Packs the islands in the space the fixed islands leave free and writes only them, the fixed islands stay as
+    # they are. Returns the offsets of the fixed islands followed by the ones of the islands
+    def _pack_around(self, islands: List[IslandSummary], fixed_islands: List[IslandSummary], shared_faces: set,
+                     uv_layer, texture_size: int, tile_mode: str) -> List[Tuple[int, int, int, bool]]:
+        stats = get_stats()
+        log(INFO, "Packing and snapping UVs...")
+        bench_start("UV Packing")
+        stats.texture_size = texture_size
+        fixed_offsets, offsets = pack_islands_around(islands, fixed_islands, texture_size, tile_mode)
+        stats.tiles_used[texture_size] = get_tiles_used(fixed_offsets + offsets)
+        bench_end("UV Packing")
+
+        bench_start("Snap UVs")
+        write_packed_uvs(islands, offsets, uv_layer, texture_size, tile_mode)
+        bench_end("Snap UVs")
+        self._count_islands(fixed_islands + islands, shared_faces, texture_size)
+        return fixed_offsets + offsets
+
+    def _count_islands(self, islands: List[IslandSummary], shared_faces: set, texture_size: int):
+        stats = get_stats()
+        stats.island_sizes = [len(island.faces) for island in islands]
+        stats.texel_fill_ratio = sum(polygon_area(face_uvs) for island in islands
+                                     for face, face_uvs in zip(island.faces, island.uvs)
+                                     if face not in shared_faces) \
+            / float(texture_size * texture_size * stats.tiles_used[texture_size])
+
+    # Splits the faces in the islands they have on the current UVs. Returns the faces of the islands that have any
+    # face that is not pixel perfect, the other islands, which can be kept, and the faces that share texels in them
+    def _audit(self, bm: BMesh, uv_layer, region: [BMFace], region_key, texture_size: int,
+               by_page: bool) -> Tuple[List[BMFace], List[IslandSummary], set]:
+        records = self._parse(bm, region, region_key)
+        faces = [bm.faces[face_index] for face_index in records.get_face_indices(self.only_selection)]
+        failing = {bm.faces[face_index] for face_index in audit_faces(bm, records, uv_layer, texture_size,
+                                                                      self.pixels_per_3d_unit)}
+        faces_uvs, _ = read_pixel_uvs(faces, uv_layer, texture_size)
+        unsolved_faces = []
+        fixed_faces = []
+        for indices in group_uv_islands(faces, faces_uvs, by_page):
+            island_faces = [faces[i] for i in indices]
+            if any(face in failing for face in island_faces):
+                unsolved_faces += island_faces
+            else:
+                fixed_faces += island_faces
+        fixed_islands, fixed_shared_faces = read_uv_islands(fixed_faces, uv_layer, texture_size, by_page)
+        get_stats().kept_faces = len(fixed_faces)
+        log(INFO, str(len(fixed_faces)) + " faces are pixel perfect already, solving the other "
+            + str(len(unsolved_faces)))
+        return unsolved_faces, fixed_islands, fixed_shared_faces
+
+    # The texture size of the last UVs written is kept on the mesh too, so they can be repacked in later sessions
+    def _remember_texture_size(self, texture_size: int):
+        self.texture_size = texture_size
+        if self.mesh is not None:
+            self.mesh[TEXTURE_SIZE_PROPERTY] = texture_size
+
+    def _get_last_texture_size(self) -> int:
+        if self.texture_size:
+            return self.texture_size
+        return self.mesh.get(TEXTURE_SIZE_PROPERTY, 0) if self.mesh is not None else 0
+
+    # Returns the bmesh to work on. The bmesh made for a mesh that is not in edit mode is only reused while the mesh
+    # has not changed since it was read or written, and the cache is dropped whenever the bmesh is another one
+    def _get_bmesh(self) -> BMesh:
+        if self.mesh is None:
+            bm = self.bm
+        elif self.mesh.is_editmode:
+            if self.owns_bm:
+                self.invalidate()
+            bm = bmesh.from_edit_mesh(self.mesh)
+        else:
+            checksum = get_mesh_checksum(self.mesh)
+            if self.owns_bm and self.bm.is_valid and checksum == self.mesh_checksum:
+                bm = self.bm
+            else:
+                self.invalidate()
+                bm = bmesh.new()
+                bm.from_mesh(self.mesh)
+                self.owns_bm = True
+                self.mesh_checksum = checksum
+        # The previous bmesh is still referenced until here, so a new one cannot be mistaken for it
+        topology = (len(bm.verts), len(bm.edges), len(bm.faces))
+        if bm is not self.bm or topology != self.topology:
+            self._forget()
+            self.topology = topology
+            # Indices stay valid while the topology does not change, so only new or changed meshes are indexed
+            bm.faces.index_update()
+        self.bm = bm
+        bm.faces.ensure_lookup_table()
+        return bm
+
+    # Finding the selected faces can mean going through the whole mesh, so they are only found again when the session
+    # is invalidated or, in edit mode, when the selection changed. As many selected faces as before that are all still
+    # selected are the same selection, which only takes going through the selected faces to know
+    def _get_selection(self, bm: BMesh) -> [BMFace]:
+        if self.selection is None or (self.mesh is not None and self.mesh.is_editmode
+                                      and not self._is_same_selection()):
+            self.selection = get_selected_faces(bm, self.mesh)
+        return self.selection
+
+    def _is_same_selection(self) -> bool:
+        return len(self.selection) == self.mesh.total_face_sel \
+            and all(face.is_valid and face.select for face in self.selection)
+
+    # A mesh in edit mode is updated from its bmesh. Other meshes only get the UV layers and the pages pixer wrote, so
+    # nothing else that changed on them is overwritten with what the bmesh has
+    def _update_mesh(self, bm: BMesh, uv_layers: list, pages: bool):
+        if self.mesh is None:
+            return
+        if self.mesh.is_editmode:
+            bmesh.update_edit_mesh(self.mesh, loop_triangles=False, destructive=False)
+            return
+        loop_starts = np.empty(len(self.mesh.polygons), dtype=np.int32)
+        self.mesh.polygons.foreach_get("loop_start", loop_starts)
+        loop_starts = loop_starts.tolist()
+        for uv_layer in uv_layers:
+            uvs = np.empty((len(self.mesh.loops), 2), dtype=np.float32)
+            for face, start in zip(bm.faces, loop_starts):
+                for i, loop in enumerate(face.loops):
+                    uvs[start + i] = loop[uv_layer].uv
+            mesh_uv_layer = self.mesh.uv_layers.get(uv_layer.name) or self.mesh.uv_layers.new(name=uv_layer.name)
+            mesh_uv_layer.data.foreach_set("uv", uvs.ravel())
+        if pages:
+            self.mesh.polygons.foreach_set("material_index", [face.material_index for face in bm.faces])
+        self.mesh.update()
+        self.mesh_checksum = get_mesh_checksum(self.mesh)
+
+    def _validate(self, bm: BMesh, region: [BMFace]):
+        if self.validated_all:
+            return
+        if region is None:
+            validate(bm)
+            self.validated_all = True
+            return
+        faces = get_faces_with_one_ring(region)
+        if not self.validated_faces.issuperset(faces):
+            validate(bm, faces)
+            self.validated_faces.update(faces)
+
+    def _parse(self, bm: BMesh, region: [BMFace], region_key):
+        if region_key not in self.records:
+            if region is not None:
+                self.records[region_key] = parse_region(bm, region)
+            elif self.obj is not None and self.mesh is not None and self.mesh.is_editmode:
+                self.records[region_key] = parse_faces(self.obj, bm)
+            else:
+                self.records[region_key] = parse_region(bm, list(bm.faces))
+        return self.records[region_key]
+
+    # Solves the faces in pixel units and returns their islands, plus the faces that share texels with other faces,
+    # which are left out of the stats and the overlap check
+    def _solve_islands(self, bm: BMesh, uv_layer, region: [BMFace], region_key, symmetry_mode: str,
+                       instance_mode: str, instance_rotation: bool, streaming: bool,
+                       stitch_time_limit: float, merge_islands: bool) -> Tuple[List[IslandSummary], set]:
+        stats = get_stats()
+        mirrored_faces = {}
+        if symmetry_mode != NONE:
+            log(INFO, "Finding mirrored faces...")
+            bench_start("Find mirrored faces")
+            if region_key not in self.mirrored_faces:
+                self.mirrored_faces[region_key] = find_mirrored_faces(bm.faces if region is None else region)
+            mirrored_faces = self.mirrored_faces[region_key]
+            stats.mirrored_faces = len(mirrored_faces)
+            bench_end("Find mirrored faces")
+
+        instanced_faces = {}
+        if instance_mode != NONE:
+            log(INFO, "Finding repeated components...")
+            bench_start("Find repeated components")
+            instanced_faces = find_instanced_faces([face for face in (bm.faces if region is None else region)
+                                                    if face not in mirrored_faces],
+                                                   self.pixels_per_3d_unit, instance_rotation)
+            stats.instanced_faces = len(instanced_faces)
+            bench_end("Find repeated components")
+
+        log(INFO, "Parsing faces...")
+        bench_start("Parse faces")
+        excluded = set(mirrored_faces) | set(instanced_faces)
+        XFace.init(uv_layer, self._parse(bm, region, region_key), None if region is None else set(region), excluded)
+        faces = [bm.faces[face_index] for face_index in XFace.RECORDS.get_face_indices(self.only_selection)
+                 if XFace.in_scope(bm.faces[face_index])]
+        if not streaming:
+            top, lateral, down = self._get_xfaces(faces)
+        bench_end("Parse faces")
+
+        log(INFO, "Solving faces...")
+        bench_start("Solve and stitch faces")
+        # Once the time limit is reached faces are still solved, but not stitched anymore
+        self.stitch_deadline = time.perf_counter() + stitch_time_limit if stitch_time_limit > 0 else None
+        shared_faces = set()
+        if streaming:
+            islands = self._solve_by_component(faces)
+        else:
+            uv_islands_map = self._solve_by_plane(lateral, top, down)
+            # Copies go first, as a mirrored face may come from a face that is a copy
+            if instanced_faces:
+                log(INFO, "Copying repeated components...")
+                derive_faces(instanced_faces, uv_islands_map, instance_mode == SHARE_ISLAND)
+                if instance_mode == SHARE_ISLAND:
+                    shared_faces.update(instanced_faces)
+            if mirrored_faces:
+                log(INFO, "Mirroring faces...")
+                derive_faces(mirrored_faces, uv_islands_map, symmetry_mode == SHARE, symmetry_mode == MIRROR)
+                if symmetry_mode == SHARE:
+                    shared_faces.update(mirrored_faces)
+            islands = summarize_islands(get_uv_islands(uv_islands_map))
+        # Solved islands are kept as summaries, so the XFaces and their packed UVs can go
+        XFace.ALL_XFACES = {}
+        reset_island_polygons()
+        bench_end("Solve and stitch faces")
+
+        if merge_islands:
+            log(INFO, "Merging islands...")
+            bench_start("Merge islands")
+            islands = merge_neighbor_islands(islands, shared_faces, self.stitch_deadline)
+            bench_end("Merge islands")
+        return islands, shared_faces
+
+    def _solve_by_plane(self, lateral: [XFace], top: [XFace], down: [XFace]) -> Dict[BMFace, List[XFace]]:
+        if self.separate_by_plane:
+            uv_islands_map = self._solve(lateral)
+            uv_islands_map = self._solve(top, uv_islands_map)
+            return self._solve(down, uv_islands_map)
+        return self._solve(lateral + top + down)
+
+    # Solves one connected component at a time, keeping only the summary of its islands, so the memory used by the
+    # XFaces depends on the size of the biggest component instead of the size of the whole mesh
+    def _solve_by_component(self, faces: [BMFace]) -> List[IslandSummary]:
+        islands = []
+        for component in get_connected_components(faces):
+            top, lateral, down = self._get_xfaces(component)
+            islands += summarize_islands(get_uv_islands(self._solve_by_plane(lateral, top, down)))
+            XFace.ALL_XFACES = {}
+            reset_island_polygons()
+        return islands
+
+    def _get_xfaces(self, faces: [BMFace]):
+        lateral_xfaces = []
+        top_xfaces = []
+        down_xfaces = []
+        for face in faces:
+            new_xface = XFace(face)
+            get_stats().count_face(new_xface.get_plane_string())
+            if new_xface.get_plane() == XFace.LATERAL:
+                lateral_xfaces.append(new_xface)
+            elif new_xface.get_plane() == XFace.TOP:
+                top_xfaces.append(new_xface)
+            else:
+                down_xfaces.append(new_xface)
+        log(DEBUG, "Lateral faces: " + str(len(lateral_xfaces)))
+        for xface in lateral_xfaces:
+            log(DEBUG, xface)
+        log(DEBUG, "Top faces: " + str(len(top_xfaces)))
+        for xface in top_xfaces:
+            log(DEBUG, xface)
+        log(DEBUG, "Down faces: " + str(len(down_xfaces)))
+        for xface in down_xfaces:
+            log(DEBUG, xface)
+        return top_xfaces, lateral_xfaces, down_xfaces
+
+    def _solve(self, all_faces: [XFace],
+               uv_islands_by_xface: Dict[BMFace, List[XFace]] = None) -> Dict[BMFace, List[XFace]]:
+        if uv_islands_by_xface is None:
+            uv_islands_by_xface = {}
+        for xface in all_faces:
+            if not xface.solved():
+                next_xfaces = [xface]
+                while len(next_xfaces) > 0:
+                    current = next_xfaces.pop(0)
+                    log(DEBUG, "Solving face " + str(current))
+                    if self.bench_faces:
+                        bench_start("Solve face " + str(current.get_face().index), "Solve and stitch faces")
+                    solve_face(current, self.pixels_per_3d_unit, SOLVE_PIXEL_SIZE)
+                    if self.bench_faces:
+                        bench_end("Solve face " + str(current.get_face().index), "Solve and stitch faces")
+
+                    stitched = False
+                    linked_solved, linked_unsolved = self._get_linked_faces_for(current)
+                    linked_edge_solved = []
+                    for linked in linked_solved:
+                        if current.get_common_edges(linked):
+                            linked_edge_solved.append(linked)
+
+                    linked_vertex_solved = []
+                    for linked in linked_solved:
+                        if linked not in linked_edge_solved:
+                            linked_vertex_solved.append(linked)
+
+                    linked_edge_unsolved = []
+                    for linked in linked_unsolved:
+                        if current.get_common_edges(linked):
+                            linked_edge_unsolved.append(linked)
+
+                    if self.stitch_deadline is not None and time.perf_counter() > self.stitch_deadline \
+                            and linked_solved:
+                        log(DEBUG, "Out of stitch time, face " + str(current) + " is left as its own island")
+                        get_stats().degraded_faces += 1
+                        linked_edge_solved = []
+                        linked_vertex_solved = []
+
+                    if self.bench_faces:
+                        bench_start("Stitch face " + str(current.get_face().index), "Solve and stitch faces")
+                    for linked in linked_edge_solved:
+                        try:
+                            log(DEBUG, "Stitching face " + str(current) + " to near linked face " + str(linked))
+                            stitch(current, linked, uv_islands_by_xface[linked.get_face()])
+                        except StitchingError as error:
+                            log(DEBUG, "The face " + str(current) + " cannot be stitched to " + str(linked)
+                                + " because of " + str(error))
+                            get_stats().count_stitch_attempt(str(error))
+                        except Exception as error:
+                            log(ERROR, "Unexpected exception " + str(error))
+                            raise error
+                        else:
+                            log(DEBUG, "Face " + str(current) + " was stitched to face " + str(linked))
+                            get_stats().count_stitch_attempt("Stitched by edge")
+                            uv_islands_by_xface[linked.get_face()].append(current)
+                            uv_islands_by_xface[current.get_face()] = uv_islands_by_xface[linked.get_face()]
+                            stitched = True
+                            break
+
+                    if not stitched and linked_vertex_solved and not linked_edge_unsolved:
+                        log(DEBUG, "Failed to stitch face by edge to near solved faces, trying to stitch it by vertex")
+                        for linked in linked_vertex_solved:
+                            try:
+                                log(DEBUG, "Stitching face " + str(current) + " to near linked face " + str(linked))
+                                stitch_by_vertex(current, linked, uv_islands_by_xface[linked.get_face()])
+                            except StitchingError as error:
+                                log(DEBUG, "The face " + str(current) + " cannot be stitched to " + str(linked)
+                                    + " because of " + str(error))
+                                get_stats().count_stitch_attempt(str(error))
+                            except Exception as error:
+                                log(ERROR, "Unexpected exception " + str(error))
+                                raise error
+                            else:
+                                log(DEBUG, "Face " + str(current) + " was stitched to face " + str(linked))
+                                get_stats().count_stitch_attempt("Stitched by vertex")
+                                uv_islands_by_xface[linked.get_face()].append(current)
+                                uv_islands_by_xface[current.get_face()] = uv_islands_by_xface[linked.get_face()]
+                                stitched = True
+                                break
+                    if self.bench_faces:
+                        bench_end("Stitch face " + str(current.get_face().index), "Solve and stitch faces")
+
+                    if not stitched:
+                        log(DEBUG, "Face " + str(current) + " was not stitched to any near solved faces")
+                        uv_islands_by_xface[current.get_face()] = [current]
+
+                    log(DEBUG, "Detected near unsolved faces")
+                    for n in linked_unsolved:
+                        log(DEBUG, str(n))
+
+                    for linked in linked_unsolved:
+                        if linked not in next_xfaces:
+                            if not self.separate_by_plane or linked.get_plane() == current.get_plane():
+                                next_xfaces.append(linked)
+
+                    next_xfaces = sorted(next_xfaces, key=lambda sorting_xface: sorting_xface.get_score(), reverse=True)
+                    if next_xfaces:
+                        log(DEBUG, "Next near xfaces to solve and stitch")
+                        for n in next_xfaces:
+                            log(DEBUG, str(n))
+        return uv_islands_by_xface
+
+    def _get_linked_faces_for(self, xface: XFace) -> Tuple[List[XFace], List[XFace]]:
+        linked_solved = set()
+        linked_unsolved = set()
+        for linked_xface in xface.get_linked_xfaces():
+            if not self.only_selection or linked_xface.get_face().select:
+                if linked_xface.solved():
+                    linked_solved.add(linked_xface)
+                else:
+                    linked_unsolved.add(linked_xface)
+        return list(linked_solved), list(linked_unsolved)
+
+
@@ -0,0 +1,195 @@
+# BACKGROUND JOB
+# Runs a pixelization in another Blender process, started in background mode, so the Blender the artist works on only
+# has to copy the mesh out and the UVs back in. The mesh goes through a memory mapped file that both processes map,
+# laid out as flat arrays like the ones foreach_get and foreach_set work with, so it is never copied item by item.
+# The helper process writes the stage it is on in the header of the same file, so progress can be shown while it runs.
+# This file is also the script the helper process runs, for a single job or, with --serve, for every job folder it
+# is sent on its input, see workerpool. As a script it cannot use relative imports until it imports itself again
+# from the package:
+#   blender --background --factory-startup --python backgroundjob.py -- <addon folder> <package name> <job folder>
+#   blender --background --factory-startup --python backgroundjob.py -- <addon folder> <package name> --serve
+import json
+import mmap
+import os
+import pickle
+import sys
+import traceback
+import zlib
+from typing import Dict, Tuple
+
+import numpy as np
+
+# Files in the job folder
+MESH_FILE = "mesh.bin"
+SETTINGS_FILE = "settings.json"
+STATS_FILE = "stats.pickle"
+ERROR_FILE = "error.txt"
+
+# Fields of the header of the mesh file
+BUFFER_VERSION = 1
+VERSION, VERT_COUNT, FACE_COUNT, LOOP_COUNT, STATE, STAGE = range(6)
+HEADER_FIELDS = 8
+STAGE_NAME_BYTES = 64
+
+# States of the job
+RUNNING = 0
+DONE = 1
+FAILED = 2
+# Argument that keeps the helper process waiting for jobs instead of running just one
+SERVE = "--serve"
+
+
+class JobBuffer:
+    # Creates the file if the counts are given, otherwise opens the one there is
+    def __init__(self, path: str, counts: Tuple[int, int, int] = None):
+        if counts is not None:
+            with open(path, "wb") as buffer_file:
+                buffer_file.truncate(_get_buffer_size(*counts))
+        self.file = open(path, "r+b")
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.header = np.frombuffer(self.map, dtype=np.int64, count=HEADER_FIELDS)
+        if counts is not None:
+            self.header[:] = 0
+            self.header[VERSION] = BUFFER_VERSION
+            self.header[VERT_COUNT:LOOP_COUNT + 1] = counts
+        elif self.header[VERSION] != BUFFER_VERSION:
+            raise Exception("The job was written by another version of pixer")
+        self.arrays = _get_arrays(self.map, *self.header[VERT_COUNT:LOOP_COUNT + 1])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.arrays[name]
+
+    def get_state(self) -> int:
+        return int(self.header[STATE])
+
+    def set_state(self, state: int):
+        self.header[STATE] = state
+        self.map.flush()
+
+    def get_stage(self) -> Tuple[int, str]:
+        return int(self.header[STAGE]), bytes(self.arrays["stage_name"]).rstrip(b"\0").decode("utf-8", "replace")
+
+    def start_stage(self, name: str):
+        encoded = name.encode("utf-8")[:STAGE_NAME_BYTES]
+        self.arrays["stage_name"][:] = 0
+        self.arrays["stage_name"][:len(encoded)] = np.frombuffer(encoded, dtype=np.uint8)
+        self.header[STAGE] += 1
+
+    def close(self):
+        # The arrays point into the map, so they have to go before it can be closed
+        self.header = None
+        self.arrays = None
+        self.map.close()
+        self.file.close()
+
+
+def _get_buffer_size(vert_count: int, face_count: int, loop_count: int) -> int:
+    return sum(np.dtype(dtype).itemsize * count for _, dtype, count
+               in _get_layout(vert_count, face_count, loop_count))
+
+
+# Arrays go from the widest type to the narrowest one so all of them are aligned
+def _get_layout(vert_count: int, face_count: int, loop_count: int):
+    return [("header", np.int64, HEADER_FIELDS),
+            ("coordinates", np.float32, vert_count * 3),
+            ("uvs", np.float32, loop_count * 2),
+            ("loop_starts", np.int32, face_count),
+            ("loop_totals", np.int32, face_count),
+            ("material_indices", np.int32, face_count),
+            ("loop_vertices", np.int32, loop_count),
+            ("selected", np.bool_, face_count),
+            ("stage_name", np.uint8, STAGE_NAME_BYTES)]
+
+
+def _get_arrays(buffer, vert_count: int, face_count: int, loop_count: int) -> Dict[str, np.ndarray]:
+    arrays = {}
+    offset = 0
+    for name, dtype, count in _get_layout(int(vert_count), int(face_count), int(loop_count)):
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+        offset += np.dtype(dtype).itemsize * count
+    return arrays
+
+
+# Helper process side. Solves the job and saves its stats, or the error if it fails
+def run_job(job_folder: str):
+    buffer = JobBuffer(os.path.join(job_folder, MESH_FILE))
+    try:
+        with open(os.path.join(job_folder, SETTINGS_FILE)) as settings_file:
+            settings = json.load(settings_file)
+        stats = _solve(buffer, settings)
+        with open(os.path.join(job_folder, STATS_FILE), "wb") as stats_file:
+            pickle.dump(stats, stats_file)
+        buffer.set_state(DONE)
+    except Exception as exception:
+        with open(os.path.join(job_folder, ERROR_FILE), "w") as error_file:
+            error_file.write(str(exception) + "\n" + traceback.format_exc())
+        buffer.set_state(FAILED)
+    buffer.close()
+
+
+# Builds a bmesh with the same vertex, face and loop order as the mesh that was written, solves it and writes the UVs
+# and material indices of every loop and face back on the same arrays
+def _solve(buffer: JobBuffer, settings: dict):
+    import bmesh
+    from .api import PixerSession
+    from .benchmarker import stage_listeners
+
+    bm = bmesh.new()
+    verts = [bm.verts.new(coordinate) for coordinate in buffer["coordinates"].reshape(-1, 3).tolist()]
+    loop_vertices = buffer["loop_vertices"].tolist()
+    loop_starts = buffer["loop_starts"].tolist()
+    for start, total, selected, material_index in zip(loop_starts, buffer["loop_totals"].tolist(),
+                                                      buffer["selected"].tolist(),
+                                                      buffer["material_indices"].tolist()):
+        face = bm.faces.new([verts[vertex] for vertex in loop_vertices[start:start + total]])
+        face.select = selected
+        face.material_index = material_index
+    bm.normal_update()
+    bm.faces.index_update()
+    uv_layer = bm.loops.layers.uv.verify()
+    uvs = buffer["uvs"].reshape(-1, 2).tolist()
+    for face, start in zip(bm.faces, loop_starts):
+        for i, loop in enumerate(face.loops):
+            loop[uv_layer].uv = uvs[start + i]
+
+    stage_listeners.append(buffer.start_stage)
+    try:
+        stats = PixerSession(bm).pixelize(**settings)
+    finally:
+        stage_listeners.remove(buffer.start_stage)
+
+    uvs = buffer["uvs"].reshape(-1, 2)
+    material_indices = buffer["material_indices"]
+    for face, start in zip(bm.faces, loop_starts):
+        material_indices[face.index] = face.material_index
+        for i, loop in enumerate(face.loops):
+            uvs[start + i] = loop[uv_layer].uv
+    bm.free()
+    return stats
+
+
+# Warm worker side. Imports the solver once and then runs every job folder it gets, one per line, until its input is
+# closed
+def serve():
+    from . import api
+    from .logger import log, INFO
+    log(INFO, "Worker ready, solver loaded from " + os.path.dirname(api.__file__))
+    for line in sys.stdin:
+        if line.strip():
+            run_job(line.strip())
+
+
+# Changes in the positions of the vertices or in which vertices each face uses change the signature
+def get_mesh_signature(coordinates: np.ndarray, loop_vertices: np.ndarray) -> int:
+    return zlib.crc32(loop_vertices.tobytes(), zlib.crc32(coordinates.tobytes()))
+
+
+if __name__ == "__main__":
+    # Blender passes the arguments after "--" to the script untouched
+    addon_folder, package_name, job = sys.argv[sys.argv.index("--") + 1:][:3]
+    sys.path.insert(0, addon_folder)
+    job_module = __import__(package_name + ".backgroundjob", fromlist=["run_job", "serve"])
+    if job == SERVE:
+        job_module.serve()
+    else:
+        job_module.run_job(job)
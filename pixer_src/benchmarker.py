@@ -1,16 +1,25 @@
 import time
 from .logger import *
+from .profiler import profile_stage_start, profile_stage_end
 
 start_times = {}
 end_times = {}
+# Called with the name of each top level stage when it starts, like to show the progress of a run somewhere else
+stage_listeners = []
 
 
 def bench_start(name: str, parent: str = None):
     save_bench(start_times, time.time(), name, parent)
+    if not parent:
+        profile_stage_start(name)
+        for listener in stage_listeners:
+            listener(name)
 
 
 def bench_end(name: str, parent: str = None):
     save_bench(end_times, time.time(), name, parent)
+    if not parent:
+        profile_stage_end(name)
 
 
 def save_bench(timestamps_map: map, timestamp: float, name: str, parent: str = None):
@@ -0,0 +1,46 @@
+# FACE DERIVER
+# Some faces do not need to be solved because they are a copy of another face that is solved (like the other half
+# of a symmetric model). This module gives them their UVs from the solved face they come from
+from typing import Dict, List, Tuple
+
+from bmesh.types import BMFace
+from mathutils import Vector
+
+from .logger import *
+from .xface import XFace
+
+# Each derived face points to the face it copies and, for each of its loops, the loop of the source face that has
+# the same vertex
+DerivedFaces = Dict[BMFace, Tuple[BMFace, List[int]]]
+
+
+# Gives UVs to the derived faces. If 'share' is true, derived faces use the same texels as their source faces and
+# join their islands. Otherwise each source island gets a copy made of the derived faces, flipped horizontally if
+# 'flip' is true
+def derive_faces(derived_faces: DerivedFaces, uv_islands_map: Dict[BMFace, List[XFace]], share: bool,
+                 flip: bool = False) -> List[XFace]:
+    derived_xfaces = []
+    copied_islands = {}
+    for face, (source_face, loop_map) in derived_faces.items():
+        source = XFace.ALL_XFACES.get(source_face)
+        if source is None or not source.solved():
+            log(WARN, "The face " + str(face.index) + " copies face " + str(source_face.index)
+                + " but it was not solved, skipping it")
+            continue
+
+        derived = XFace(face)
+        for i in range(derived.get_face_length()):
+            uv = source.get_uv(loop_map[i])
+            derived.update_uv(i, Vector((-uv.x, uv.y)) if flip else uv)
+        derived.solve()
+        derived_xfaces.append(derived)
+
+        source_island = uv_islands_map[source_face]
+        if share:
+            island = source_island
+        else:
+            island = copied_islands.setdefault(id(source_island), [])
+        island.append(derived)
+        uv_islands_map[face] = island
+    log(DEBUG, "Derived " + str(len(derived_xfaces)) + " faces from already solved faces")
+    return derived_xfaces
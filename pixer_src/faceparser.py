@@ -0,0 +1,188 @@
+# FACE PARSER
+# Reads the normals and loop coordinates of every face in bulk and classifies the plane of each face and the
+# alignment of each of its edges with array operations. The result is kept as compact per-face records that
+# XFace reads from, instead of every XFace finding it out on its own
+import zlib
+from math import cos, radians
+
+import numpy as np
+from bmesh.types import BMesh, BMFace
+
+from .logger import *
+from .xface import XFace
+
+
+class FaceRecords:
+    def __init__(self, planes: np.ndarray, loop_starts: np.ndarray, loop_totals: np.ndarray,
+                 horizontal: np.ndarray, vertical: np.ndarray, selected: np.ndarray, face_indices: [int] = None):
+        # Records of the whole mesh are stored by face index. Records of only some faces keep a row for each index
+        self.rows = None if face_indices is None else {index: row for row, index in enumerate(face_indices)}
+        self.face_indices = face_indices
+        self.planes = planes
+        self.loop_starts = loop_starts
+        self.loop_totals = loop_totals
+        self.horizontal = horizontal
+        self.vertical = vertical
+        self.selected = selected
+
+    def get_face_count(self) -> int:
+        return len(self.planes)
+
+    def has(self, face_index: int) -> bool:
+        if self.rows is not None:
+            return face_index in self.rows
+        return 0 <= face_index < len(self.planes)
+
+    def get_plane(self, face_index: int) -> int:
+        return int(self.planes[self._get_row(face_index)])
+
+    def get_horizontal_edges(self, face_index: int) -> [int]:
+        return self._get_edges(self.horizontal, face_index)
+
+    def get_vertical_edges(self, face_index: int) -> [int]:
+        return self._get_edges(self.vertical, face_index)
+
+    def get_face_indices(self, only_selection: bool) -> [int]:
+        rows = np.flatnonzero(self.selected).tolist() if only_selection else list(range(len(self.planes)))
+        if self.face_indices is not None:
+            return [self.face_indices[row] for row in rows]
+        return rows
+
+    def _get_row(self, face_index: int) -> int:
+        return face_index if self.rows is None else self.rows[face_index]
+
+    def _get_edges(self, edges: np.ndarray, face_index: int) -> [int]:
+        row = self._get_row(face_index)
+        start = self.loop_starts[row]
+        return np.flatnonzero(edges[start:start + self.loop_totals[row]]).tolist()
+
+
+def parse_faces(obj, bm: BMesh) -> FaceRecords:
+    # Make sure face indices in the bmesh match the polygon indices of the mesh we read from
+    bm.faces.index_update()
+    bm.faces.ensure_lookup_table()
+    obj.update_from_editmode()
+    me = obj.data
+
+    face_count = len(me.polygons)
+    loop_count = len(me.loops)
+    normals = np.empty(face_count * 3, dtype=np.float32)
+    me.polygons.foreach_get("normal", normals)
+    loop_starts = np.empty(face_count, dtype=np.int32)
+    me.polygons.foreach_get("loop_start", loop_starts)
+    loop_totals = np.empty(face_count, dtype=np.int32)
+    me.polygons.foreach_get("loop_total", loop_totals)
+    selected = np.empty(face_count, dtype=bool)
+    me.polygons.foreach_get("select", selected)
+    coordinates = np.empty(len(me.vertices) * 3, dtype=np.float32)
+    me.vertices.foreach_get("co", coordinates)
+    loop_vertices = np.empty(loop_count, dtype=np.int32)
+    me.loops.foreach_get("vertex_index", loop_vertices)
+
+    records = classify_faces(normals.reshape(-1, 3), loop_starts, loop_totals,
+                             coordinates.reshape(-1, 3)[loop_vertices], selected)
+    log(DEBUG, "Parsed " + str(face_count) + " faces and " + str(loop_count) + " loops")
+    return records
+
+
+# Same as parse_faces but only for the given faces, reading them straight from the bmesh. The cost depends only on
+# how many faces are given, not on the size of the whole mesh, so the face indices have to be up to date already
+def parse_region(bm: BMesh, faces: [BMFace]) -> FaceRecords:
+    normals = np.array([face.normal for face in faces], dtype=np.float32).reshape(-1, 3)
+    loop_totals = np.array([len(face.loops) for face in faces], dtype=np.int32)
+    loop_starts = np.zeros(len(faces), dtype=np.int32)
+    loop_starts[1:] = np.cumsum(loop_totals)[:-1]
+    loop_coordinates = np.array([loop.vert.co for face in faces for loop in face.loops],
+                                dtype=np.float32).reshape(-1, 3)
+    selected = np.array([face.select for face in faces], dtype=bool)
+    log(DEBUG, "Parsed " + str(len(faces)) + " faces and " + str(len(loop_coordinates)) + " loops")
+    return classify_faces(normals, loop_starts, loop_totals, loop_coordinates, selected,
+                          [face.index for face in faces])
+
+
+# Returns the selected faces of the bmesh. If it was made from a mesh in object mode the selection is read in bulk from
+# the mesh, in edit mode the faces are gone through only until all the selected ones are found
+def get_selected_faces(bm: BMesh, mesh=None) -> [BMFace]:
+    if mesh is not None and not mesh.is_editmode:
+        selected = np.empty(len(mesh.polygons), dtype=bool)
+        mesh.polygons.foreach_get("select", selected)
+        bm.faces.ensure_lookup_table()
+        return [bm.faces[face_index] for face_index in np.flatnonzero(selected).tolist()]
+    remaining = mesh.total_face_sel if mesh is not None else len(bm.faces)
+    faces = []
+    for face in bm.faces:
+        if remaining == 0:
+            break
+        if face.select:
+            faces.append(face)
+            remaining -= 1
+    return faces
+
+
+# Changes to the positions of the vertices, the vertices of each face, the selection, the active UVs or the material
+# indices of the mesh change the checksum. Everything is read in bulk, so it costs much less than a new bmesh
+def get_mesh_checksum(mesh) -> int:
+    arrays = [np.empty(len(mesh.vertices) * 3, dtype=np.float32), np.empty(len(mesh.loops), dtype=np.int32),
+              np.empty(len(mesh.polygons), dtype=bool), np.empty(len(mesh.polygons), dtype=np.int32)]
+    mesh.vertices.foreach_get("co", arrays[0])
+    mesh.loops.foreach_get("vertex_index", arrays[1])
+    mesh.polygons.foreach_get("select", arrays[2])
+    mesh.polygons.foreach_get("material_index", arrays[3])
+    if mesh.uv_layers.active is not None:
+        arrays.append(np.empty(len(mesh.loops) * 2, dtype=np.float32))
+        mesh.uv_layers.active.data.foreach_get("uv", arrays[-1])
+    checksum = 0
+    for array in arrays:
+        checksum = zlib.crc32(array.tobytes(), checksum)
+    return checksum
+
+
+# Returns the given faces plus the faces that share any vertex with them
+def get_faces_with_one_ring(faces: [BMFace]) -> [BMFace]:
+    region = set(faces)
+    ring = {linked for face in faces for vert in face.verts for linked in vert.link_faces if linked not in region}
+    return list(faces) + list(ring)
+
+
+def get_connected_components(faces: [BMFace]) -> [[BMFace]]:
+    remaining = set(faces)
+    components = []
+    for face in faces:
+        if face not in remaining:
+            continue
+        remaining.discard(face)
+        component = [face]
+        next_faces = [face]
+        while next_faces:
+            current = next_faces.pop()
+            for vert in current.verts:
+                for linked in vert.link_faces:
+                    if linked in remaining:
+                        remaining.discard(linked)
+                        component.append(linked)
+                        next_faces.append(linked)
+        components.append(component)
+    return components
+
+
+def classify_faces(normals: np.ndarray, loop_starts: np.ndarray, loop_totals: np.ndarray,
+                   loop_coordinates: np.ndarray, selected: np.ndarray, face_indices: [int] = None) -> FaceRecords:
+    # A face is TOP (or DOWN) when the angle between its normal and up (or down) is at most MIN_VERTICAL_ANGLE
+    lengths = np.linalg.norm(normals, axis=1)
+    normal_z = normals[:, 2] / np.where(lengths > 0.0, lengths, 1.0)
+    min_cos = cos(radians(XFace.MIN_VERTICAL_ANGLE))
+    planes = np.full(len(normals), XFace.LATERAL, dtype=np.int8)
+    planes[normal_z <= -min_cos] = XFace.DOWN
+    planes[normal_z >= min_cos] = XFace.TOP
+
+    # Edge i of a face goes from its loop i to its loop i + 1, wrapping on the last loop
+    next_loops = np.arange(1, len(loop_coordinates) + 1)
+    next_loops[loop_starts + loop_totals - 1] = loop_starts
+    curr_v = loop_coordinates
+    next_v = loop_coordinates[next_loops]
+    lateral = np.repeat(planes == XFace.LATERAL, loop_totals)
+
+    horizontal = np.where(lateral, curr_v[:, 2] == next_v[:, 2], curr_v[:, 1] == next_v[:, 1])
+    vertical = np.where(lateral, (curr_v[:, 0] == next_v[:, 0]) & (curr_v[:, 1] == next_v[:, 1]),
+                        curr_v[:, 0] == next_v[:, 0])
+    return FaceRecords(planes, loop_starts, loop_totals, horizontal, vertical, selected, face_indices)
@@ -1,17 +1,36 @@
 # FACE STITCHER
 # This module takes care of stitching 2 faces together once their UVs are all set
+from typing import Dict, List, Tuple
+
 from mathutils import Vector, Matrix
 from math import radians, sin, cos
 
-from .geometryutils import segments_intersect, segments_intersection_point
+from .geometryutils import segments_intersect, segments_intersection_point, segments_cross, are_the_same_points, \
+    get_winding_number
+from .overlapkernel import PackedPolygons, any_polygon_overlaps
+from .stats import get_stats
 from .utils import _almost_equal, _almost_equal_vectors
 from .xface import XFace
 
 
+# Islands with fewer faces are tested one face at a time, as setting up the arrays costs more than the loop.
+# benchmarks/fuzz_predicates.py prints the island size from which the kernel is faster, this is where it was measured
+KERNEL_MIN_FACES = 512
+
+
 class StitchingError(Exception):
     pass
 
 
+# Packed UVs of the islands being stitched to, by island. Islands only grow while solving and the faces in them do not
+# move, so only the faces added since the last stitch attempt have to be added to them
+island_polygons: Dict[int, Tuple[List[XFace], PackedPolygons]] = {}
+
+
+def reset_island_polygons():
+    island_polygons.clear()
+
+
 def stitch(xface: XFace, near: XFace, near_island_faces: [XFace]):
     common_edges = xface.get_common_edges(near)
     if not common_edges:
@@ -42,9 +61,8 @@ def stitch(xface: XFace, near: XFace, near_island_faces: [XFace]):
     for i in range(xface.get_face_length()):
         simulated_points[i] = simulated_points[i] + stitching_diff
 
-    for island_face in near_island_faces:
-        if _faces_overlap_in_uv(simulated_points, island_face):
-            raise StitchingError("Stitching to this face would overlap to existing faces")
+    if _overlaps_island(simulated_points, near_island_faces):
+        raise StitchingError("Stitching to this face would overlap to existing faces")
 
     for i in range(xface.get_face_length()):
         xface.update_uv(i, simulated_points[i])
@@ -63,15 +81,34 @@ def stitch_by_vertex(xface: XFace, near: XFace, near_island_faces: [XFace]):
     for i in range(xface.get_face_length()):
         simulated_points.append(xface.get_uv(i) + stitching_diff)
 
-    for island_face in near_island_faces:
-        if _faces_overlap_in_uv(simulated_points, island_face):
-            raise StitchingError("Stitching to this face would overlap to existing faces")
+    if _overlaps_island(simulated_points, near_island_faces):
+        raise StitchingError("Stitching to this face would overlap to existing faces")
 
     for i in range(xface.get_face_length()):
         xface.update_uv(i, simulated_points[i])
     return
 
 
+# Same as testing _faces_overlap_in_uv against every face of the island, but big islands are tested all at once
+# against the packed UVs of all their faces
+def _overlaps_island(simulated_points: [Vector], island_faces: [XFace]) -> bool:
+    get_stats().overlap_tests += len(island_faces)
+    if len(island_faces) < KERNEL_MIN_FACES:
+        simulated_bounds = (min(point.x for point in simulated_points), min(point.y for point in simulated_points),
+                            max(point.x for point in simulated_points), max(point.y for point in simulated_points))
+        return any(_faces_overlap_in_uv(simulated_points, simulated_bounds, island_face)
+                   for island_face in island_faces)
+    # The island itself is kept with its packed UVs, so its id cannot be given to another island while cached
+    cached = island_polygons.get(id(island_faces))
+    if cached is None or cached[0] is not island_faces:
+        cached = (island_faces, PackedPolygons())
+        island_polygons[id(island_faces)] = cached
+    polygons = cached[1]
+    for xface in island_faces[len(polygons):]:
+        polygons.add([(uv.x, uv.y) for uv in xface.get_all_uvs()])
+    return any_polygon_overlaps([(point.x, point.y) for point in simulated_points], polygons)
+
+
 def _same_uv_edge_length(xface: XFace, edge_index: int, other: XFace, other_edge_index: int):
     edge = xface.get_uv_edge(edge_index)
     other_edge = other.get_uv_edge(other_edge_index)
@@ -111,21 +148,23 @@ def _rotate_around(point_to_rotate, point_around, angle_radians):
     return ptr
 
 
-def _faces_overlap_in_uv(simulated_points: [Vector], xface: XFace) -> bool:
-    return _are_the_same_points(simulated_points, xface.get_all_uvs()) \
-           or _any_edges_intersect(simulated_points, xface.get_all_uvs()) \
-           or _any_point_inside(simulated_points, xface.get_all_uvs()) \
-           or _any_point_inside(xface.get_all_uvs(), simulated_points)
+def _faces_overlap_in_uv(simulated_points: [Vector], simulated_bounds: Tuple[float, float, float, float],
+                         xface: XFace) -> bool:
+    if _bounds_are_apart(simulated_bounds, xface.get_uv_bounds()):
+        return False
+    xface_uvs = xface.get_all_uvs()
+    return are_the_same_points(simulated_points, xface_uvs) \
+           or _any_edges_intersect(simulated_points, xface_uvs) \
+           or _any_point_inside(simulated_points, xface_uvs) \
+           or _any_point_inside(xface_uvs, simulated_points)
 
 
-def _are_the_same_points(points_a: [Vector], points_b: [Vector]) -> bool:
-    if len(points_a) != len(points_b):
-        return False
-    for point_a in points_a:
-        any_match = any(_almost_equal_vectors(point_a, point_b) for point_b in points_b)
-        if not any_match:
-            return False
-    return True
+# Only true when there is a real gap between the bounds, bounds that just touch can still give an overlap
+def _bounds_are_apart(bounds_a: Tuple[float, float, float, float], bounds_b: Tuple[float, float, float, float]):
+    return (bounds_a[0] > bounds_b[2] and not _almost_equal(bounds_a[0], bounds_b[2])) \
+        or (bounds_b[0] > bounds_a[2] and not _almost_equal(bounds_b[0], bounds_a[2])) \
+        or (bounds_a[1] > bounds_b[3] and not _almost_equal(bounds_a[1], bounds_b[3])) \
+        or (bounds_b[1] > bounds_a[3] and not _almost_equal(bounds_b[1], bounds_a[3]))
 
 
 def _any_edges_intersect(points_a: [Vector], points_b: [Vector]) -> bool:
@@ -141,23 +180,18 @@ def _any_edges_intersect(points_a: [Vector], points_b: [Vector]) -> bool:
     if _get_botmost_point_in(points_b).y > _get_topmost_point_in(points_a).y:
         return False
 
+    # Faces stitched together share edges and vertices, so only edges that really cross count
     for i in range(len(points_a)):
         curr_point_a = points_a[i]
         next_point_a = points_a[(i + 1) % (len(points_a))]
         for j in range(len(points_b)):
-            curr_point_b = points_a[i]
-            next_point_b = points_a[(i + 1) % (len(points_a))]
-            if not _is_the_same_segment(curr_point_a, next_point_a, curr_point_b, next_point_b) and \
-                    segments_intersect(curr_point_a, next_point_a, curr_point_b, next_point_b):
+            curr_point_b = points_b[j]
+            next_point_b = points_b[(j + 1) % (len(points_b))]
+            if segments_cross(curr_point_a, next_point_a, curr_point_b, next_point_b):
                 return True
     return False
 
 
-def _is_the_same_segment(p1: Vector, q1: Vector, p2: Vector, q2: Vector):
-    return (_almost_equal_vectors(p1, p2) and _almost_equal_vectors(q1, q2)) or \
-           (_almost_equal_vectors(p1, q2) and _almost_equal_vectors(p2, q1))
-
-
 # Returns true if all of the points in A are inside the polygon formed by the points in B
 def _all_points_inside(points_a: [Vector], points_b: [Vector]) -> bool:
     max_x = _get_rightmost_point_in(points_a + points_b).x + 1
@@ -215,34 +249,6 @@ def _get_botmost_point_in(points: [Vector]) -> Vector:
 def _any_point_inside(points_a: [Vector], points_b: [Vector]) -> bool:
     for point_a in points_a:
         if not any(_almost_equal_vectors(point_a, point_b) for point_b in points_b) \
-                and _get_winding_number(point_a, points_b):
+                and get_winding_number(point_a, points_b):
             return True
     return False
-
-
-def _get_winding_number(point: Vector, points: [Vector]):
-    winding_number = 0
-    for i in range(len(points)):
-        curr_point = points[i]
-        next_point = points[(i + 1) % len(points)]
-        if curr_point.y < point.y or _almost_equal(curr_point.y, point.y):
-            if next_point.y > point.y and not _almost_equal(next_point.y, point.y):
-                is_left = _is_at_left(curr_point, next_point, point)
-                if not _almost_equal(is_left, 0.0) and is_left > 0:
-                    winding_number += 1
-        else:
-            if next_point.y < point.y or _almost_equal(next_point.y, point.y):
-                is_left = _is_at_left(curr_point, next_point, point)
-                if not _almost_equal(is_left, 0.0) and is_left < 0:
-                    winding_number -= 1
-    return winding_number
-
-
-# _is_at_left: Tests if a point is Left|On|Right of an infinite line.
-#    Input:  three points p0, p1, and p2
-#    Return: >0 for p2 left of the line through p0 and p1
-#            =0 for p2 on the line
-#            <0 for p2 right of the line
-def _is_at_left(p0: Vector, p1: Vector, p2: Vector):
-    return ((p1.x - p0.x) * (p2.y - p0.y)) - ((p2.x - p0.x) * (p1.y - p0.y))
-
@@ -1,7 +1,7 @@
 # GEOMETRY UTILS
 # Some helper functions
 from mathutils import Vector
-from .utils import sign, _almost_equal
+from .utils import sign, _almost_equal, _almost_equal_vectors
 
 
 # Returns true if the segment 'p1q1' and 'p2q2' intersect
@@ -72,3 +72,73 @@ def _get_line_parameters(p1: Vector, q1: Vector):
     b = p1.x - q1.x
     c = a * p1.x + b * p1.y
     return a, b, c
+
+
+# Returns true only if the segments 'p1q1' and 'p2q2' cross each other at a single point that is not an end of
+# any of them. Segments that just touch or that are colinear are not considered as crossing
+def segments_cross(p1, q1, p2, q2):
+    o1 = _signed_area(p1, q1, p2)
+    o2 = _signed_area(p1, q1, q2)
+    o3 = _signed_area(p2, q2, p1)
+    o4 = _signed_area(p2, q2, q1)
+    if _almost_equal(o1, 0.0) or _almost_equal(o2, 0.0) or _almost_equal(o3, 0.0) or _almost_equal(o4, 0.0):
+        return False
+    return sign(o1) != sign(o2) and sign(o3) != sign(o4)
+
+
+# Returns true if the point 'p' lies on the segment 'ab', ends included
+def point_on_segment(p, a, b):
+    return _almost_equal(_signed_area(a, b, p), 0.0) and _on_segment(a, p, b)
+
+
+def _signed_area(p: Vector, q: Vector, r: Vector):
+    return (float(q.x - p.x) * (r.y - p.y)) - (float(r.x - p.x) * (q.y - p.y))
+
+
+# Returns the area of the polygon formed by the points, no matter its winding. Points can be vectors or tuples
+def polygon_area(points):
+    area = 0.0
+    for i in range(len(points)):
+        curr_point = points[i]
+        next_point = points[(i + 1) % len(points)]
+        area += curr_point[0] * next_point[1] - next_point[0] * curr_point[1]
+    return abs(area) / 2.0
+
+
+# Returns true if both polygons have the same points, in any order
+def are_the_same_points(points_a: [Vector], points_b: [Vector]) -> bool:
+    if len(points_a) != len(points_b):
+        return False
+    for point_a in points_a:
+        any_match = any(_almost_equal_vectors(point_a, point_b) for point_b in points_b)
+        if not any_match:
+            return False
+    return True
+
+
+# Returns how many times the polygon formed by the points winds around the point, 0 if the point is outside
+def get_winding_number(point: Vector, points: [Vector]):
+    winding_number = 0
+    for i in range(len(points)):
+        curr_point = points[i]
+        next_point = points[(i + 1) % len(points)]
+        if curr_point.y < point.y or _almost_equal(curr_point.y, point.y):
+            if next_point.y > point.y and not _almost_equal(next_point.y, point.y):
+                is_left = _is_at_left(curr_point, next_point, point)
+                if not _almost_equal(is_left, 0.0) and is_left > 0:
+                    winding_number += 1
+        else:
+            if next_point.y < point.y or _almost_equal(next_point.y, point.y):
+                is_left = _is_at_left(curr_point, next_point, point)
+                if not _almost_equal(is_left, 0.0) and is_left < 0:
+                    winding_number -= 1
+    return winding_number
+
+
+# _is_at_left: Tests if a point is Left|On|Right of an infinite line.
+#    Input:  three points p0, p1, and p2
+#    Return: >0 for p2 left of the line through p0 and p1
+#            =0 for p2 on the line
+#            <0 for p2 right of the line
+def _is_at_left(p0: Vector, p1: Vector, p2: Vector):
+    return ((p1.x - p0.x) * (p2.y - p0.y)) - ((p2.x - p0.x) * (p1.y - p0.y))
@@ -0,0 +1,73 @@
+# INSTANCER
+# Kitbash models often have the same component many times inside one mesh (bolts, windows, crates...). This module
+# finds connected components that are a copy of another one up to a translation (and optionally a 90 degree
+# rotation around Z), so only the first one has to be solved. The copies are derived from it afterwards
+from typing import Dict, List, Tuple
+
+from bmesh.types import BMFace, BMVert
+
+from .facederiver import DerivedFaces
+from .faceparser import get_connected_components
+from .logger import *
+
+# Copies get their own island with the same shape as the original one
+COPY_ISLAND = "COPY"
+# Copies use the same texels as the original one
+SHARE_ISLAND = "SHARE"
+
+# Coordinates are snapped to this fraction of a pixel before comparing them
+PIXEL_SUBDIVISIONS = 16
+
+Key = Tuple[int, int, int]
+
+
+def find_instanced_faces(faces: [BMFace], pixels_per_3d: int, allow_rotation: bool = False) -> DerivedFaces:
+    scale = pixels_per_3d * PIXEL_SUBDIVISIONS
+    originals: Dict[tuple, Tuple[Dict[frozenset, BMFace], Dict[BMVert, Key]]] = {}
+    instanced_faces = {}
+    components = get_connected_components(faces)
+    for component in components:
+        keys = {vert: (round(vert.co.x * scale), round(vert.co.y * scale), round(vert.co.z * scale))
+                for face in component for vert in face.verts}
+        unrotated = None
+        for rotation in range(4 if allow_rotation else 1):
+            fingerprint, faces_by_key, normalized = _get_fingerprint(component, keys, rotation)
+            if unrotated is None:
+                unrotated = (fingerprint, faces_by_key, normalized)
+            if fingerprint in originals:
+                _map_to_original(faces_by_key, normalized, originals[fingerprint], instanced_faces)
+                break
+        else:
+            originals[unrotated[0]] = (unrotated[1], unrotated[2])
+    log(DEBUG, "Found " + str(len(originals)) + " different components out of " + str(len(components)))
+    return instanced_faces
+
+
+# The fingerprint of a component does not depend on where it is nor on the order of its faces and loops
+def _get_fingerprint(component: List[BMFace], keys: Dict[BMVert, Key], rotation: int):
+    normalized = _normalize(keys, rotation)
+    faces_by_key = {frozenset(normalized[vert] for vert in face.verts): face for face in component}
+    fingerprint = tuple(sorted(tuple(sorted(face_key)) for face_key in faces_by_key.keys()))
+    return fingerprint, faces_by_key, normalized
+
+
+# Rotates the keys 90 degrees around Z 'rotation' times and moves them so the smallest coordinates are 0
+def _normalize(keys: Dict[BMVert, Key], rotation: int) -> Dict[BMVert, Key]:
+    rotated = {}
+    for vert, (x, y, z) in keys.items():
+        for _ in range(rotation):
+            x, y = -y, x
+        rotated[vert] = (x, y, z)
+    min_x = min(key[0] for key in rotated.values())
+    min_y = min(key[1] for key in rotated.values())
+    min_z = min(key[2] for key in rotated.values())
+    return {vert: (key[0] - min_x, key[1] - min_y, key[2] - min_z) for vert, key in rotated.items()}
+
+
+def _map_to_original(faces_by_key: Dict[frozenset, BMFace], normalized: Dict[BMVert, Key],
+                     original: Tuple[Dict[frozenset, BMFace], Dict[BMVert, Key]], instanced_faces: DerivedFaces):
+    original_faces_by_key, original_normalized = original
+    for face_key, face in faces_by_key.items():
+        source = original_faces_by_key[face_key]
+        source_loops = {original_normalized[loop.vert]: i for i, loop in enumerate(source.loops)}
+        instanced_faces[face] = (source, [source_loops[normalized[loop.vert]] for loop in face.loops])
@@ -0,0 +1,148 @@
+# ISLAND MERGER
+# Stitching only happens while faces are being solved, so a face whose neighbors were not solved yet, or that could
+# only be stitched by a vertex, stays as an island of its own. Once everything is solved this pass joins islands that
+# share an edge in 3D, turning one of them by quarter turns and moving it by whole pixels so the shared edge matches
+# in UV, as long as it does not overlap the other island. Fewer islands pack faster and leave less space empty
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from bmesh.types import BMEdge, BMFace
+
+from .islandoutline import IslandOutline
+from .logger import *
+from .stats import get_stats
+from .uvpacker import IslandSummary
+
+# Quarter turns as (xx, xy, yx, yy), so a turned point is (xx * x + xy * y, yx * x + yy * y)
+QUARTER_TURNS = [(1, 0, 0, 1), (0, -1, 1, 0), (-1, 0, 0, -1), (0, 1, -1, 0)]
+
+
+class _Group:
+    def __init__(self, island: IslandSummary, locked: bool):
+        self.uvs: Dict[BMFace, List[Tuple[int, int]]] = dict(zip(island.faces, island.uvs))
+        self.bounds = island.bounds
+        self.locked = locked
+        self.outline: Optional[IslandOutline] = None
+
+    def overlaps(self, uvs: Dict[BMFace, List[Tuple[int, int]]], bounds: Tuple[int, int, int, int]) -> bool:
+        if _bounds_are_apart(self.bounds, bounds):
+            return False
+        if self.outline is None:
+            self.outline = IslandOutline()
+            for face_uvs in self.uvs.values():
+                self.outline.add(face_uvs)
+        return any(self.outline.overlaps(face_uvs) for face_uvs in uvs.values()
+                   if not _bounds_are_apart(self.bounds, _get_bounds(face_uvs)))
+
+    def add(self, uvs: Dict[BMFace, List[Tuple[int, int]]], bounds: Tuple[int, int, int, int]):
+        self.uvs.update(uvs)
+        self.bounds = (min(self.bounds[0], bounds[0]), min(self.bounds[1], bounds[1]),
+                       max(self.bounds[2], bounds[2]), max(self.bounds[3], bounds[3]))
+        if self.outline is not None:
+            for face_uvs in uvs.values():
+                self.outline.add(face_uvs)
+
+
+# Islands with any of the locked faces are left as they are. Faces that share texels with other faces are locked, as
+# their island overlaps itself on purpose. Merging stops once the deadline, from time.perf_counter, is reached, and
+# the stats tell that it was cut short
+def merge_neighbor_islands(islands: List[IslandSummary], locked_faces: Set[BMFace] = None,
+                           deadline: float = None) -> List[IslandSummary]:
+    locked_faces = locked_faces or set()
+    groups = [_Group(island, any(face in locked_faces for face in island.faces)) for island in islands]
+    group_of: Dict[BMFace, int] = {face: index for index, island in enumerate(islands) for face in island.faces}
+    # Moving an island against another one that it already overlapped keeps overlapping it, as islands only grow
+    failed = set()
+    merged_islands = 0
+    merged = True
+    cut_short = False
+    while merged and not cut_short:
+        merged = False
+        # Small islands go first, so they are moved into the big ones and the big ones never have to move
+        for index in sorted(range(len(groups)), key=lambda i: len(groups[i].uvs)):
+            if deadline is not None and time.perf_counter() > deadline:
+                log(INFO, "Out of stitch time, not merging more islands")
+                cut_short = True
+                break
+            if groups[index].locked or not groups[index].uvs:
+                continue
+            for face, other_face, edge in _get_shared_edges(groups[index], index, group_of):
+                other_index = group_of[other_face]
+                if other_index == index or groups[other_index].locked:
+                    continue
+                if len(groups[index].uvs) <= len(groups[other_index].uvs):
+                    moving_index, fixed_index, moving_face, fixed_face = index, other_index, face, other_face
+                else:
+                    moving_index, fixed_index, moving_face, fixed_face = other_index, index, other_face, face
+                moving, fixed = groups[moving_index], groups[fixed_index]
+                transform = _get_transform(edge, moving_face, moving.uvs[moving_face], fixed_face,
+                                           fixed.uvs[fixed_face])
+                if transform is None or (fixed_index, moving_index, transform) in failed:
+                    continue
+                moved = {moved_face: [_apply(transform, uv) for uv in face_uvs]
+                         for moved_face, face_uvs in moving.uvs.items()}
+                moved_bounds = _get_bounds([uv for face_uvs in moved.values() for uv in face_uvs])
+                if fixed.overlaps(moved, moved_bounds):
+                    failed.add((fixed_index, moving_index, transform))
+                    continue
+                fixed.add(moved, moved_bounds)
+                for moved_face in moved:
+                    group_of[moved_face] = fixed_index
+                moving.uvs = {}
+                moving.outline = None
+                merged_islands += 1
+                merged = True
+                if moving_index == index:
+                    break
+
+    get_stats().merged_islands += merged_islands
+    if cut_short:
+        get_stats().merge_cut_short = True
+    log(DEBUG, "Merged " + str(merged_islands) + " islands into their neighbors")
+    return [IslandSummary(list(group.uvs.keys()), list(group.uvs.values())) for group in groups if group.uvs]
+
+
+# Edges the faces of the group share with faces of other groups, as (face, other face, edge)
+def _get_shared_edges(group: _Group, index: int, group_of: Dict[BMFace, int]) -> List[Tuple[BMFace, BMFace, BMEdge]]:
+    shared_edges = []
+    for face in group.uvs:
+        for edge in face.edges:
+            for other_face in edge.link_faces:
+                if other_face is not face and group_of.get(other_face, index) != index:
+                    shared_edges.append((face, other_face, edge))
+    return shared_edges
+
+
+# Returns the (quarter turn, x, y) that takes the shared edge in the UVs of the moving face to the same edge in the
+# UVs of the fixed face, or None if there is no such transform
+def _get_transform(edge: BMEdge, moving_face: BMFace, moving_uvs: List[Tuple[int, int]], fixed_face: BMFace,
+                   fixed_uvs: List[Tuple[int, int]]) -> Optional[Tuple[int, int, int]]:
+    moving_start, moving_end = _get_edge_uvs(edge, moving_face, moving_uvs)
+    fixed_start, fixed_end = _get_edge_uvs(edge, fixed_face, fixed_uvs)
+    moving_direction = (moving_end[0] - moving_start[0], moving_end[1] - moving_start[1])
+    fixed_direction = (fixed_end[0] - fixed_start[0], fixed_end[1] - fixed_start[1])
+    for turn in range(len(QUARTER_TURNS)):
+        if _apply((turn, 0, 0), moving_direction) == fixed_direction:
+            turned_start = _apply((turn, 0, 0), moving_start)
+            return turn, fixed_start[0] - turned_start[0], fixed_start[1] - turned_start[1]
+    return None
+
+
+def _get_edge_uvs(edge: BMEdge, face: BMFace, uvs: List[Tuple[int, int]]) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    verts = [loop.vert for loop in face.loops]
+    return uvs[verts.index(edge.verts[0])], uvs[verts.index(edge.verts[1])]
+
+
+def _apply(transform: Tuple[int, int, int], uv: Tuple[int, int]) -> Tuple[int, int]:
+    xx, xy, yx, yy = QUARTER_TURNS[transform[0]]
+    return xx * uv[0] + xy * uv[1] + transform[1], yx * uv[0] + yy * uv[1] + transform[2]
+
+
+def _get_bounds(uvs: List[Tuple[int, int]]) -> Tuple[int, int, int, int]:
+    return min(uv[0] for uv in uvs), min(uv[1] for uv in uvs), max(uv[0] for uv in uvs), max(uv[1] for uv in uvs)
+
+
+# Islands whose bounds only touch cannot overlap, they can only be next to each other
+def _bounds_are_apart(bounds_a: Tuple[int, int, int, int], bounds_b: Tuple[int, int, int, int]) -> bool:
+    return bounds_a[0] >= bounds_b[2] or bounds_b[0] >= bounds_a[2] or bounds_a[1] >= bounds_b[3] \
+        or bounds_b[1] >= bounds_a[3]
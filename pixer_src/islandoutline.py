@@ -0,0 +1,153 @@
+# ISLAND OUTLINE
+# Outline of a UV island on the pixel grid, kept up to date as islands are merged into it. An edge shared by
+# two faces of the island cancels out, so only the outer boundary and the boundary of the holes are left.
+# A candidate face can only overlap the island where it goes through the outline or where one of them is inside the
+# other one, so testing against the outline costs as much as the perimeter of the island, not its number of faces
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Solved UVs are whole pixels, points further than this from one are not on the pixel grid
+GRID_TOLERANCE = 10 ** -6
+# Distance, in pixels, from the edges of the candidate at which its inside is sampled
+INSIDE_OFFSET = 10 ** -3
+
+
+class IslandOutline:
+    def __init__(self):
+        self.edges: Dict[Tuple[Tuple[int, int], Tuple[int, int]], None] = {}
+        self.on_grid = True
+        self.size = 0
+        self.starts = None
+        self.ends = None
+        self.lows = None
+        self.highs = None
+
+    def __len__(self):
+        return self.size
+
+    def add(self, points: List[Tuple[float, float]]):
+        self.size += 1
+        grid_points = to_pixel_grid(points)
+        if grid_points is None:
+            self.on_grid = False
+            return
+        for i, start in enumerate(grid_points):
+            end = grid_points[(i + 1) % len(grid_points)]
+            if start == end:
+                continue
+            edge = (start, end) if start < end else (end, start)
+            if edge in self.edges:
+                del self.edges[edge]
+            else:
+                self.edges[edge] = None
+        self.starts = None
+
+    # True if the candidate and the island overlap with some area, touching edges or vertices is not an overlap.
+    # The candidate has to be on the pixel grid, see to_pixel_grid
+    def overlaps(self, candidate: List[Tuple[int, int]]) -> bool:
+        self._pack()
+        if not len(self.starts):
+            return False
+        a = np.array(candidate, dtype=np.int64)
+        a_next = np.roll(a, -1, axis=0)
+        # Only the outline edges that touch the bounds of the candidate can touch the candidate itself
+        near = ((self.lows <= a.max(axis=0)) & (self.highs >= a.min(axis=0))).all(axis=1)
+        if not near.any():
+            # The candidate is then all inside the island or all outside it
+            return bool(_is_inside(a[:1].astype(float), self.starts, self.ends)[0])
+        starts, ends = self.starts[near], self.ends[near]
+
+        # Edges of the candidate that cross the outline at a single point that is not an end of any of them
+        o1 = np.sign(_orientation(a[:, None], a_next[:, None], starts[None]))
+        o2 = np.sign(_orientation(a[:, None], a_next[:, None], ends[None]))
+        o3 = np.sign(_orientation(starts[None], ends[None], a[:, None]))
+        o4 = np.sign(_orientation(starts[None], ends[None], a_next[:, None]))
+        if ((o1 * o2 < 0) & (o3 * o4 < 0)).any():
+            return True
+
+        # Everywhere else they can only touch, so they overlap if the island has inside it a point of the candidate
+        # or a point just inside the candidate next to any of the pieces the outline cuts its edges into
+        vertices = np.concatenate([starts, ends])
+        points = [a.astype(float)]
+        area = _double_area(a)
+        if area:
+            valid = (a != a_next).any(axis=1)
+            midpoints, indices = _get_piece_midpoints(a[valid], a_next[valid], vertices)
+            directions = (a_next - a)[valid][indices].astype(float)
+            normals = np.stack([-directions[:, 1], directions[:, 0]], axis=1) \
+                / np.hypot(directions[:, 0], directions[:, 1])[:, None]
+            points.append(midpoints + np.sign(area) * INSIDE_OFFSET * normals)
+        points = np.concatenate(points)
+        if (_is_inside(points, self.starts, self.ends) & ~_is_on_edges(points, starts, ends)).any():
+            return True
+
+        # Or if the candidate has inside it a point of the outline, or the middle of any of the pieces its edges cut
+        # the outline into
+        midpoints, _ = _get_piece_midpoints(starts, ends, a)
+        points = np.concatenate([vertices.astype(float), midpoints])
+        return bool((_is_inside(points, a, a_next) & ~_is_on_edges(points, a, a_next)).any())
+
+    # Builds the arrays of the outline again if faces were added since the last test
+    def _pack(self):
+        if self.starts is not None:
+            return
+        edges = np.array(list(self.edges), dtype=np.int64).reshape(-1, 2, 2)
+        self.starts = edges[:, 0]
+        self.ends = edges[:, 1]
+        self.lows = np.minimum(self.starts, self.ends)
+        self.highs = np.maximum(self.starts, self.ends)
+
+
+# Returns the points as whole pixels, or None if any of them is not on the pixel grid
+def to_pixel_grid(points: List[Tuple[float, float]]) -> Optional[List[Tuple[int, int]]]:
+    grid_points = [(int(round(x)), int(round(y))) for x, y in points]
+    if any(abs(x - grid_x) > GRID_TOLERANCE or abs(y - grid_y) > GRID_TOLERANCE
+           for (x, y), (grid_x, grid_y) in zip(points, grid_points)):
+        return None
+    return grid_points
+
+
+def _orientation(p: np.ndarray, q: np.ndarray, r: np.ndarray) -> np.ndarray:
+    return (q[..., 0] - p[..., 0]) * (r[..., 1] - p[..., 1]) - (r[..., 0] - p[..., 0]) * (q[..., 1] - p[..., 1])
+
+
+def _double_area(points: np.ndarray) -> int:
+    next_points = np.roll(points, -1, axis=0)
+    return int((points[:, 0] * next_points[:, 1] - next_points[:, 0] * points[:, 1]).sum())
+
+
+# Cuts each segment at the given points that lie on it and returns the middle point of every piece, together with the
+# index of the segment it comes from
+def _get_piece_midpoints(starts: np.ndarray, ends: np.ndarray, cuts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    directions = ends - starts
+    lengths = (directions * directions).sum(axis=1)
+    along = ((cuts[None] - starts[:, None]) * directions[:, None]).sum(axis=2)
+    on_segment = (_orientation(starts[:, None], ends[:, None], cuts[None]) == 0) & (along > 0) \
+        & (along < lengths[:, None])
+    cut = on_segment.any(axis=1)
+    midpoints = [(starts[~cut] + ends[~cut]) * 0.5]
+    indices = [np.flatnonzero(~cut)]
+    for i in np.flatnonzero(cut):
+        stops = np.unique(np.concatenate([[0, lengths[i]], along[i][on_segment[i]]])) / float(lengths[i])
+        middles = (stops[:-1] + stops[1:]) * 0.5
+        midpoints.append(starts[i] + middles[:, None] * directions[i])
+        indices.append(np.full(len(middles), i))
+    return np.concatenate(midpoints), np.concatenate(indices)
+
+
+# Even-odd rule against the given edges, with a ray to the right of each point
+def _is_inside(points: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    px, py = points[:, None, 0], points[:, None, 1]
+    x0, y0, x1, y1 = starts[None, :, 0], starts[None, :, 1], ends[None, :, 0], ends[None, :, 1]
+    crosses = (y0 > py) != (y1 > py)
+    crossing_x = np.where(crosses, x0 + (py - y0) * (x1 - x0) / np.where(crosses, y1 - y0, 1), -np.inf)
+    return (px < crossing_x).sum(axis=1) % 2 == 1
+
+
+def _is_on_edges(points: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    px, py = points[:, None, 0], points[:, None, 1]
+    x0, y0, x1, y1 = starts[None, :, 0], starts[None, :, 1], ends[None, :, 0], ends[None, :, 1]
+    on_line = np.abs((x1 - x0) * (py - y0) - (y1 - y0) * (px - x0)) < GRID_TOLERANCE
+    return (on_line & (px >= np.minimum(x0, x1) - GRID_TOLERANCE) & (px <= np.maximum(x0, x1) + GRID_TOLERANCE)
+            & (py >= np.minimum(y0, y1) - GRID_TOLERANCE) & (py <= np.maximum(y0, y1) + GRID_TOLERANCE)).any(axis=1)
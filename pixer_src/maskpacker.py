@@ -0,0 +1,194 @@
+# MASK PACKER
+# Packs islands by their real shape instead of their bounding box. Solved islands sit exactly on the pixel grid, so
+# each one is rasterized into an occupancy mask and placed on an occupancy grid of the whole texture, with the fit
+# test for every position done at once with array operations. L shaped or ring shaped islands can then take the
+# free space around other islands
+from typing import List, Tuple
+
+import numpy as np
+
+from .logger import *
+
+# Empty pixels kept between islands, same as the column packer
+PADDING = 1
+# Masks with up to this many pixels are tested with shifted slices of the grid, bigger ones with an FFT correlation
+SLIDING_WINDOW_MAX_PIXELS = 64
+
+
+# Returns the (x, y, tile, rotated) offset of each island. Rotated islands are turned 90 degrees counterclockwise
+# around the origin before being moved by the offset, see rotate_uv. Islands are placed around what is already
+# occupied on the given tiles, see get_occupied_tiles
+def get_mask_offsets(islands_uvs: List[List[List[Tuple[int, int]]]], texture_pixels: int,
+                     allow_rotation: bool = True, tiles: List[np.ndarray] = None) -> List[Tuple[int, int, int, bool]]:
+    candidates = []
+    for uvs in islands_uvs:
+        rotations = [_get_island_mask(uvs)]
+        if allow_rotation:
+            rotations.append(_get_island_mask([[rotate_uv(uv) for uv in face_uvs] for face_uvs in uvs]))
+        candidates.append(rotations)
+
+    # Biggest islands go first, the small ones fill the gaps that are left
+    order = sorted(range(len(islands_uvs)), key=lambda i: (-int(candidates[i][0][2].sum()),
+                                                           -max(candidates[i][0][2].shape)))
+    tiles = tiles if tiles is not None else []
+    offsets = [None] * len(islands_uvs)
+    for i in order:
+        placement = None
+        for tile, occupancy in enumerate(tiles):
+            placement = _find_best_placement(occupancy, candidates[i])
+            if placement is not None:
+                placement = (tile,) + placement
+                break
+        if placement is None:
+            tiles.append(np.zeros((texture_pixels, texture_pixels), dtype=bool))
+            placement = _find_best_placement(tiles[-1], candidates[i])
+            if placement is None:
+                left, bot, mask = candidates[i][0]
+                log(WARN, "There is an island of " + str(mask.shape[1]) + "x" + str(mask.shape[0]) + " pixels, it "
+                          "does not fit in a texture of " + str(texture_pixels) + " pixels")
+                tiles[-1][:, :] = True
+                offsets[i] = (-left, -bot, len(tiles) - 1, False)
+                continue
+            placement = (len(tiles) - 1,) + placement
+        tile, x, y, rotation = placement
+        left, bot, mask = candidates[i][rotation]
+        _occupy(tiles[tile], mask, x, y)
+        offsets[i] = (x - left, y - bot, tile, rotation == 1)
+    log(DEBUG, "Packed " + str(len(islands_uvs)) + " islands by shape in " + str(len(tiles)) + " tiles")
+    return offsets
+
+
+# Occupancy grids of the tiles with the islands already on them, so other islands can be packed around them. The UVs
+# of each island are in pixels from the corner of its tile
+def get_occupied_tiles(islands_uvs: List[List[List[Tuple[int, int]]]], islands_tiles: List[int],
+                       texture_pixels: int) -> List[np.ndarray]:
+    tiles = [np.zeros((texture_pixels, texture_pixels), dtype=bool) for _ in range(max(islands_tiles, default=-1) + 1)]
+    for uvs, tile in zip(islands_uvs, islands_tiles):
+        left, bot, mask = _get_island_mask(uvs)
+        _occupy(tiles[tile], mask, left, bot)
+    return tiles
+
+
+def rotate_uv(uv: Tuple[int, int]) -> Tuple[int, int]:
+    return -uv[1], uv[0]
+
+
+# Returns the position of the lowest placement among the allowed rotations as (x, y, rotation), or None if the
+# island does not fit anywhere on the grid
+def _find_best_placement(occupancy: np.ndarray, rotations: List[Tuple[int, int, np.ndarray]]):
+    best = None
+    for rotation, (_, _, mask) in enumerate(rotations):
+        position = _find_first_fit(occupancy, mask)
+        if position is None:
+            continue
+        y, x = position
+        score = (y + mask.shape[0], x + mask.shape[1])
+        if best is None or score < best[0]:
+            best = (score, (x, y, rotation))
+    return None if best is None else best[1]
+
+
+# Finds the first position, bottom to top and left to right, where the mask does not touch any occupied pixel
+def _find_first_fit(occupancy: np.ndarray, mask: np.ndarray):
+    height, width = mask.shape
+    if height > occupancy.shape[0] or width > occupancy.shape[1]:
+        return None
+    # Islands are placed bottom up, so only the rows between the full rows at the bottom and the empty rows at the top
+    # need to be searched. Everything above the highest used row fits anything
+    used_rows = np.flatnonzero(occupancy.any(axis=1))
+    if not len(used_rows):
+        return 0, 0
+    open_rows = np.flatnonzero(~occupancy.all(axis=1))
+    if not len(open_rows):
+        return None
+    low = int(open_rows[0])
+    band = occupancy[low:min(occupancy.shape[0], int(used_rows[-1]) + 1 + height)]
+    rows = band.shape[0] - height + 1
+    columns = band.shape[1] - width + 1
+    if rows <= 0:
+        return None
+
+    # Occupied pixels under the bounding box of the mask at every position, from a summed area table
+    table = np.zeros((band.shape[0] + 1, band.shape[1] + 1), dtype=np.int32)
+    table[1:, 1:] = band.cumsum(axis=0, dtype=np.int32).cumsum(axis=1)
+    free = (table[height:, width:] - table[:rows, width:] - table[height:, :columns] + table[:rows, :columns]) == 0
+
+    pixels = int(mask.sum())
+    if pixels < height * width:
+        if pixels <= SLIDING_WINDOW_MAX_PIXELS:
+            collisions = np.zeros((rows, columns), dtype=bool)
+            for y, x in np.argwhere(mask):
+                collisions |= band[y:y + rows, x:x + columns]
+            free = ~collisions
+        else:
+            # Correlation of the grid with the mask counts the occupied pixels under the mask at every position.
+            # Positions that fit inside the grid never wrap around, so the circular correlation is exact for them
+            shape = band.shape
+            counts = np.fft.irfft2(np.fft.rfft2(band, shape) * np.conj(np.fft.rfft2(mask, shape)), shape)
+            free = counts[:rows, :columns] < 0.5
+
+    positions = np.argwhere(free)
+    if not len(positions):
+        return None
+    return low + int(positions[0][0]), int(positions[0][1])
+
+
+def _occupy(occupancy: np.ndarray, mask: np.ndarray, x: int, y: int):
+    height, width = mask.shape
+    padded = np.zeros((height + 2 * PADDING, width + 2 * PADDING), dtype=bool)
+    for dy in range(2 * PADDING + 1):
+        for dx in range(2 * PADDING + 1):
+            padded[dy:dy + height, dx:dx + width] |= mask
+    top = min(occupancy.shape[0], y + height + PADDING)
+    right = min(occupancy.shape[1], x + width + PADDING)
+    bot = max(0, y - PADDING)
+    left = max(0, x - PADDING)
+    # Islands read back from the UVs may be partly or fully out of the tile
+    if top <= bot or right <= left:
+        return
+    occupancy[bot:top, left:right] |= padded[bot - y + PADDING:top - y + PADDING,
+                                             left - x + PADDING:right - x + PADDING]
+
+
+# Rasterizes all the faces of an island. Returns the pixel coordinates of the bottom left corner of the mask and the
+# mask itself, indexed as [y, x]
+def _get_island_mask(uvs: List[List[Tuple[int, int]]]) -> Tuple[int, int, np.ndarray]:
+    left = min(uv[0] for face_uvs in uvs for uv in face_uvs)
+    bot = min(uv[1] for face_uvs in uvs for uv in face_uvs)
+    right = max(uv[0] for face_uvs in uvs for uv in face_uvs)
+    top = max(uv[1] for face_uvs in uvs for uv in face_uvs)
+    mask = np.zeros((max(1, top - bot), max(1, right - left)), dtype=bool)
+    for face_uvs in uvs:
+        _rasterize_face(mask, [(uv[0] - left, uv[1] - bot) for uv in face_uvs])
+    # Degenerated islands with no area still need their pixels
+    if not mask.any():
+        mask[:, :] = True
+    return left, bot, mask
+
+
+# A pixel belongs to the face if its center is inside the face or if any edge of the face goes through it
+def _rasterize_face(mask: np.ndarray, points: List[Tuple[int, int]]):
+    xs = [point[0] for point in points]
+    ys = [point[1] for point in points]
+    left, right, bot, top = min(xs), max(xs), min(ys), max(ys)
+    if right <= left or top <= bot:
+        return
+    center_x, center_y = np.meshgrid(np.arange(left, right) + 0.5, np.arange(bot, top) + 0.5)
+    inside = np.zeros(center_x.shape, dtype=bool)
+    for i in range(len(points)):
+        x1, y1 = points[i]
+        x2, y2 = points[(i + 1) % len(points)]
+        if y1 != y2:
+            crosses = (y1 > center_y) != (y2 > center_y)
+            inside ^= crosses & (center_x < (x2 - x1) * (center_y - y1) / float(y2 - y1) + x1)
+        if x1 != x2 and y1 != y2:
+            # The edge goes through the pixel if the corners of the pixel are on both sides of it
+            edge_left, edge_bot = min(x1, x2) - left, min(y1, y2) - bot
+            corner_x, corner_y = center_x - 0.5, center_y - 0.5
+            sides = [(x2 - x1) * (corner_y + dy - y1) - (y2 - y1) * (corner_x + dx - x1)
+                     for dx in (0, 1) for dy in (0, 1)]
+            through = (np.minimum.reduce(sides) < 0) & (np.maximum.reduce(sides) > 0)
+            in_edge = np.zeros(center_x.shape, dtype=bool)
+            in_edge[edge_bot:edge_bot + abs(y2 - y1), edge_left:edge_left + abs(x2 - x1)] = True
+            inside |= through & in_edge
+    mask[bot:top, left:right] |= inside
@@ -0,0 +1,126 @@
+# OVERLAP KERNEL
+# Array version of facestitcher._faces_overlap_in_uv that tests a candidate face against all the faces of an island
+# at once. Island faces are packed in flat arrays that only grow as faces are stitched to the island, so each stitch
+# attempt is one set of array operations instead of a Python loop over the faces of the island.
+# Answers are the same as _faces_overlap_in_uv, tolerances included
+from typing import List, Tuple
+
+import numpy as np
+
+# Same tolerance as utils._almost_equal
+EPSILON = 10 ** -6
+
+
+class PackedPolygons:
+    def __init__(self):
+        self.points = np.empty((0, 2))
+        self.next_points = np.empty((0, 2))
+        self.starts = np.empty(0, dtype=np.intp)
+        self.counts = np.empty(0, dtype=np.intp)
+        self.limits = np.empty((0, 4))
+        self.pending: List[List[Tuple[float, float]]] = []
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, points: List[Tuple[float, float]]):
+        self.pending.append(points)
+        self.size += 1
+
+    # Moves the polygons added since the last test into the arrays
+    def _pack(self):
+        if not self.pending:
+            return
+        counts = np.array([len(points) for points in self.pending], dtype=np.intp)
+        points = np.array([point for polygon in self.pending for point in polygon], dtype=float).reshape(-1, 2)
+        starts = np.zeros(len(counts), dtype=np.intp)
+        starts[1:] = np.cumsum(counts)[:-1]
+        # Edge i of a polygon goes from its point i to its point i + 1, wrapping on the last point
+        next_indices = np.arange(1, len(points) + 1)
+        next_indices[starts + counts - 1] = starts
+        # Bounds are kept as (right, top, -left, -bot), so a candidate with bounds (left, bot, -right, -top) is apart
+        # from a polygon when any of their differences is at least the tolerance
+        limits = np.stack([np.maximum.reduceat(points[:, 0], starts), np.maximum.reduceat(points[:, 1], starts),
+                           -np.minimum.reduceat(points[:, 0], starts), -np.minimum.reduceat(points[:, 1], starts)],
+                          axis=1)
+        self.starts = np.concatenate([self.starts, starts + len(self.points)])
+        self.points = np.concatenate([self.points, points])
+        self.next_points = np.concatenate([self.next_points, points[next_indices]])
+        self.counts = np.concatenate([self.counts, counts])
+        self.limits = np.concatenate([self.limits, limits])
+        self.pending = []
+
+
+def any_polygon_overlaps(candidate: List[Tuple[float, float]], polygons: PackedPolygons) -> bool:
+    return bool(get_polygon_overlaps(candidate, polygons).any())
+
+
+# Returns, for each packed polygon, whether the candidate polygon overlaps it
+def get_polygon_overlaps(candidate: List[Tuple[float, float]], polygons: PackedPolygons) -> np.ndarray:
+    polygons._pack()
+    overlaps = np.zeros(len(polygons), dtype=bool)
+    if not len(polygons):
+        return overlaps
+    a = np.asarray(candidate, dtype=float).reshape(-1, 2)
+    a_next = np.concatenate([a[1:], a[:1]])
+
+    # Bounds rejection, bounds that just touch can still give an overlap
+    candidate_limits = np.concatenate([a.min(axis=0), -a.max(axis=0)])
+    near_indices = np.flatnonzero(~((candidate_limits - polygons.limits) >= EPSILON).any(axis=1))
+    if not len(near_indices):
+        return overlaps
+
+    # Points and edges of the near polygons only, still grouped by polygon
+    counts = polygons.counts[near_indices]
+    point_indices = np.repeat(polygons.starts[near_indices] - np.cumsum(counts) + counts, counts) \
+        + np.arange(counts.sum())
+    b = polygons.points[point_indices]
+    b_next = polygons.next_points[point_indices]
+    groups = np.zeros(len(counts), dtype=np.intp)
+    groups[1:] = np.cumsum(counts)[:-1]
+
+    # Candidate points that are the same as a point of each polygon, as [candidate point, polygon]
+    same = (np.abs(a[:, None, 0] - b[None, :, 0]) < EPSILON) & (np.abs(a[:, None, 1] - b[None, :, 1]) < EPSILON)
+    a_on_b_points = np.logical_or.reduceat(same, groups, axis=1)
+    same_points = (counts == len(a)) & a_on_b_points.all(axis=0)
+
+    # Edges that cross each other at a single point that is not an end of any of them
+    o1 = _signed_area(a[:, None], a_next[:, None], b[None, :])
+    o2 = _signed_area(a[:, None], a_next[:, None], b_next[None, :])
+    o3 = _signed_area(b[None, :], b_next[None, :], a[:, None])
+    o4 = _signed_area(b[None, :], b_next[None, :], a_next[:, None])
+    not_colinear = (np.abs(o1) >= EPSILON) & (np.abs(o2) >= EPSILON) & (np.abs(o3) >= EPSILON) \
+        & (np.abs(o4) >= EPSILON)
+    cross = not_colinear & (np.sign(o1) != np.sign(o2)) & (np.sign(o3) != np.sign(o4))
+    edges_cross = np.logical_or.reduceat(cross.any(axis=0), groups)
+
+    # Candidate points inside each polygon, without counting the ones that are a point of the polygon
+    a_winding = np.add.reduceat(_winding_contributions(a[:, None], b[None, :], b_next[None, :]), groups, axis=1)
+    a_inside = ((a_winding != 0) & ~a_on_b_points).any(axis=0)
+
+    # Points of each polygon inside the candidate, without counting the ones that are a point of the candidate
+    b_winding = _winding_contributions(b[:, None], a[None, :], a_next[None, :]).sum(axis=1)
+    b_inside = np.logical_or.reduceat((b_winding != 0) & ~same.any(axis=0), groups)
+
+    overlaps[near_indices] = same_points | edges_cross | a_inside | b_inside
+    return overlaps
+
+
+def _signed_area(p: np.ndarray, q: np.ndarray, r: np.ndarray) -> np.ndarray:
+    return (q[..., 0] - p[..., 0]) * (r[..., 1] - p[..., 1]) - (r[..., 0] - p[..., 0]) * (q[..., 1] - p[..., 1])
+
+
+# Same rules as geometryutils.get_winding_number, for every point against every edge
+def _winding_contributions(points: np.ndarray, curr_points: np.ndarray, next_points: np.ndarray) -> np.ndarray:
+    py = points[..., 1]
+    curr_y = curr_points[..., 1]
+    is_left = (next_points[..., 0] - curr_points[..., 0]) * (py - curr_y) \
+        - (points[..., 0] - curr_points[..., 0]) * (next_points[..., 1] - curr_y)
+    # 'a < b or almost equal' is the same as 'a - b < tolerance', and 'a > b and not almost equal' is the same as
+    # 'a - b >= tolerance'
+    curr_below = (curr_y - py) < EPSILON
+    next_above = (next_points[..., 1] - py) >= EPSILON
+    upward = curr_below & next_above & (is_left >= EPSILON)
+    downward = ~curr_below & ~next_above & (is_left <= -EPSILON)
+    return upward.astype(np.int32) - downward
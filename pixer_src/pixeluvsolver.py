@@ -1,7 +1,7 @@
 # PIXEL UV SOLVER
 # This is the one that does the work. It heavily relies on the XFace class
 # to know the order in which it should solve the faces and other things
-from typing import Set
+from typing import List
 
 from .logger import *
 from mathutils import Vector
@@ -46,17 +46,47 @@ def _get_length2d(length3d: float, pixels_per_3d: int, pixel_2d_size: float):
 
 
 def _fix_wrong_edges(xface: XFace, pixels_per_3d: int, pixel_2d_size: float):
-    for edge in xface.get_horizontal_edges():
-        pixels_3d = _pixels_3d(xface.get_edge(edge).length, pixels_per_3d)
-        pixels_2d = _pixels_2d(xface.get_uv_edge(edge).length, pixel_2d_size)
-        if pixels_3d != pixels_2d:
-            _fix_edge(xface, edge, pixels_per_3d, pixel_2d_size, pixels_3d - pixels_2d, True)
-
-    for edge in xface.get_vertical_edges():
-        pixels_3d = _pixels_3d(xface.get_edge(edge).length, pixels_per_3d)
-        pixels_2d = _pixels_2d(xface.get_uv_edge(edge).length, pixel_2d_size)
-        if pixels_3d != pixels_2d:
-            _fix_edge(xface, edge, pixels_per_3d, pixel_2d_size, pixels_3d - pixels_2d, False)
+    # Work on integer pixel coordinates so each check is just a few int operations, then write back once
+    horizontal_mask = xface.get_horizontal_mask()
+    aligned_mask = xface.get_aligned_mask()
+    targets = _get_target_pixel_lengths(xface, pixels_per_3d, aligned_mask)
+    pixels = [[_pixels_2d(uv.x, pixel_2d_size), _pixels_2d(uv.y, pixel_2d_size)] for uv in xface.get_all_uvs()]
+    length = len(pixels)
+
+    # One walk around the polygon. Each aligned edge moves its end vertex along its axis until it has the right length
+    # and that movement is carried to the vertices after it, so the edges in between keep their lengths, until an edge
+    # that is not aligned absorbs it. The walk starts right after the last of those edges so nothing is left to carry
+    # when it gets back to the start, if there is none whatever is left goes to the last edge
+    unaligned_mask = ~aligned_mask & ((1 << length) - 1)
+    first = unaligned_mask.bit_length() % length
+    carry = [0, 0]
+    for step in range(length):
+        edge = (first + step) % length
+        next_vertex = (edge + 1) % length
+        if not aligned_mask >> edge & 1:
+            carry = [0, 0]
+            continue
+
+        axis = 0 if horizontal_mask >> edge & 1 else 1
+        direction = sign(pixels[next_vertex][axis] - pixels[edge][axis] + carry[axis])
+        if direction != 0:
+            carry[axis] = pixels[edge][axis] + direction * targets[edge] - pixels[next_vertex][axis]
+        if step < length - 1:
+            pixels[next_vertex][0] += carry[0]
+            pixels[next_vertex][1] += carry[1]
+
+    for i in range(length):
+        xface.update_uv(i, Vector((pixels[i][0] * pixel_2d_size, pixels[i][1] * pixel_2d_size)))
+
+
+def _get_target_pixel_lengths(xface: XFace, pixels_per_3d: int, aligned_mask: int) -> List[int]:
+    targets = []
+    for i in range(xface.get_face_length()):
+        if aligned_mask >> i & 1:
+            targets.append(_pixels_3d(xface.get_edge(i).length, pixels_per_3d))
+        else:
+            targets.append(0)
+    return targets
 
 
 def _pixels_3d(length3d: float, pixels_per_3d) -> int:
@@ -67,80 +97,6 @@ def _pixels_2d(length2d: float, pixel_2d_size: float):
     return int(round(length2d / pixel_2d_size))
 
 
-def _fix_edge(xface: XFace, edge: int, pixels_per_3d: int, pixel_2d_size: float, adjust: int, horizontally: bool):
-    if horizontally:
-        adjust = adjust * sign(xface.get_uv(edge + 1).x - xface.get_uv(edge).x)
-    else:
-        adjust = adjust * sign(xface.get_uv(edge + 1).y - xface.get_uv(edge).y)
-    next_vertex = xface.get_index(edge + 1)
-
-    vertices_allowed_to_move = _get_number_of_vertices_allowed_to_move(xface, pixels_per_3d, pixel_2d_size, edge,
-                                                                       edge, next_vertex, adjust, horizontally)
-    if vertices_allowed_to_move is not None:
-        _adjust_vertices_recursive(xface, pixel_2d_size, next_vertex, vertices_allowed_to_move, False, adjust,
-                                   horizontally)
-        return
-
-    # Try the other way around just in case
-    vertices_allowed_to_move = _get_number_of_vertices_allowed_to_move(xface, pixels_per_3d, pixel_2d_size, next_vertex,
-                                                                       next_vertex, edge, adjust, horizontally)
-    if vertices_allowed_to_move is not None:
-        _adjust_vertices_recursive(xface, pixel_2d_size, edge, vertices_allowed_to_move, True, adjust, horizontally)
-
-
-def _get_number_of_vertices_allowed_to_move(xface: XFace, pixels_per_3d: int, pixel_2d_size: float, init: int,
-                                            from_vertex: int, vertex: int, amount: int, move_hor: bool):
-    if vertex == init:
-        return None
-
-    length = xface.get_face_length()
-    clockwise = from_vertex > vertex or (from_vertex == 0 and vertex == length - 1)
-
-    next_vertex = (vertex + length - 1) % length if clockwise else (vertex + 1) % length
-    edge = next_vertex if clockwise else vertex
-
-    if edge not in xface.get_vertical_edges() + xface.get_horizontal_edges():
-        return 1
-
-    edge_3d = xface.get_edge(edge)
-    edge_2d = xface.get_uv_edge(edge)
-
-    pixels_3d = _pixels_3d(edge_3d.length, pixels_per_3d)
-    pixels_2d = _pixels_2d(edge_2d.length, pixel_2d_size)
-    if pixels_3d != pixels_2d:
-        if _movement_required_is_the_same_as_movement_desired(pixels_3d, pixels_2d, amount,
-                                                              edge in xface.get_horizontal_edges(), move_hor):
-            return 1
-
-    result = _get_number_of_vertices_allowed_to_move(xface, pixels_per_3d, pixel_2d_size, init, vertex, next_vertex,
-                                                     amount, move_hor)
-    return None if result is None else 1 + result
-
-
-def _movement_required_is_the_same_as_movement_desired(pixels_3d: int, pixels_2d: int, amount: int,
-                                                       edge_is_horizontal: bool, move_hor: bool) -> bool:
-    desired_amount = pixels_3d - pixels_2d
-    return desired_amount == amount and edge_is_horizontal == move_hor
-
-
-def _adjust_vertices_recursive(xface: XFace, pixel_2d_size: float, vertex: int, vertex_remaining: int, clockwise: bool,
-                               amount: int, horizontally: bool):
-    if vertex_remaining == 0:
-        return
-
-    if horizontally:
-        xface.update_uv(vertex, xface.get_uv(vertex) + Vector((pixel_2d_size * amount, 0.0)))
-    else:
-        xface.update_uv(vertex, xface.get_uv(vertex) + Vector((0.0, pixel_2d_size * amount)))
-
-    if clockwise:
-        _adjust_vertices_recursive(xface, pixel_2d_size, xface.get_index(vertex - 1), vertex_remaining - 1, clockwise,
-                                   amount, horizontally)
-    else:
-        _adjust_vertices_recursive(xface, pixel_2d_size, xface.get_index(vertex + 1), vertex_remaining - 1, clockwise,
-                                   amount, horizontally)
-
-
 def snap_face_uv_to_pixel(xface: XFace, selection_only: bool, pixel_2d_size: float):
     if not selection_only or xface.get_face().select:
         for index in range(xface.get_face_length()):
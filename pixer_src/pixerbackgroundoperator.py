@@ -0,0 +1,201 @@
+import bmesh
+import bpy
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import tempfile
+from .logger import *
+from .pixeroperator import parse_texture_sizes, overlaps_report
+from .stats import PixerStats, set_last_stats
+from .workerpool import get_worker_command, take_worker, send_job, release_worker, refill_workers
+
+# Seconds between checks of the helper process
+POLL_SECONDS = 0.5
+# Stages a usual run goes through, only used to fill the progress bar
+EXPECTED_STAGES = 7
+
+
+# Pixelizes the model in another Blender process so this one can still be used meanwhile. The UVs are applied once
+# it is done, as long as the model was not edited in between
+class PixerBackgroundOperator(bpy.types.Operator):
+    bl_label = "Pixer in background"
+    bl_idname = "rabid.pixer_background"
+
+    def execute(self, context):
+        pixer = context.scene.pixer
+        obj = context.active_object
+        if obj is None or obj.type != 'MESH':
+            self.report({'ERROR'}, "Select a mesh to pixelize")
+            return {'CANCELLED'}
+        settings = {"pixels_per_unit": pixer.pixels_in_3D_unit, "texture_size": pixer.texture_size,
+                    "selection_only": pixer.selection_only, "verify_overlaps": pixer.verify_overlaps,
+                    "tile_mode": pixer.tile_mode, "auto_texture_size": pixer.auto_texture_size,
+                    "auto_texture_size_step": pixer.auto_texture_size_step, "symmetry_mode": pixer.symmetry_mode,
+                    "instance_mode": pixer.instance_mode, "instance_rotation": pixer.instance_rotation,
+                    "streaming": pixer.streaming, "packing": pixer.packing,
+                    "stitch_time_limit": pixer.stitch_time_limit, "merge_islands": pixer.merge_islands,
+                    "keep_correct_uvs": pixer.keep_correct_uvs}
+        try:
+            if parse_texture_sizes(pixer.extra_texture_sizes):
+                raise Exception("Extra sizes cannot be pixelized in background")
+            self.start(obj, settings)
+        except Exception as exception:
+            self.report({'ERROR'}, str(exception))
+            return {'CANCELLED'}
+
+        window_manager = context.window_manager
+        self.timer = window_manager.event_timer_add(POLL_SECONDS, window=context.window)
+        window_manager.progress_begin(0, EXPECTED_STAGES)
+        window_manager.modal_handler_add(self)
+        self.report({'INFO'}, "Pixelizing " + obj.name + " in background...")
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type != 'TIMER' or event.timer is not self.timer:
+            return {'PASS_THROUGH'}
+        from .backgroundjob import RUNNING
+        stage, stage_name = self.buffer.get_stage()
+        context.window_manager.progress_update(min(stage, EXPECTED_STAGES))
+        if context.workspace is not None:
+            context.workspace.status_text_set("Pixer: " + (stage_name or "Starting") + "...")
+        if self.buffer.get_state() == RUNNING and self.process.poll() is None:
+            return {'PASS_THROUGH'}
+
+        try:
+            stats = self.finish()
+            log(INFO, "Stats: " + str(stats.as_dict()))
+            if stats.overlaps:
+                self.report({'WARNING'}, overlaps_report(stats.overlaps))
+            else:
+                self.report({'INFO'}, "Pixelized " + self.object_name + " in background!")
+        except Exception as exception:
+            self.report({'ERROR'}, str(exception))
+        finally:
+            self.clean(context)
+        return {'FINISHED'}
+
+    def cancel(self, context):
+        # A worker from the pool is stopped too if it is in the middle of the job, and a new one takes its place. A
+        # worker that already finished the job keeps running on its own, so it just goes back to the pool
+        from .backgroundjob import RUNNING
+        killed = self.buffer.get_state() == RUNNING and self.process.poll() is None
+        if killed:
+            self.process.kill()
+            self.process.wait()
+        self.clean(context)
+        if killed and self.pooled:
+            refill_workers()
+
+    # Writes the mesh and the settings in a new job folder and hands it to a warm worker, or to a new helper process
+    # if there is none waiting
+    def start(self, obj, settings: dict):
+        from .backgroundjob import JobBuffer, MESH_FILE, SETTINGS_FILE, get_mesh_signature
+        if obj.mode == 'EDIT':
+            obj.update_from_editmode()
+        mesh = obj.data
+        self.object_name = obj.name
+        self.job_folder = tempfile.mkdtemp(prefix="pixer_")
+        try:
+            self.buffer = JobBuffer(os.path.join(self.job_folder, MESH_FILE),
+                                    (len(mesh.vertices), len(mesh.polygons), len(mesh.loops)))
+        except Exception:
+            shutil.rmtree(self.job_folder, ignore_errors=True)
+            raise
+        mesh.vertices.foreach_get("co", self.buffer["coordinates"])
+        mesh.polygons.foreach_get("loop_start", self.buffer["loop_starts"])
+        mesh.polygons.foreach_get("loop_total", self.buffer["loop_totals"])
+        mesh.polygons.foreach_get("select", self.buffer["selected"])
+        mesh.polygons.foreach_get("material_index", self.buffer["material_indices"])
+        mesh.loops.foreach_get("vertex_index", self.buffer["loop_vertices"])
+        if mesh.uv_layers.active is not None:
+            mesh.uv_layers.active.data.foreach_get("uv", self.buffer["uvs"])
+        self.signature = get_mesh_signature(self.buffer["coordinates"], self.buffer["loop_vertices"])
+        with open(os.path.join(self.job_folder, SETTINGS_FILE), "w") as settings_file:
+            json.dump(settings, settings_file)
+        self.tile_mode = settings["tile_mode"]
+
+        self.process = take_worker()
+        self.pooled = self.process is not None
+        try:
+            if self.pooled:
+                send_job(self.process, self.job_folder)
+            else:
+                self.process = subprocess.Popen(get_worker_command(self.job_folder))
+        except Exception:
+            if self.pooled:
+                release_worker(self.process)
+            self.buffer.close()
+            shutil.rmtree(self.job_folder, ignore_errors=True)
+            raise
+        log(INFO, "Started background pixelization of " + obj.name + " in " + self.job_folder
+            + (" on a warm worker" if self.pooled else ""))
+
+    # Applies the UVs of a finished job in bulk. Returns the stats of the helper process
+    def finish(self) -> PixerStats:
+        import numpy as np
+        from .api import TEXTURE_SIZE_PROPERTY
+        from .backgroundjob import STATS_FILE, ERROR_FILE, RUNNING, DONE, VERT_COUNT, LOOP_COUNT, get_mesh_signature
+        from .uvpacker import PAGES
+        if self.buffer.get_state() == RUNNING:
+            raise Exception("Background pixelization stopped unexpectedly with code " + str(self.process.returncode))
+        if self.buffer.get_state() != DONE:
+            with open(os.path.join(self.job_folder, ERROR_FILE)) as error_file:
+                error = error_file.read()
+            log(ERROR, error)
+            raise Exception(error.splitlines()[0])
+
+        obj = bpy.data.objects.get(self.object_name)
+        if obj is None or obj.type != 'MESH':
+            raise Exception("The object " + self.object_name + " is gone, the UVs were not applied")
+        if obj.mode == 'EDIT':
+            obj.update_from_editmode()
+        mesh = obj.data
+        counts = (len(mesh.vertices), len(mesh.polygons), len(mesh.loops))
+        if counts != tuple(self.buffer.header[VERT_COUNT:LOOP_COUNT + 1]):
+            raise Exception("The model was edited while pixelizing, the UVs were not applied")
+        coordinates = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", coordinates)
+        loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get("vertex_index", loop_vertices)
+        if get_mesh_signature(coordinates, loop_vertices) != self.signature:
+            raise Exception("The model was edited while pixelizing, the UVs were not applied")
+
+        if obj.mode == 'EDIT':
+            # Changes to the mesh are lost when leaving edit mode, so they go through its bmesh
+            bm = bmesh.from_edit_mesh(mesh)
+            uv_layer = bm.loops.layers.uv.verify()
+            uvs = self.buffer["uvs"].reshape(-1, 2).tolist()
+            material_indices = self.buffer["material_indices"].tolist()
+            # Indices of the faces of the bmesh may be out of date, faces are in the same order as the polygons
+            for face_index, (face, start) in enumerate(zip(bm.faces, self.buffer["loop_starts"].tolist())):
+                if self.tile_mode == PAGES:
+                    face.material_index = material_indices[face_index]
+                for i, loop in enumerate(face.loops):
+                    loop[uv_layer].uv = uvs[start + i]
+            bmesh.update_edit_mesh(mesh, loop_triangles=False, destructive=False)
+        else:
+            if mesh.uv_layers.active is None:
+                mesh.uv_layers.new()
+            mesh.uv_layers.active.data.foreach_set("uv", self.buffer["uvs"])
+            if self.tile_mode == PAGES:
+                mesh.polygons.foreach_set("material_index", self.buffer["material_indices"])
+            mesh.update()
+
+        with open(os.path.join(self.job_folder, STATS_FILE), "rb") as stats_file:
+            stats = pickle.load(stats_file)
+        mesh[TEXTURE_SIZE_PROPERTY] = stats.texture_size
+        set_last_stats(stats)
+        return stats
+
+    def clean(self, context):
+        window_manager = context.window_manager
+        window_manager.event_timer_remove(self.timer)
+        window_manager.progress_end()
+        if context.workspace is not None:
+            context.workspace.status_text_set(None)
+        self.buffer.close()
+        shutil.rmtree(self.job_folder, ignore_errors=True)
+        if self.pooled:
+            release_worker(self.process)
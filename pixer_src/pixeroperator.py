@@ -1,199 +1,98 @@
-import bmesh
 import bpy
-from typing import Tuple, List, Dict
-from bmesh.types import BMesh, BMFace
-from .benchmarker import print_bench, bench_start, bench_end
-from .facestitcher import stitch, StitchingError, stitch_by_vertex
-from .pixeluvsolver import *
-from .uvpacker import simple_uv_packing
-from .validator import validate
+import os
+import tempfile
+from typing import Tuple, List
+from .benchmarker import print_bench
+from .logger import *
+from .profiler import start_profiling, end_profiling
+from .stats import PixerStats, get_stats
 
 
 class PixerOperator(bpy.types.Operator):
     bl_label = "Pixer"
     bl_idname = "rabid.pixer"
 
-    # Default values
-    pixels_per_3d_unit = 10
-    pixel_2d_size = 1.0 / 32.0
-    only_selection = True
-    separate_by_plane = True
-
     def execute(self, context):
         scene = context.scene
         pixer = scene.pixer
         try:
-            self.run(context, pixer.pixels_in_3D_unit, pixer.texture_size,
-                     pixer.selection_only)
-            self.report({'INFO'}, "All ok!")
+            stats = self.run(context, pixer.pixels_in_3D_unit, pixer.texture_size,
+                             pixer.selection_only, pixer.verify_overlaps,
+                             parse_texture_sizes(pixer.extra_texture_sizes), pixer.tile_mode,
+                             pixer.auto_texture_size, pixer.auto_texture_size_step, pixer.symmetry_mode,
+                             pixer.instance_mode, pixer.instance_rotation, pixer.streaming, pixer.packing,
+                             pixer.stitch_time_limit, pixer.merge_islands, pixer.keep_correct_uvs, pixer.profile)
+            log(INFO, "Stats: " + str(stats.as_dict()))
+            if stats.overlaps:
+                self.report({'WARNING'}, overlaps_report(stats.overlaps))
+            elif stats.degraded_faces:
+                self.report({'WARNING'}, "Stitch time limit reached, " + str(stats.degraded_faces)
+                            + " faces were left as separate islands")
+            elif stats.merge_cut_short:
+                self.report({'WARNING'}, "Stitch time limit reached, not all islands were merged")
+            elif stats.tiles_used[stats.texture_size] > 1:
+                self.report({'INFO'}, "All ok! UVs did not fit in one texture, they use "
+                            + str(stats.tiles_used[stats.texture_size]) + " tiles")
+            elif pixer.auto_texture_size:
+                self.report({'INFO'}, "All ok! Texture size is " + str(stats.texture_size))
+            else:
+                self.report({'INFO'}, "All ok!")
         except Exception as exception:
             self.report({'ERROR'}, str(exception))
         print_bench()
         return {'FINISHED'}
 
-    def run(self, context, pixels_in_3d_unit, texture_size, selection_only):
-        log(INFO, "Starting texture pixelation!")
-        self.pixels_per_3d_unit = pixels_in_3d_unit
-        self.pixel_2d_size = 1.0 / float(texture_size)
-        self.only_selection = selection_only
-
-        log(INFO, "Loading model data...")
-        bench_start("Load model")
+    def run(self, context, pixels_in_3d_unit, texture_size, selection_only, verify_overlaps=False,
+            extra_texture_sizes: List[int] = None, tile_mode: str = "UDIM", auto_texture_size: bool = False,
+            auto_texture_size_step: int = 0, symmetry_mode: str = "NONE", instance_mode: str = "NONE",
+            instance_rotation: bool = False, streaming: bool = False, packing: str = "COLUMNS",
+            stitch_time_limit: float = 0.0, merge_islands: bool = True, keep_correct_uvs: bool = False,
+            profile: bool = False) -> PixerStats:
+        # The solver is only loaded when it is first needed, so enabling the addon stays fast
+        from .api import PixerSession
         obj = context.active_object
-        me = obj.data
-        bm = bmesh.from_edit_mesh(me)
-        uv_layer = bm.loops.layers.uv.verify()
-        XFace.init(uv_layer)
-        bench_end("Load model")
-
-        log(INFO, "Validating model...")
-        validate(bm)
-
-        log(INFO, "Parsing faces...")
-        bench_start("Parse faces")
-        top, lateral, down = self._get_xfaces(bm)
-        bench_end("Parse faces")
-
-        log(INFO, "Solving faces...")
-        bench_start("Solve and stitch faces")
-        if self.separate_by_plane:
-            uv_islands_map = self._solve(lateral)
-            uv_islands_map = self._solve(top, uv_islands_map)
-            uv_islands_map = self._solve(down, uv_islands_map)
-        else:
-            uv_islands_map = self._solve(lateral + top + down)
-        bench_end("Solve and stitch faces")
-
-        log(INFO, "Packing UVs...")
-        bench_start("UV Packing")
-        simple_uv_packing(uv_islands_map, self.pixel_2d_size)
-
-        log(INFO, "Snapping packed UVs to pixel again...")
-        for xface in lateral + top + down:
-            snap_face_uv_to_pixel(xface, selection_only, self.pixel_2d_size)
-        bench_end("UV Packing")
-        bmesh.update_edit_mesh(me)
-
-    def _get_xfaces(self, bm: BMesh):
-        lateral_xfaces = []
-        top_xfaces = []
-        down_xfaces = []
-        for face in bm.faces:
-            if not self.only_selection or face.select:
-                new_xface = XFace(face)
-                if new_xface.get_plane() == XFace.LATERAL:
-                    lateral_xfaces.append(new_xface)
-                elif new_xface.get_plane() == XFace.TOP:
-                    top_xfaces.append(new_xface)
-                else:
-                    down_xfaces.append(new_xface)
-        log(DEBUG, "Lateral faces: " + str(len(lateral_xfaces)))
-        for xface in lateral_xfaces:
-            log(DEBUG, xface)
-        log(DEBUG, "Top faces: " + str(len(top_xfaces)))
-        for xface in top_xfaces:
-            log(DEBUG, xface)
-        log(DEBUG, "Down faces: " + str(len(down_xfaces)))
-        for xface in down_xfaces:
-            log(DEBUG, xface)
-        return top_xfaces, lateral_xfaces, down_xfaces
-
-    def _solve(self, all_faces: [XFace],
-               uv_islands_by_xface: Dict[BMFace, List[XFace]] = None) -> Dict[BMFace, List[XFace]]:
-        if uv_islands_by_xface is None:
-            uv_islands_by_xface = {}
-        for xface in all_faces:
-            if not xface.solved():
-                next_xfaces = [xface]
-                while len(next_xfaces) > 0:
-                    current = next_xfaces.pop(0)
-                    log(DEBUG, "Solving face " + str(current))
-                    bench_start("Solve face " + str(current.get_face().index), "Solve and stitch faces")
-                    solve_face(current, self.pixels_per_3d_unit, self.pixel_2d_size)
-                    bench_end("Solve face " + str(current.get_face().index), "Solve and stitch faces")
-
-                    stitched = False
-                    linked_solved, linked_unsolved = self._get_linked_faces_for(current)
-                    linked_edge_solved = []
-                    for linked in linked_solved:
-                        if current.get_common_edges(linked):
-                            linked_edge_solved.append(linked)
-
-                    linked_vertex_solved = []
-                    for linked in linked_solved:
-                        if linked not in linked_edge_solved:
-                            linked_vertex_solved.append(linked)
-
-                    linked_edge_unsolved = []
-                    for linked in linked_unsolved:
-                        if current.get_common_edges(linked):
-                            linked_edge_unsolved.append(linked)
-
-                    bench_start("Stitch face " + str(current.get_face().index), "Solve and stitch faces")
-                    for linked in linked_edge_solved:
-                        try:
-                            log(DEBUG, "Stitching face " + str(current) + " to near linked face " + str(linked))
-                            stitch(current, linked, uv_islands_by_xface[linked.get_face()])
-                        except StitchingError as error:
-                            log(DEBUG, "The face " + str(current) + " cannot be stitched to " + str(linked)
-                                + " because of " + str(error))
-                        except Exception as error:
-                            log(ERROR, "Unexpected exception " + str(error))
-                            raise error
-                        else:
-                            log(DEBUG, "Face " + str(current) + " was stitched to face " + str(linked))
-                            uv_islands_by_xface[linked.get_face()].append(current)
-                            uv_islands_by_xface[current.get_face()] = uv_islands_by_xface[linked.get_face()]
-                            stitched = True
-                            break
-
-                    if not stitched and linked_vertex_solved and not linked_edge_unsolved:
-                        log(DEBUG, "Failed to stitch face by edge to near solved faces, trying to stitch it by vertex")
-                        for linked in linked_vertex_solved:
-                            try:
-                                log(DEBUG, "Stitching face " + str(current) + " to near linked face " + str(linked))
-                                stitch_by_vertex(current, linked, uv_islands_by_xface[linked.get_face()])
-                            except StitchingError as error:
-                                log(DEBUG, "The face " + str(current) + " cannot be stitched to " + str(linked)
-                                    + " because of " + str(error))
-                            except Exception as error:
-                                log(ERROR, "Unexpected exception " + str(error))
-                                raise error
-                            else:
-                                log(DEBUG, "Face " + str(current) + " was stitched to face " + str(linked))
-                                uv_islands_by_xface[linked.get_face()].append(current)
-                                uv_islands_by_xface[current.get_face()] = uv_islands_by_xface[linked.get_face()]
-                                stitched = True
-                                break
-                    bench_end("Stitch face " + str(current.get_face().index), "Solve and stitch faces")
-
-                    if not stitched:
-                        log(DEBUG, "Face " + str(current) + " was not stitched to any near solved faces")
-                        uv_islands_by_xface[current.get_face()] = [current]
-
-                    log(DEBUG, "Detected near unsolved faces")
-                    for n in linked_unsolved:
-                        log(DEBUG, str(n))
-
-                    for linked in linked_unsolved:
-                        if linked not in next_xfaces:
-                            if not self.separate_by_plane or linked.get_plane() == current.get_plane():
-                                next_xfaces.append(linked)
-
-                    next_xfaces = sorted(next_xfaces, key=lambda sorting_xface: sorting_xface.get_score(), reverse=True)
-                    if next_xfaces:
-                        log(DEBUG, "Next near xfaces to solve and stitch")
-                        for n in next_xfaces:
-                            log(DEBUG, str(n))
-        return uv_islands_by_xface
-
-    def _get_linked_faces_for(self, xface: XFace) -> Tuple[List[XFace], List[XFace]]:
-        linked_solved = set()
-        linked_unsolved = set()
-        for linked_xface in xface.get_linked_xfaces():
-            if not self.only_selection or linked_xface.get_face().select:
-                if linked_xface.solved():
-                    linked_solved.add(linked_xface)
-                else:
-                    linked_unsolved.add(linked_xface)
-        return list(linked_solved), list(linked_unsolved)
+        if profile:
+            start_profiling()
+        try:
+            return PixerSession(obj.data, obj).pixelize(pixels_in_3d_unit, texture_size, selection_only,
+                                                        verify_overlaps, extra_texture_sizes, tile_mode,
+                                                        auto_texture_size, auto_texture_size_step, symmetry_mode,
+                                                        instance_mode, instance_rotation, streaming, packing,
+                                                        stitch_time_limit, merge_islands, keep_correct_uvs,
+                                                        report_memory=profile)
+        finally:
+            # Failed runs are saved too, they are the ones that end up in bug reports
+            if profile:
+                paths = end_profiling(get_profile_path_base(obj.name),
+                                      {"blender": bpy.app.version_string, "stats": get_stats().as_dict()})
+                self.report({'INFO'}, "Profile saved to " + paths[-1])
+
+
+# Profiles go next to the .blend file, or to the temporary folder if the file was never saved
+def get_profile_path_base(object_name: str) -> str:
+    if bpy.data.filepath:
+        directory, blend_name = os.path.split(bpy.path.abspath(bpy.data.filepath))
+        blend_name = os.path.splitext(blend_name)[0]
+    else:
+        directory, blend_name = tempfile.gettempdir(), "untitled"
+    return os.path.join(directory, blend_name + "_" + bpy.path.clean_name(object_name) + "_pixer_profile")
+
+
+def parse_texture_sizes(texture_sizes: str) -> List[int]:
+    sizes = []
+    for size in texture_sizes.replace(" ", "").split(","):
+        if not size:
+            continue
+        if not size.isdigit() or int(size) < 1:
+            raise Exception("Invalid texture size '" + size + "', sizes must be separated by commas")
+        sizes.append(int(size))
+    return sizes
+
+
+def overlaps_report(overlaps: List[Tuple[int, int]], max_pairs: int = 5) -> str:
+    for pair in overlaps:
+        log(WARN, "Faces " + str(pair[0]) + " and " + str(pair[1]) + " overlap in UV")
+    shown = ", ".join(str(pair) for pair in overlaps[:max_pairs])
+    if len(overlaps) > max_pairs:
+        shown += "..."
+    return "Found " + str(len(overlaps)) + " overlapping face pairs in UV: " + shown
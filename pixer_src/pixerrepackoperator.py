@@ -0,0 +1,35 @@
+import bpy
+from .benchmarker import print_bench
+from .logger import *
+from .stats import PixerStats
+
+
+# Packs the current pixer UVs of the model again with the texture settings of the panel, without solving the faces
+class PixerRepackOperator(bpy.types.Operator):
+    bl_label = "Pixer repack"
+    bl_idname = "rabid.pixer_repack"
+
+    def execute(self, context):
+        scene = context.scene
+        pixer = scene.pixer
+        try:
+            stats = self.run(context, pixer.texture_size, pixer.tile_mode, pixer.packing, pixer.auto_texture_size,
+                             pixer.auto_texture_size_step)
+            log(INFO, "Stats: " + str(stats.as_dict()))
+            if stats.tiles_used[stats.texture_size] > 1:
+                self.report({'INFO'}, "Repacked " + str(stats.get_island_count()) + " islands, they did not fit in "
+                            "one texture, they use " + str(stats.tiles_used[stats.texture_size]) + " tiles")
+            else:
+                self.report({'INFO'}, "Repacked " + str(stats.get_island_count()) + " islands in a texture of "
+                            + str(stats.texture_size))
+        except Exception as exception:
+            self.report({'ERROR'}, str(exception))
+        print_bench()
+        return {'FINISHED'}
+
+    def run(self, context, texture_size, tile_mode: str = "UDIM", packing: str = "COLUMNS",
+            auto_texture_size: bool = False, auto_texture_size_step: int = 0) -> PixerStats:
+        from .api import PixerSession
+        obj = context.active_object
+        return PixerSession(obj.data, obj).repack(texture_size, tile_mode, packing, auto_texture_size,
+                                                  auto_texture_size_step)
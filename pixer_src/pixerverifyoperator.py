@@ -0,0 +1,51 @@
+import bmesh
+import bpy
+from .benchmarker import print_bench, bench_start, bench_end
+from .logger import *
+from .pixeroperator import overlaps_report
+
+
+# Audits the current UV layout of the model without modifying it. Faces that overlap are selected
+class PixerVerifyOperator(bpy.types.Operator):
+    bl_label = "Pixer verify"
+    bl_idname = "rabid.pixer_verify"
+
+    def execute(self, context):
+        scene = context.scene
+        pixer = scene.pixer
+        try:
+            overlaps = self.run(context, pixer.texture_size, pixer.selection_only)
+            if overlaps:
+                self.report({'WARNING'}, overlaps_report(overlaps))
+            else:
+                self.report({'INFO'}, "No overlaps found!")
+        except Exception as exception:
+            self.report({'ERROR'}, str(exception))
+        print_bench()
+        return {'FINISHED'}
+
+    def run(self, context, texture_size, selection_only):
+        from .uvverifier import find_uv_overlaps
+        log(INFO, "Verifying UVs...")
+        bench_start("Verify overlaps")
+        me = context.active_object.data
+        bm = bmesh.from_edit_mesh(me)
+        uv_layer = bm.loops.layers.uv.active
+        if uv_layer is None:
+            raise Exception("The model has no UVs to verify!")
+
+        bm.faces.index_update()
+        faces = [face for face in bm.faces if not selection_only or face.select]
+        overlaps = find_uv_overlaps([(face.index, [loop[uv_layer].uv.copy() for loop in face.loops])
+                                     for face in faces], 1.0 / float(texture_size))
+
+        if overlaps:
+            bm.faces.ensure_lookup_table()
+            for face in faces:
+                face.select_set(False)
+            for pair in overlaps:
+                bm.faces[pair[0]].select_set(True)
+                bm.faces[pair[1]].select_set(True)
+            bmesh.update_edit_mesh(me)
+        bench_end("Verify overlaps")
+        return overlaps
@@ -0,0 +1,120 @@
+# PROFILER
+# Opt-in capture of where the time and the memory go on each stage of a run. Stages are the top level benchmarks,
+# each one gets its own cProfile and its own tracemalloc peak. At the end everything is saved as a .pstats file with
+# all the stages and a JSON summary, so they can be attached to a bug report.
+# Like the benchmarker, the state of the current capture is kept at module level
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+from typing import Dict, List
+
+from .logger import *
+
+TOP_FUNCTIONS = 15
+TOP_ALLOCATIONS = 10
+
+profiling = False
+started_tracing = False
+current_stage = None
+stage_profiles: Dict[str, cProfile.Profile] = {}
+stage_seconds: Dict[str, float] = {}
+stage_memory: Dict[str, dict] = {}
+stage_start_time = 0.0
+stage_start_memory = (0, 0)
+
+
+def start_profiling():
+    global profiling, started_tracing, current_stage
+    stage_profiles.clear()
+    stage_seconds.clear()
+    stage_memory.clear()
+    current_stage = None
+    profiling = True
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+
+
+def profile_stage_start(name: str):
+    global current_stage, stage_start_time, stage_start_memory
+    if not profiling:
+        return
+    # Stages do not nest, a stage that was not ended is ended here
+    if current_stage is not None:
+        profile_stage_end(current_stage)
+    # The peak is not reset, tracemalloc.reset_peak needs Python 3.9 and the whole run peak is reported as well
+    stage_start_memory = tracemalloc.get_traced_memory()
+    current_stage = name
+    stage_start_time = time.perf_counter()
+    stage_profiles.setdefault(name, cProfile.Profile()).enable()
+
+
+def profile_stage_end(name: str):
+    global current_stage
+    if not profiling or current_stage != name:
+        return
+    stage_profiles[name].disable()
+    stage_seconds[name] = stage_seconds.get(name, 0.0) + time.perf_counter() - stage_start_time
+    peak = max(_get_stage_peak(), stage_memory.get(name, {}).get("peak_memory", 0))
+    stage_memory[name] = {"peak_memory": peak, "top_allocations": _get_top_allocations()}
+    current_stage = None
+
+
+# Stops the capture and saves it as <path_base>.pstats and <path_base>.json. Returns the paths of the saved files
+def end_profiling(path_base: str, extra: dict = None) -> List[str]:
+    global profiling, started_tracing
+    if current_stage is not None:
+        profile_stage_end(current_stage)
+    profiling = False
+    if started_tracing:
+        tracemalloc.stop()
+        started_tracing = False
+
+    paths = []
+    all_stats = None
+    summary = {"stages": {}}
+    for name, profile in stage_profiles.items():
+        stats = pstats.Stats(profile)
+        if all_stats is None:
+            all_stats = stats
+        else:
+            all_stats.add(profile)
+        summary["stages"][name] = {"seconds": stage_seconds.get(name, 0.0),
+                                   "peak_memory": stage_memory.get(name, {}).get("peak_memory", 0),
+                                   "top_functions": _get_top_functions(stats),
+                                   "top_allocations": stage_memory.get(name, {}).get("top_allocations", [])}
+    summary["peak_memory"] = max((memory["peak_memory"] for memory in stage_memory.values()), default=0)
+    summary.update(extra or {})
+
+    if all_stats is not None:
+        all_stats.dump_stats(path_base + ".pstats")
+        paths.append(path_base + ".pstats")
+    with open(path_base + ".json", "w") as summary_file:
+        json.dump(summary, summary_file, indent=2)
+    paths.append(path_base + ".json")
+    log(INFO, "Profile saved to " + ", ".join(paths))
+    return paths
+
+
+# A peak higher than the one there was when the stage started was reached in the stage. Otherwise the stage stayed
+# below it, and the most it is known to have used is the most it had at its start or at its end
+def _get_stage_peak() -> int:
+    start_current, start_peak = stage_start_memory
+    current, peak = tracemalloc.get_traced_memory()
+    return peak if peak > start_peak else max(start_current, current)
+
+
+def _get_top_functions(stats: pstats.Stats) -> List[dict]:
+    functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+    return [{"function": file + ":" + str(line) + "(" + function + ")", "calls": calls,
+             "total_seconds": total_time, "cumulative_seconds": cumulative_time}
+            for (file, line, function), (_, calls, total_time, cumulative_time, _) in functions]
+
+
+def _get_top_allocations() -> List[dict]:
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                                          tracemalloc.Filter(False, "<frozen importlib._bootstrap>")])
+    return [{"site": str(statistic.traceback), "size": statistic.size, "count": statistic.count}
+            for statistic in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]]
@@ -0,0 +1,107 @@
+# STATS
+# Counters and metrics collected while pixelizing a model, so we can tell where the time goes on a given asset.
+# Like the benchmarker, the stats of the current run are kept at module level so any stage can count things
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+
+class PixerStats:
+    def __init__(self):
+        self.faces_by_plane: Dict[str, int] = {"LATERAL": 0, "TOP": 0, "DOWN": 0}
+        self.island_sizes: [int] = []
+        self.stitch_attempts: Dict[str, int] = {}
+        self.overlap_tests = 0
+        self.texel_fill_ratio = 0.0
+        self.tiles_used: Dict[int, int] = {}
+        self.texture_size = 0
+        self.mirrored_faces = 0
+        self.instanced_faces = 0
+        self.peak_memory = 0
+        self.degraded_faces = 0
+        self.merged_islands = 0
+        self.merge_cut_short = False
+        self.kept_faces = 0
+        self.overlaps: List[Tuple[int, int]] = []
+        self.solve_reused = False
+
+    def count_face(self, plane: str):
+        self.faces_by_plane[plane] = self.faces_by_plane.get(plane, 0) + 1
+
+    def count_stitch_attempt(self, outcome: str):
+        self.stitch_attempts[outcome] = self.stitch_attempts.get(outcome, 0) + 1
+
+    # Takes the counts of the solve stages from the stats of the run that solved the faces first
+    def copy_solve_counts(self, other: PixerStats):
+        self.faces_by_plane = dict(other.faces_by_plane)
+        self.stitch_attempts = dict(other.stitch_attempts)
+        self.overlap_tests = other.overlap_tests
+        self.mirrored_faces = other.mirrored_faces
+        self.instanced_faces = other.instanced_faces
+        self.degraded_faces = other.degraded_faces
+        self.merged_islands = other.merged_islands
+        self.merge_cut_short = other.merge_cut_short
+
+    def get_island_count(self) -> int:
+        return len(self.island_sizes)
+
+    # Islands are grouped by face count in power of two buckets: 1, 2-3, 4-7, 8-15...
+    def get_island_histogram(self) -> Dict[str, int]:
+        histogram = {}
+        for size in sorted(self.island_sizes):
+            low = 1 << (size.bit_length() - 1)
+            high = (low << 1) - 1
+            bucket = str(low) if low == high else str(low) + "-" + str(high)
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+        return histogram
+
+    def as_dict(self) -> dict:
+        return {
+            "faces_by_plane": dict(self.faces_by_plane),
+            "island_count": self.get_island_count(),
+            "island_histogram": self.get_island_histogram(),
+            "stitch_attempts": dict(self.stitch_attempts),
+            "overlap_tests": self.overlap_tests,
+            "texel_fill_ratio": self.texel_fill_ratio,
+            "tiles_used": dict(self.tiles_used),
+            "texture_size": self.texture_size,
+            "mirrored_faces": self.mirrored_faces,
+            "instanced_faces": self.instanced_faces,
+            "peak_memory": self.peak_memory,
+            "degraded_faces": self.degraded_faces,
+            "merged_islands": self.merged_islands,
+            "merge_cut_short": self.merge_cut_short,
+            "kept_faces": self.kept_faces,
+            "overlaps": [list(pair) for pair in self.overlaps],
+            "solve_reused": self.solve_reused,
+        }
+
+
+current_stats = PixerStats()
+last_stats: PixerStats = None
+
+
+def start_stats() -> PixerStats:
+    global current_stats
+    current_stats = PixerStats()
+    return current_stats
+
+
+def end_stats() -> PixerStats:
+    global last_stats
+    last_stats = current_stats
+    return last_stats
+
+
+def get_stats() -> PixerStats:
+    return current_stats
+
+
+def get_last_stats() -> PixerStats:
+    return last_stats
+
+
+# Stats of runs done somewhere else, like in a background process, are shown as the last ones too
+def set_last_stats(stats: PixerStats):
+    global last_stats
+    last_stats = stats
@@ -0,0 +1,46 @@
+# SYMMETRY
+# Finds faces that are an exact mirror of another face across the X = 0 plane, so only one half of a symmetric
+# model has to be solved. The faces on the positive X side are derived from their mirror afterwards
+from typing import Dict, Tuple
+
+from bmesh.types import BMFace
+from mathutils import Vector
+
+from .facederiver import DerivedFaces
+from .logger import *
+
+NONE = "NONE"
+# Mirrored faces use the same texels as the faces they mirror
+SHARE = "SHARE"
+# Mirrored faces get their own copy of the island, flipped
+MIRROR = "MIRROR"
+
+# Coordinates are snapped to this grid before comparing them
+SYMMETRY_PRECISION = 10 ** -4
+
+
+def find_mirrored_faces(faces: [BMFace]) -> DerivedFaces:
+    faces_by_key: Dict[frozenset, BMFace] = {}
+    for face in faces:
+        faces_by_key[frozenset(_get_key(loop.vert.co) for loop in face.loops)] = face
+
+    mirrored_faces = {}
+    for face in faces:
+        if face.calc_center_median().x <= SYMMETRY_PRECISION:
+            continue
+        mirrored_keys = [_mirror_key(_get_key(loop.vert.co)) for loop in face.loops]
+        source = faces_by_key.get(frozenset(mirrored_keys))
+        if source is None or source is face:
+            continue
+        source_loops = {_get_key(loop.vert.co): i for i, loop in enumerate(source.loops)}
+        mirrored_faces[face] = (source, [source_loops[key] for key in mirrored_keys])
+    log(DEBUG, "Found " + str(len(mirrored_faces)) + " mirrored faces")
+    return mirrored_faces
+
+
+def _get_key(co: Vector) -> Tuple[int, int, int]:
+    return round(co.x / SYMMETRY_PRECISION), round(co.y / SYMMETRY_PRECISION), round(co.z / SYMMETRY_PRECISION)
+
+
+def _mirror_key(key: Tuple[int, int, int]) -> Tuple[int, int, int]:
+    return -key[0], key[1], key[2]
@@ -0,0 +1,64 @@
+# UV AUDITOR
+# Checks the UVs a model already has against what the solver gives each face, with array operations over all the
+# loops at once: every UV on a whole pixel, every edge that is aligned in 3D aligned with the same UV axis as the
+# other aligned edges of its face and as many pixels long as in 3D, and every other edge about as long as in 3D.
+# Faces that pass can keep their UVs, only the ones that fail have to be solved again
+from typing import List
+
+import numpy as np
+from bmesh.types import BMesh, BMLayerItem
+
+from .faceparser import FaceRecords
+from .logger import *
+from .uvpacker import READ_PIXEL_TOLERANCE
+
+# Edges that are not aligned in 3D are only snapped by the solver, not fixed, so their length in pixels can be this
+# far from their length in 3D
+UNALIGNED_LENGTH_TOLERANCE = 2.0
+
+
+# Returns the indices of the faces of the records whose UVs are not what the solver would give them for the texture
+# size and the pixels per 3D unit
+def audit_faces(bm: BMesh, records: FaceRecords, uv_layer: BMLayerItem, texture_size: int,
+                pixels_per_3d: int) -> List[int]:
+    face_indices = records.get_face_indices(False)
+    if not face_indices:
+        return []
+    # Loops are put where the records keep the alignment of their edges, which are not always in face order
+    totals = records.loop_totals.astype(np.int64)
+    faces_of_loops = np.repeat(np.arange(len(face_indices)), totals)
+    first_loops = np.repeat(np.cumsum(totals) - totals, totals)
+    positions = np.repeat(records.loop_starts.astype(np.int64), totals) + np.arange(len(faces_of_loops)) - first_loops
+    loops = [loop for face_index in face_indices for loop in bm.faces[face_index].loops]
+    coordinates = np.zeros((len(records.horizontal), 3))
+    coordinates[positions] = np.array([loop.vert.co for loop in loops], dtype=np.float64).reshape(-1, 3)
+    pixels = np.zeros((len(records.horizontal), 2))
+    pixels[positions] = np.array([loop[uv_layer].uv for loop in loops], dtype=np.float64).reshape(-1, 2) \
+        * texture_size
+
+    # Edge i of a face goes from its loop i to its loop i + 1, wrapping on the last loop
+    next_positions = positions + 1
+    last_loops = np.cumsum(totals) - 1
+    next_positions[last_loops] = records.loop_starts.astype(np.int64)
+    horizontal = records.horizontal[positions]
+    vertical = records.vertical[positions]
+    aligned = horizontal | vertical
+
+    snapped = np.round(pixels)
+    off_grid = (np.abs(pixels[positions] - snapped[positions]) > READ_PIXEL_TOLERANCE).any(axis=1)
+    delta = snapped[next_positions] - snapped[positions]
+    length_2d = np.hypot(delta[:, 0], delta[:, 1])
+    length_3d = np.linalg.norm(coordinates[next_positions] - coordinates[positions], axis=1) * pixels_per_3d
+    wrong_length = np.where(aligned, np.round(length_2d) != np.round(length_3d),
+                            np.abs(length_2d - length_3d) > UNALIGNED_LENGTH_TOLERANCE)
+    # Stitching turns faces by quarter turns, so horizontal edges can end up on either UV axis, but all the edges of
+    # a face have to be turned the same
+    not_upright = (horizontal & (delta[:, 1] != 0)) | (vertical & (delta[:, 0] != 0))
+    not_turned = (horizontal & (delta[:, 0] != 0)) | (vertical & (delta[:, 1] != 0))
+
+    face_count = len(face_indices)
+    failing = (np.bincount(faces_of_loops, weights=off_grid | wrong_length, minlength=face_count) > 0) \
+        | ((np.bincount(faces_of_loops, weights=not_upright, minlength=face_count) > 0)
+           & (np.bincount(faces_of_loops, weights=not_turned, minlength=face_count) > 0))
+    log(DEBUG, "Audited " + str(face_count) + " faces, " + str(int(failing.sum())) + " of them are not pixel perfect")
+    return [face_indices[row] for row in np.flatnonzero(failing)]
@@ -1,31 +1,252 @@
-from math import inf
-from bmesh.types import BMFace
-from typing import Dict, List
+from bmesh.types import BMFace, BMLayerItem
+from typing import Dict, List, Tuple
 from mathutils import Vector
+from pixer_src.logger import *
+from pixer_src.maskpacker import get_mask_offsets, get_occupied_tiles, rotate_uv
 from pixer_src.xface import XFace
 
+# What to do with islands that do not fit in the 0..1 UV space
+# UDIM: Keep going on the next UDIM tile (1001, 1002... 10 tiles per row)
+# PAGES: Keep UVs in 0..1 and use the material index of the faces to tell which atlas page they are on
+UDIM = "UDIM"
+PAGES = "PAGES"
+UDIM_TILES_PER_ROW = 10
+MAX_TEXTURE_SIZE = 16384
 
-def simple_uv_packing(uv_island_map: Dict[BMFace, List[XFace]], pixel_2d_size: float):
-    uv_islands = _uv_islands_map_to_list(uv_island_map)
+# How islands are placed on the texture
+# COLUMNS: By their bounding box, in columns. Fast, but leaves gaps around islands that are not rectangles
+# SHAPES: By their real shape, rotated 90 degrees when it fits better. Slower, but fills the texture much more
+COLUMNS = "COLUMNS"
+SHAPES = "SHAPES"
+# UVs read back from a layer that are closer than this to a whole pixel are taken as that pixel
+READ_PIXEL_TOLERANCE = 10 ** -3
+
+
+# Compact copy of a solved island: its faces and their UVs in whole pixels. Once islands are summarized, their
+# XFaces are not needed anymore to pack them and write their UVs
+class IslandSummary:
+    def __init__(self, faces: List[BMFace], uvs: List[List[Tuple[int, int]]]):
+        self.faces = faces
+        self.uvs = uvs
+        self.bounds = (min(uv[0] for face_uvs in uvs for uv in face_uvs),
+                       min(uv[1] for face_uvs in uvs for uv in face_uvs),
+                       max(uv[0] for face_uvs in uvs for uv in face_uvs),
+                       max(uv[1] for face_uvs in uvs for uv in face_uvs))
+
+
+def summarize_islands(uv_islands: List[List[XFace]]) -> List[IslandSummary]:
+    return [IslandSummary([xface.get_face() for xface in uv_island],
+                          [[(round(uv.x), round(uv.y)) for uv in xface.get_all_uvs()] for xface in uv_island])
+            for uv_island in uv_islands]
+
+
+# Reads UVs written by pixer back as islands in whole pixels, so they can be packed again without solving the faces.
+# Faces are on the same island when they have a vertex with the same UV in common, and on atlas pages the same page
+# too. Islands on the same bounds share their texels, like copies of repeated parts, so they are kept as one island.
+# Returns the islands and the faces that share texels with faces of another island
+def read_uv_islands(faces: List[BMFace], uv_layer: BMLayerItem, texture_size: int,
+                    by_page: bool = False) -> Tuple[List[IslandSummary], set]:
+    faces_uvs, off_grid = read_pixel_uvs(faces, uv_layer, texture_size)
+    if off_grid:
+        raise Exception(str(off_grid) + " UVs are not on the pixels of a texture of " + str(texture_size)
+                        + ", pixelize the model again instead")
+
+    stacked = {}
+    for indices in group_uv_islands(faces, faces_uvs, by_page):
+        island = IslandSummary([faces[i] for i in indices], [faces_uvs[i] for i in indices])
+        page = island.faces[0].material_index if by_page else 0
+        stacked.setdefault(island.bounds + (page,), []).append(island)
+    islands = []
+    shared_faces = set()
+    for same_bounds in stacked.values():
+        islands.append(IslandSummary([face for island in same_bounds for face in island.faces],
+                                     [face_uvs for island in same_bounds for face_uvs in island.uvs]))
+        shared_faces.update(face for island in same_bounds[1:] for face in island.faces)
+    return islands, shared_faces
+
+
+# Returns the UVs of the faces rounded to whole pixels of the texture, and how many of them were not on a pixel
+def read_pixel_uvs(faces: List[BMFace], uv_layer: BMLayerItem,
+                   texture_size: int) -> Tuple[List[List[Tuple[int, int]]], int]:
+    faces_uvs = []
+    off_grid = 0
+    for face in faces:
+        face_uvs = []
+        for loop in face.loops:
+            uv = loop[uv_layer].uv
+            x, y = uv.x * texture_size, uv.y * texture_size
+            pixel = (int(round(x)), int(round(y)))
+            if abs(x - pixel[0]) > READ_PIXEL_TOLERANCE or abs(y - pixel[1]) > READ_PIXEL_TOLERANCE:
+                off_grid += 1
+            face_uvs.append(pixel)
+        faces_uvs.append(face_uvs)
+    return faces_uvs, off_grid
+
+
+# Groups the faces that have a vertex with the same pixel UV in common, and on atlas pages the same page too. Returns
+# the indices of the faces of each group
+def group_uv_islands(faces: List[BMFace], faces_uvs: List[List[Tuple[int, int]]],
+                     by_page: bool = False) -> List[List[int]]:
+    parents = list(range(len(faces)))
+    corners = {}
+    for i, face in enumerate(faces):
+        page = face.material_index if by_page else 0
+        for loop, pixel in zip(face.loops, faces_uvs[i]):
+            other = corners.setdefault((loop.vert, pixel, page), i)
+            if other != i:
+                parents[_find_root(parents, i)] = _find_root(parents, other)
+    faces_by_root = {}
+    for i in range(len(faces)):
+        faces_by_root.setdefault(_find_root(parents, i), []).append(i)
+    return list(faces_by_root.values())
+
+
+def _find_root(parents: List[int], i: int) -> int:
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+# Packs the islands in columns, going on to the next tile once a whole texture is full. Islands are solved in pixel
+# units, so offsets are whole pixels and the packing only depends on the texture size. Moving an island, snapping
+# it to the pixel grid and scaling it to the texture size are done later in the same single write over its loops.
+# Returns the (x, y, tile, rotated) offset of each island
+def simple_uv_packing(islands: List[IslandSummary], texture_size: int) -> List[Tuple[int, int, int, bool]]:
+    return _get_pixel_offsets([island.bounds for island in islands], texture_size)
+
+
+def pack_islands(islands: List[IslandSummary], texture_size: int,
+                 packing: str = COLUMNS) -> List[Tuple[int, int, int, bool]]:
+    if packing == SHAPES:
+        return get_mask_offsets([island.uvs for island in islands], texture_size)
+    return simple_uv_packing(islands, texture_size)
+
+
+# Packs the islands by shape in the space the fixed islands leave free, without moving the fixed islands. Fixed islands
+# are read back from the UVs, so they are already on their UDIM tile, or their faces on their atlas page. Only the
+# shape packer can fit islands around others, so it is used whatever the packing is. Returns the offsets of the fixed
+# islands, which leave them where they are, and the offsets of the islands
+def pack_islands_around(islands: List[IslandSummary], fixed_islands: List[IslandSummary], texture_size: int,
+                        tile_mode: str = UDIM) -> Tuple[List[Tuple[int, int, int, bool]],
+                                                        List[Tuple[int, int, int, bool]]]:
+    fixed_offsets = []
+    for island in fixed_islands:
+        if tile_mode == PAGES:
+            fixed_offsets.append((0, 0, island.faces[0].material_index, False))
+            continue
+        column = min(max(0, island.bounds[0] // texture_size), UDIM_TILES_PER_ROW - 1)
+        row = max(0, island.bounds[1] // texture_size)
+        tile = row * UDIM_TILES_PER_ROW + column
+        tile_x, tile_y = _get_tile_pixel_offset(tile, texture_size, tile_mode)
+        fixed_offsets.append((-tile_x, -tile_y, tile, False))
+    tiles = get_occupied_tiles([[[(uv[0] + offset[0], uv[1] + offset[1]) for uv in face_uvs] for face_uvs in island.uvs]
+                                for island, offset in zip(fixed_islands, fixed_offsets)],
+                               [offset[2] for offset in fixed_offsets], texture_size)
+    return fixed_offsets, get_mask_offsets([island.uvs for island in islands], texture_size, True, tiles)
+
+
+# Finds the smallest texture size in which all the islands fit in a single tile. Candidates are powers of two, or
+# multiples of 'step' if it is given. As the islands are solved in pixel units, each candidate is just a packing
+# of integer pixels, so a binary search over the candidates is cheap
+def find_minimum_texture_size(islands: List[IslandSummary], step: int = 0, packing: str = COLUMNS) -> int:
+    bounds = [island.bounds for island in islands]
+    if step > 0:
+        candidates = list(range(step, MAX_TEXTURE_SIZE + 1, step))
+    else:
+        candidates = [1 << i for i in range(MAX_TEXTURE_SIZE.bit_length())]
+    if not candidates:
+        raise Exception("There is no texture size that is a multiple of " + str(step) + " up to "
+                        + str(MAX_TEXTURE_SIZE))
+
+    # No size below the biggest island or below the total area of the islands can fit them all. Islands packed by
+    # shape can go in the empty corners of the bounds of others, so only the area of their faces counts then
+    min_size = 1
+    for left, bot, right, top in bounds:
+        min_size = max(min_size, right - left, top - bot)
+    if packing == SHAPES:
+        area = sum(_get_face_area(face_uvs) for island in islands for face_uvs in island.uvs)
+    else:
+        area = sum((right - left) * (top - bot) for left, bot, right, top in bounds)
+    candidates = [size for size in candidates if size >= min_size and size * size >= area] or candidates[-1:]
+
+    low = 0
+    high = len(candidates) - 1
+    while low < high:
+        middle = (low + high) // 2
+        if get_tiles_used(pack_islands(islands, candidates[middle], packing)) == 1:
+            high = middle
+        else:
+            low = middle + 1
+    log(DEBUG, "Minimum texture size found is " + str(candidates[low]))
+    return candidates[low]
+
+
+def _get_face_area(face_uvs: List[Tuple[int, int]]) -> float:
+    return abs(sum(face_uvs[i - 1][0] * face_uvs[i][1] - face_uvs[i][0] * face_uvs[i - 1][1]
+                   for i in range(len(face_uvs)))) / 2
+
+
+def get_tiles_used(offsets: List[Tuple[int, int, int, bool]]) -> int:
+    return max((offset[2] for offset in offsets), default=0) + 1
+
+
+# Returns the final UVs of each face of the island once it is rotated and moved by the offset and scaled to the
+# texture size
+def get_packed_uvs(island: IslandSummary, offset: Tuple[int, int, int, bool], texture_size: int,
+                   tile_mode: str = UDIM) -> List[List[Vector]]:
+    pixel_2d_size = 1.0 / float(texture_size)
+    tile_x, tile_y = _get_tile_pixel_offset(offset[2], texture_size, tile_mode)
+    uvs = [[rotate_uv(uv) for uv in face_uvs] for face_uvs in island.uvs] if offset[3] else island.uvs
+    return [[Vector(((uv[0] + offset[0] + tile_x) * pixel_2d_size, (uv[1] + offset[1] + tile_y) * pixel_2d_size))
+             for uv in face_uvs] for face_uvs in uvs]
+
+
+def write_packed_uvs(islands: List[IslandSummary], offsets: List[Tuple[int, int, int, bool]], uv_layer: BMLayerItem,
+                     texture_size: int, tile_mode: str = UDIM, assign_pages: bool = True):
+    for island, offset in zip(islands, offsets):
+        for face, face_uvs in zip(island.faces, get_packed_uvs(island, offset, texture_size, tile_mode)):
+            if tile_mode == PAGES and assign_pages:
+                face.material_index = offset[2]
+            for loop, uv in zip(face.loops, face_uvs):
+                loop[uv_layer].uv = uv
+
+
+def _get_tile_pixel_offset(tile: int, texture_size: int, tile_mode: str) -> Tuple[int, int]:
+    if tile_mode == PAGES:
+        return 0, 0
+    return (tile % UDIM_TILES_PER_ROW) * texture_size, (tile // UDIM_TILES_PER_ROW) * texture_size
+
+
+def _get_pixel_offsets(bounds: List[Tuple[int, int, int, int]],
+                       texture_pixels: int) -> List[Tuple[int, int, int, bool]]:
+    offsets = []
+    tile = 0
     left = 0
     next_left = 0
     bot = 0
-    for uv_island in uv_islands:
-        uv_island_left = _get_uv_island_left(uv_island)
-        uv_island_bot = _get_uv_island_bot(uv_island)
-        displacement = Vector((left - uv_island_left, bot - uv_island_bot))
-        for xface in uv_island:
-            for i in range(xface.get_face_length()):
-                xface.update_uv(i, xface.get_uv(i) + displacement)
-        next_left = max(next_left, _get_uv_island_width(uv_island))
-        bot += _get_uv_island_height(uv_island) + pixel_2d_size
-        if bot > 1:
+    for island_left, island_bot, island_right, island_top in bounds:
+        width = island_right - island_left
+        height = island_top - island_bot
+        if bot > 0 and bot + height > texture_pixels:
+            bot = 0
+            left = left + next_left + 1
+            next_left = 0
+        if left > 0 and left + width > texture_pixels:
+            tile += 1
             bot = 0
-            left = left + next_left + pixel_2d_size
+            left = 0
             next_left = 0
+        if width > texture_pixels or height > texture_pixels:
+            log(WARN, "There is an island of " + str(width) + "x" + str(height) + " pixels, it does not fit in a "
+                      "texture of " + str(texture_pixels) + " pixels")
+        offsets.append((left - island_left, bot - island_bot, tile, False))
+        next_left = max(next_left, width)
+        bot += height + 1
+    return offsets
 
 
-def _uv_islands_map_to_list(uv_islands_map):
+def get_uv_islands(uv_islands_map: Dict[BMFace, List[XFace]]) -> List[List[XFace]]:
     uv_island_list = []
     already_parsed = set()
     for uv_island in uv_islands_map.values():
@@ -38,47 +259,3 @@ def _uv_islands_map_to_list(uv_islands_map):
             already_parsed.add(face_ids_hash)
             uv_island_list.append(uv_island)
     return uv_island_list
-
-
-def _get_uv_island_left(uv_island: [XFace]) -> float:
-    left = inf
-    for xface in uv_island:
-        for uv in xface.get_all_uvs():
-            if uv.x < left:
-                left = uv.x
-    return left
-
-
-def _get_uv_island_bot(uv_island: [XFace]) -> float:
-    bot = inf
-    for xface in uv_island:
-        for uv in xface.get_all_uvs():
-            if uv.y < bot:
-                bot = uv.y
-    return bot
-
-
-def _get_uv_island_right(uv_island: [XFace]) -> float:
-    right = -inf
-    for xface in uv_island:
-        for uv in xface.get_all_uvs():
-            if uv.x > right:
-                right = uv.x
-    return right
-
-
-def _get_uv_island_top(uv_island: [XFace]) -> float:
-    top = -inf
-    for xface in uv_island:
-        for uv in xface.get_all_uvs():
-            if uv.y > top:
-                top = uv.y
-    return top
-
-
-def _get_uv_island_width(uv_island: [XFace]) -> float:
-    return abs(_get_uv_island_left(uv_island) - _get_uv_island_right(uv_island))
-
-
-def _get_uv_island_height(uv_island: [XFace]) -> float:
-    return abs(_get_uv_island_bot(uv_island) - _get_uv_island_top(uv_island))
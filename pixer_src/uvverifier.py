@@ -0,0 +1,92 @@
+# UV VERIFIER
+# Checks a whole UV layout for faces that overlap each other. Faces are bucketed in a grid by their UV bounding
+# box, so only faces that share a cell are compared and the whole check stays close to linear on big meshes
+from math import floor
+from typing import Dict, List, Set, Tuple
+
+from mathutils import Vector
+
+from .geometryutils import segments_cross, point_on_segment, are_the_same_points, get_winding_number
+from .logger import *
+
+# Average number of faces that should fall on each grid cell
+FACES_PER_CELL = 2.0
+
+
+def find_uv_overlaps(faces_uvs: List[Tuple[int, List[Vector]]], pixel_2d_size: float) -> List[Tuple[int, int]]:
+    # Work in pixel units so the tolerances do not depend on the texture size
+    polygons = [[Vector((uv.x / pixel_2d_size, uv.y / pixel_2d_size)) for uv in uvs] for _, uvs in faces_uvs]
+    bounds = [_get_bounds(polygon) for polygon in polygons]
+    cell_size = _get_cell_size(bounds)
+
+    grid: Dict[Tuple[int, int], List[int]] = {}
+    for i, (left, bot, right, top) in enumerate(bounds):
+        for x in range(floor(left / cell_size), floor(right / cell_size) + 1):
+            for y in range(floor(bot / cell_size), floor(top / cell_size) + 1):
+                grid.setdefault((x, y), []).append(i)
+
+    overlaps = set()
+    checked: Set[Tuple[int, int]] = set()
+    for cell_faces in grid.values():
+        for a in range(len(cell_faces)):
+            for b in range(a + 1, len(cell_faces)):
+                pair = (cell_faces[a], cell_faces[b])
+                if pair in checked:
+                    continue
+                checked.add(pair)
+                if _bounds_overlap(bounds[pair[0]], bounds[pair[1]]) \
+                        and _uv_polygons_overlap(polygons[pair[0]], polygons[pair[1]]):
+                    index_a = faces_uvs[pair[0]][0]
+                    index_b = faces_uvs[pair[1]][0]
+                    overlaps.add((min(index_a, index_b), max(index_a, index_b)))
+
+    log(DEBUG, "Checked " + str(len(checked)) + " face pairs for overlaps in " + str(len(grid)) + " cells")
+    return sorted(overlaps)
+
+
+def _get_bounds(polygon: List[Vector]) -> Tuple[float, float, float, float]:
+    return (min(point.x for point in polygon), min(point.y for point in polygon),
+            max(point.x for point in polygon), max(point.y for point in polygon))
+
+
+def _get_cell_size(bounds: List[Tuple[float, float, float, float]]) -> float:
+    if not bounds:
+        return 1.0
+    average_size = sum(max(right - left, top - bot) for left, bot, right, top in bounds) / len(bounds)
+    return max(1.0, average_size * FACES_PER_CELL)
+
+
+def _bounds_overlap(bounds_a: Tuple[float, float, float, float], bounds_b: Tuple[float, float, float, float]) -> bool:
+    return bounds_a[0] < bounds_b[2] and bounds_b[0] < bounds_a[2] \
+        and bounds_a[1] < bounds_b[3] and bounds_b[1] < bounds_a[3]
+
+
+# Two faces overlap when their interiors share any area. Sharing edges or vertices is fine
+def _uv_polygons_overlap(points_a: List[Vector], points_b: List[Vector]) -> bool:
+    return are_the_same_points(points_a, points_b) \
+        or _any_edges_cross(points_a, points_b) \
+        or _any_point_strictly_inside(points_a + _get_midpoints(points_a), points_b) \
+        or _any_point_strictly_inside(points_b + _get_midpoints(points_b), points_a)
+
+
+def _any_edges_cross(points_a: List[Vector], points_b: List[Vector]) -> bool:
+    for i in range(len(points_a)):
+        curr_point_a = points_a[i]
+        next_point_a = points_a[(i + 1) % len(points_a)]
+        for j in range(len(points_b)):
+            if segments_cross(curr_point_a, next_point_a, points_b[j], points_b[(j + 1) % len(points_b)]):
+                return True
+    return False
+
+
+def _get_midpoints(points: List[Vector]) -> List[Vector]:
+    return [(points[i] + points[(i + 1) % len(points)]) * 0.5 for i in range(len(points))]
+
+
+def _any_point_strictly_inside(points_a: List[Vector], points_b: List[Vector]) -> bool:
+    for point in points_a:
+        on_boundary = any(point_on_segment(point, points_b[i], points_b[(i + 1) % len(points_b)])
+                          for i in range(len(points_b)))
+        if not on_boundary and get_winding_number(point, points_b):
+            return True
+    return False
@@ -1,14 +1,16 @@
-from bmesh.types import BMesh
+from bmesh.types import BMesh, BMFace
 from pixer_src.logger import log, ERROR
 
 
-def validate(bm: BMesh):
+# Checks the whole mesh, or only the vertices of the given faces if any
+def validate(bm: BMesh, faces: [BMFace] = None):
+    verts = bm.verts if faces is None else {vert for face in faces for vert in face.verts}
     vertices = set()
-    for vert in bm.verts:
+    for vert in verts:
         if vert.co.copy().freeze() in vertices:
             log(ERROR, "The vert " + str(vert.co.copy().freeze()) + " is already in the set, "
                                                                     "it is probably a duplicate!")
         vertices.add(vert.co.copy().freeze())
 
-    if len(bm.verts) != len(vertices):
+    if len(verts) != len(vertices):
         raise Exception("There are duplicated vertices! Cannot proceed!")
@@ -0,0 +1,83 @@
+# WORKER POOL
+# Blender processes started in background mode that already imported the solver and wait for background jobs, so a
+# background pixelize does not have to wait for another Blender to start first. Workers go back to the pool when their
+# job is done, so they stay warm between runs. Like the benchmarker, the pool is kept at module level, it lives while
+# the addon is registered and it is stopped when the addon is unregistered
+import os
+import subprocess
+from typing import List, Optional
+
+import bpy
+
+from .logger import *
+
+# Seconds a worker has to exit once its input is closed before it is killed
+STOP_SECONDS = 2.0
+
+workers: List[subprocess.Popen] = []
+pool_size = 0
+
+
+# Command that starts Blender in background mode running backgroundjob.py with the given job argument
+def get_worker_command(job: str) -> List[str]:
+    package_folder = os.path.dirname(os.path.abspath(__file__))
+    addon_folder, package_name = os.path.split(package_folder)
+    return [bpy.app.binary_path, "--background", "--factory-startup", "--python",
+            os.path.join(package_folder, "backgroundjob.py"), "--", addon_folder, package_name, job]
+
+
+# Starts workers until there are 'count' of them waiting for jobs
+def start_workers(count: int):
+    global pool_size
+    from .backgroundjob import SERVE
+    pool_size = count
+    workers[:] = [worker for worker in workers if worker.poll() is None]
+    while len(workers) < pool_size:
+        workers.append(subprocess.Popen(get_worker_command(SERVE), stdin=subprocess.PIPE, universal_newlines=True))
+    while len(workers) > pool_size:
+        _stop(workers.pop())
+    log(INFO, str(len(workers)) + " pixer workers waiting for jobs")
+
+
+# Starts new workers for the ones that were lost, like a worker that had to be killed in the middle of a job
+def refill_workers():
+    if pool_size > 0:
+        start_workers(pool_size)
+
+
+def stop_workers():
+    global pool_size
+    pool_size = 0
+    for worker in workers:
+        _stop(worker)
+    workers.clear()
+
+
+# Returns a worker that is waiting for jobs, or None if there is none. It is out of the pool until it is released
+def take_worker() -> Optional[subprocess.Popen]:
+    workers[:] = [worker for worker in workers if worker.poll() is None]
+    return workers.pop(0) if workers else None
+
+
+def send_job(worker: subprocess.Popen, job_folder: str):
+    worker.stdin.write(job_folder + "\n")
+    worker.stdin.flush()
+
+
+# Puts the worker back in the pool once its job is done, or stops it if the pool does not need it anymore
+def release_worker(worker: subprocess.Popen):
+    if worker.poll() is None and len(workers) < pool_size:
+        workers.append(worker)
+    else:
+        _stop(worker)
+
+
+def _stop(worker: subprocess.Popen):
+    if worker.poll() is not None:
+        return
+    try:
+        worker.stdin.close()
+        worker.wait(timeout=STOP_SECONDS)
+    except (OSError, subprocess.TimeoutExpired):
+        worker.kill()
+        worker.wait()
@@ -24,6 +24,9 @@ class XFace:
     DOWN = 2
     ALL_XFACES = {}
     UV_LAYER = None
+    RECORDS = None
+    SCOPE = None
+    EXCLUDED = set()
 
     # Variables of each object
     face: BMFace = None
@@ -31,10 +34,21 @@ class XFace:
     plane = None
     horizontal_edges = []
     vertical_edges = []
+    horizontal_mask = 0
+    vertical_mask = 0
     inverted = False
+    uvs = None
+    uv_bounds = None
 
-    def init(uv_layer):  # Check this warning later
+    def init(uv_layer, records=None, scope=None, excluded=None):  # Check this warning later
         XFace.UV_LAYER = uv_layer
+        XFace.RECORDS = records
+        XFace.SCOPE = scope
+        XFace.EXCLUDED = excluded or set()
+        XFace.ALL_XFACES = {}
+
+    def in_scope(face: BMFace) -> bool:
+        return (XFace.SCOPE is None or face in XFace.SCOPE) and face not in XFace.EXCLUDED
 
     def get_face(self) -> BMFace:
         return self.face
@@ -68,14 +82,26 @@ class XFace:
     def get_score(self) -> float:
         return len(self.get_solved_neighbors()) + (len(self.horizontal_edges) + len(self.vertical_edges)) / len(self.face.loops)
 
+    # UVs are read from the UV layer only once and then kept in a local buffer. Changes are never written back to
+    # the layer from here, the packer writes the final UVs of every face once they are packed
+    def _get_uvs(self) -> [Vector]:
+        if self.uvs is None:
+            self.uvs = [loop[XFace.UV_LAYER].uv.copy() for loop in self.face.loops]
+        return self.uvs
+
     def get_uv(self, index: int) -> Vector:
-        return self.face.loops[self.get_index(index)][XFace.UV_LAYER].uv.copy()
+        return self._get_uvs()[self.get_index(index)].copy()
 
     def get_all_uvs(self) -> [Vector]:
-        all_uvs = []
-        for i in range(self.get_face_length()):
-            all_uvs.append(self.get_uv(i))
-        return all_uvs
+        return [uv.copy() for uv in self._get_uvs()]
+
+    # Returns the (left, bot, right, top) bounds of the UVs of this face
+    def get_uv_bounds(self) -> Tuple[float, float, float, float]:
+        if self.uv_bounds is None:
+            uvs = self._get_uvs()
+            self.uv_bounds = (min(uv.x for uv in uvs), min(uv.y for uv in uvs),
+                              max(uv.x for uv in uvs), max(uv.y for uv in uvs))
+        return self.uv_bounds
 
     def get_uv_edge(self, index: int) -> Vector:
         return self.get_uv(index + 1) - self.get_uv(index)
@@ -109,13 +135,15 @@ class XFace:
             return all(elem in hor_2d for elem in hor_3d) and all(elem in ver_2d for elem in ver_3d)
 
     def update_uv(self, index: int, new_uv: Vector):
-        index = self.get_index(index)
-        self.face.loops[index][XFace.UV_LAYER].uv = new_uv
+        self._get_uvs()[self.get_index(index)] = new_uv.copy()
+        self.uv_bounds = None
 
     def get_linked_xfaces(self) -> List[XFace]:
         linked_faces = [f for e in self.face.verts for f in e.link_faces if f is not self.face]
         linked_xfaces = []
         for linked_face in linked_faces:
+            if not XFace.in_scope(linked_face):
+                continue
             if linked_face not in XFace.ALL_XFACES:
                 XFace.ALL_XFACES[linked_face] = XFace(linked_face)
             linked_xfaces.append(XFace.ALL_XFACES[linked_face])
@@ -127,6 +155,16 @@ class XFace:
     def get_vertical_edges(self) -> []:
         return self.vertical_edges
 
+    # Bit i is set when edge i is horizontal (or vertical), so hot loops can check alignment in O(1)
+    def get_horizontal_mask(self) -> int:
+        return self.horizontal_mask
+
+    def get_vertical_mask(self) -> int:
+        return self.vertical_mask
+
+    def get_aligned_mask(self) -> int:
+        return self.horizontal_mask | self.vertical_mask
+
     def has_any_aligned_edges(self) -> bool:
         return bool(self.horizontal_edges or self.vertical_edges)
 
@@ -278,14 +316,30 @@ class XFace:
         log(DEBUG, "Horizontal edges in face " + str(self.face.index) + " are " + str(self.horizontal_edges), ["init"])
         log(DEBUG, "Vertical edges in face " + str(self.face.index) + " are " + str(self.vertical_edges), ["init"])
 
+    def _calculate_edges_masks(self):
+        for edge in self.horizontal_edges:
+            self.horizontal_mask |= 1 << edge
+        for edge in self.vertical_edges:
+            self.vertical_mask |= 1 << edge
+
     def __init__(self, face: BMFace):
         log(DEBUG, "Creating XFace for " + str(face.index), ["init"])
         self.is_solved = False
         self.horizontal_edges = []
         self.vertical_edges = []
+        self.horizontal_mask = 0
+        self.vertical_mask = 0
+        self.uvs = None
+        self.uv_bounds = None
         self.face = face
-        self._calculate_plane()
-        self._calculate_edges_alignment()
+        if XFace.RECORDS is not None and XFace.RECORDS.has(face.index):
+            self.plane = XFace.RECORDS.get_plane(face.index)
+            self.horizontal_edges = XFace.RECORDS.get_horizontal_edges(face.index)
+            self.vertical_edges = XFace.RECORDS.get_vertical_edges(face.index)
+        else:
+            self._calculate_plane()
+            self._calculate_edges_alignment()
+        self._calculate_edges_masks()
         XFace.ALL_XFACES[face] = self
 
     def __eq__(self, other):